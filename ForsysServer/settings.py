@@ -10,10 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 import sentry_sdk
 from sentry_sdk.integrations.django import DjangoIntegration
 
+from authentication.tracing import traces_sampler
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the rest of the stack
+    'authentication.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -81,11 +86,18 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ForsysServer.wsgi.application'
 
+# Route the API to the async views in authentication/async_views.py.
+# ForsysServer/asgi.py turns this on; under WSGI each async view would run
+# in its own event loop.
+ASYNC_API = os.environ.get('ASYNC_API', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# SQLite under DEBUG and PostgreSQL otherwise; DATABASE=sqlite|postgresql
+# overrides that, e.g. to load-test against a local PostgreSQL.
 
-if DEBUG:
+if os.environ.get('DATABASE', 'sqlite' if DEBUG else 'postgresql') == 'sqlite':
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
@@ -104,9 +116,52 @@ else:
         }
     }
 
+# Cache
+# Catalog responses and other shared entries live here. Point CACHE_URL at
+# Redis in production so every worker shares one cache; without it each
+# process keeps its own in-memory cache.
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Users resolved by CachedJWTAuthentication. Other processes may serve a
+# saved or deactivated user for up to LOCAL_TTL seconds.
+USER_CACHE = {
+    'LOCAL_MAXSIZE': 1024,
+    'LOCAL_TTL': 5,
+    'SHARED_TTL': 300,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# New hashes use Argon2id; hashes from the other hashers are upgraded on login
+PASSWORD_HASHERS = [
+    'authentication.hashers.TunableArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 19 * 1024)),
+    'ARGON2_PARALLELISM': int(os.environ.get('ARGON2_PARALLELISM', 1)),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -153,16 +208,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Add these new settings
 AUTH_USER_MODEL = 'authentication.User'
 
+# EmailBackend also accepts `username` (the admin login form), so a failed
+# login is a single lookup rather than one per backend
 AUTHENTICATION_BACKENDS = [
     'authentication.customAuth.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.customAuth.CachedJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -180,6 +236,7 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': False,
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.TokenRefreshSerializer',
 }
 
 # Email settings
@@ -192,6 +249,11 @@ SIMPLE_JWT = {
 
 # Encryption key for sensitive data (must be 32 url-safe base64-encoded bytes)
 ENCRYPTION_KEY = 'AYVKLFErKFiH33CkYgkopbLaCXFDgfMr9vHLDhgbUAg='
+# Key rotation: list keys newest first. New data is encrypted with the first
+# key, any key can decrypt. Run `manage.py rotate_encryption_keys` afterwards.
+ENCRYPTION_KEYS = [ENCRYPTION_KEY]
+# Serialization used inside encrypted fields: 'json' or 'msgpack' (needs msgpack)
+ENCRYPTED_FIELD_CODEC = 'json'
 
 # Looking to send emails in production? Check out our Email API/SMTP product!
 EMAIL_HOST = 'sandbox.smtp.mailtrap.io'
@@ -222,24 +284,110 @@ SWAGGER_SETTINGS = {
 }
 
 # Sentry settings
+# Traces are sampled per path by authentication.tracing.traces_sampler:
+# RULES are (regex, rate) pairs, first match wins, and ENVIRONMENTS
+# overrides keys for the current SENTRY_ENVIRONMENT. Profiles are taken for
+# PROFILES_SAMPLE_RATE of the sampled transactions. An unset
+# SENTRY_ENVIRONMENT is treated as production, so a deployment that forgets
+# it samples at the production rate; set it to 'development' locally.
+SENTRY_ENVIRONMENT = os.environ.get('SENTRY_ENVIRONMENT', 'production')
+TRACING = {
+    'DEFAULT_RATE': float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', 0.05)),
+    'RULES': [
+        (r'^/metrics$', 0.0),
+        (r'^/(static|media|swagger|redoc)', 0.0),
+        (r'^celery:authentication\.tasks\.(flush_audit_events|deliver_outbox_emails|expire_cookies)$', 0.0),
+        (r'^/api/auth/(login|register|token/refresh)/', 0.25),
+        (r'^/api/auth/exports/', 1.0),
+    ],
+    'ENVIRONMENTS': {
+        'development': {'DEFAULT_RATE': 1.0},
+        'staging': {'DEFAULT_RATE': 0.5},
+    },
+}
+
 sentry_sdk.init(
     dsn="https://d07a2d4153a502d281f42267a6a9b5c4@o4508912493264896.ingest.us.sentry.io/4508912497393664",
     integrations=[DjangoIntegration()],
-    traces_sample_rate=1.0,
+    environment=SENTRY_ENVIRONMENT,
+    traces_sampler=traces_sampler,
+    profiles_sample_rate=float(os.environ.get('SENTRY_PROFILES_SAMPLE_RATE', 0)),
     send_default_pii=True,
-    _experiments={
-        "continuous_profiling_auto_start": True,
-    },
 )
 
+# Prometheus-format request metrics, see authentication/metrics.py. /metrics
+# answers "Authorization: Bearer <METRICS_TOKEN>" or a scraper whose address
+# is in METRICS_ALLOWED_IPS (comma separated); with neither set it is closed.
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+    'ALLOWED_IPS': [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip],
+    'PUBLISH_INTERVAL': 10,
+}
+
 # Celery settings
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Write-behind buffer for LoginAttempt/CookieInjectionLog rows, see
+# authentication/audit.py. BACKEND is 'redis', 'memory' or 'sync'; without a
+# broker the sync backend is used regardless. Redis is the default only when
+# the broker is configured explicitly and DEBUG is off.
+AUDIT_BUFFER = {
+    'BACKEND': os.environ.get(
+        'AUDIT_BUFFER_BACKEND', 'redis' if os.environ.get('CELERY_BROKER_URL') and not DEBUG else 'sync'
+    ),
+    'MAX_SIZE': 500,
+    'FLUSH_INTERVAL': 5,
+    'REDIS_URL': CELERY_BROKER_URL,
+}
+
+# Revoked refresh token ids, checked on refresh and logout
+TOKEN_REVOCATION = {
+    'BACKEND': 'redis',
+    'REDIS_URL': CELERY_BROKER_URL,
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-audit-events': {
+        'task': 'authentication.tasks.flush_audit_events',
+        'schedule': AUDIT_BUFFER['FLUSH_INTERVAL'],
+    },
+    'deliver-outbox-emails': {
+        'task': 'authentication.tasks.deliver_outbox_emails',
+        'schedule': 30,
+    },
+    'expire-cookies': {
+        'task': 'authentication.tasks.expire_cookies',
+        'schedule': 300,
+    },
+    'purge-expired-tokens': {
+        'task': 'authentication.tasks.purge_expired_tokens',
+        'schedule': 60 * 60,
+    },
+    'refresh-revenue-rollup': {
+        'task': 'authentication.tasks.refresh_revenue_rollup',
+        'schedule': 60 * 60,
+    },
+    'create-log-partitions': {
+        'task': 'authentication.tasks.create_log_partitions',
+        'schedule': 60 * 60 * 24,
+    },
+}
+
+# Monthly partitions of LoginAttempt and CookieInjectionLog on PostgreSQL,
+# see authentication/partitions.py. `manage.py archive_log_partitions`
+# moves months older than RETENTION_MONTHS to gzipped JSONL in ARCHIVE_DIR.
+LOG_PARTITIONS = {
+    'MONTHS_AHEAD': 3,
+    'RETENTION_MONTHS': int(os.environ.get('LOG_RETENTION_MONTHS', 12)),
+    'ARCHIVE_DIR': os.environ.get('LOG_ARCHIVE_DIR', BASE_DIR / 'archive' / 'logs'),
+}
+
 # Backup settings
 DBBACKUP_STORAGE = 'django.core.files.storage.FileSystemStorage'
 DBBACKUP_STORAGE_OPTIONS = {'location': BASE_DIR / 'backups'}
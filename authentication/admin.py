@@ -1,19 +1,65 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
 from .models import (
     User, Subscription, Payment, Service, 
-    UserService, Cookie, CookieInjectionLog, LoginAttempt
+    UserService, Cookie, CookieInjectionLog, LoginAttempt, OutboxEmail
 )
 from django.urls import path
 from django.http import JsonResponse
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken
 import os
-from .utils import send_email
+from .outbox import queue_email
+from .pagination import EstimatedCountPaginator
+
+
+class IndexedChangeListMixin:
+    """
+    Change lists whose query count does not grow with the table.
+
+    Search matches each search field on the table that owns it. A field
+    behind foreign keys, e.g. user_service__user__email, becomes
+    user_service__user__in=<users whose email matches>, so on PostgreSQL
+    every match is a trigram index scan (migration 0015) rather than a
+    filter over the joined change list. search_fields must be plain
+    lookups through forward foreign keys; no ^, = or @ prefixes.
+
+    The "N total" next to a filtered count costs a second COUNT(*) over
+    the whole table, so it is left out.
+    """
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        search_fields = self.get_search_fields(request)
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            condition = Q()
+            for field in search_fields:
+                condition |= self.search_condition(queryset.model, field, bit)
+            queryset = queryset.filter(condition)
+        # Forward foreign keys only, so no row can match twice
+        return queryset, False
+
+    def search_condition(self, model, field, term):
+        path, _, column = field.rpartition('__')
+        if not path:
+            return Q(**{f'{column}__icontains': term})
+        related = model
+        for name in path.split('__'):
+            related = related._meta.get_field(name).related_model
+        matches = related._default_manager.filter(**{f'{column}__icontains': term}).values('pk')
+        return Q(**{f'{path}__in': matches})
+
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(IndexedChangeListMixin, UserAdmin):
     list_display = ('email', 'full_name', 'is_active', 'is_staff', 'subscription', 'date_joined')
     list_filter = ('is_active', 'is_staff', 'is_admin', 'email_verified', 'two_factor_enabled')
+    list_select_related = ('subscription',)
     search_fields = ('email', 'full_name')
     ordering = ('email',)
     
@@ -33,70 +79,116 @@ class CustomUserAdmin(UserAdmin):
     )
 
     def save_model(self, request, obj, form, change):
-        is_new = obj.pk is None
+        is_new = not change
+        # The admin wraps this in a transaction, so the email is only queued
+        # if the user is saved
         super().save_model(request, obj, form, change)
         if is_new and not obj.email_verified:
-            verification_token = RefreshToken.for_user(obj).access_token
+            verification_token = AccessToken.for_user(obj)
             verification_url = f"{os.environ.get('FRONTEND_BASE_URL', 'http://localhost:3000')}/verify-email?token={verification_token}"
-            send_email(
+            queue_email(
                 subject="Verify your email",
                 recipient_list=[obj.email],
                 message=f"Please verify your email by clicking on the following link: {verification_url}"
             )
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'price', 'duration_days', 'is_active', 'created_at')
     list_filter = ('is_active', 'created_at')
     search_fields = ('name',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'payment_status', 'subscription', 'timestamp')
     list_filter = ('payment_status', 'timestamp')
+    list_select_related = ('user', 'subscription')
+    raw_id_fields = ('user',)
     search_fields = ('user__email', 'transaction_id')
+    paginator = EstimatedCountPaginator
     readonly_fields = ('timestamp',)
 
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'login_url', 'is_active', 'required_subscription')
     list_filter = ('is_active', 'required_subscription')
+    list_select_related = ('required_subscription',)
     search_fields = ('name',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(UserService)
-class UserServiceAdmin(admin.ModelAdmin):
+class UserServiceAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'service', 'is_active', 'created_at', 'last_used', 'usage_count')
     list_filter = ('is_active', 'service')
+    list_select_related = ('user', 'service')
+    raw_id_fields = ('user',)
     search_fields = ('user__email', 'service__name')
     readonly_fields = ('created_at', 'last_used', 'usage_count')
 
     def get_queryset(self, request):
         # Prevent exposure of encrypted credentials in list view
-        return super().get_queryset(request).defer('_credentials')
+        return super().get_queryset(request).defer('credentials')
+
+class CookieValidityFilter(admin.SimpleListFilter):
+    title = 'validity'
+    parameter_name = 'validity'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('valid', 'Currently valid'),
+            ('stale', 'Past expiry, not yet swept'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'valid':
+            return queryset.currently_valid()
+        if self.value() == 'stale':
+            return queryset.stale()
+        return queryset
 
 @admin.register(Cookie)
-class CookieAdmin(admin.ModelAdmin):
+class CookieAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('user_service', 'status', 'extracted_at', 'expires_at', 'last_validated')
-    list_filter = ('status', 'extracted_at')
+    list_filter = ('status', CookieValidityFilter, 'extracted_at')
+    # UserService.__str__ shows the user's email and the service name
+    list_select_related = ('user_service__user', 'user_service__service')
+    raw_id_fields = ('user_service',)
     search_fields = ('user_service__user__email', 'user_service__service__name')
     readonly_fields = ('extracted_at', 'last_validated')
 
     def get_queryset(self, request):
-        # Prevent exposure of encrypted cookie data in list view
-        return super().get_queryset(request).defer('_cookie_data')
+        # Prevent exposure of encrypted cookie data in list view, and skip
+        # decrypting the joined credentials
+        return super().get_queryset(request).defer('cookie_data', 'user_service__credentials')
 
 @admin.register(CookieInjectionLog)
-class CookieInjectionLogAdmin(admin.ModelAdmin):
+class CookieInjectionLogAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('cookie', 'injection_status', 'timestamp', 'ip_address')
     list_filter = ('injection_status', 'timestamp')
+    # Cookie.__str__ shows the service name and the user's email
+    list_select_related = ('cookie__user_service__user', 'cookie__user_service__service')
+    raw_id_fields = ('cookie',)
     search_fields = ('cookie__user_service__user__email', 'message')
+    paginator = EstimatedCountPaginator
     readonly_fields = ('timestamp',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('cookie__cookie_data', 'cookie__user_service__credentials')
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(IndexedChangeListMixin, admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
 @admin.register(LoginAttempt)
-class LoginAttemptAdmin(admin.ModelAdmin):
+class LoginAttemptAdmin(IndexedChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'timestamp', 'success', 'ip_address')
     list_filter = ('success', 'timestamp')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
     search_fields = ('user__email', 'ip_address')
+    paginator = EstimatedCountPaginator
     readonly_fields = ('timestamp',)
@@ -0,0 +1,94 @@
+"""
+Async counterparts of the API views in views.py, routed instead of them
+when settings.ASYNC_API is on (the default under ForsysServer/asgi.py).
+
+Object lookups, deletes and cache reads go through the async ORM and cache
+APIs. Login checks the password in the hashing pool from the event loop.
+Collection routes (list and create) are not here: filtering, the cursor
+paginator and serialization are sync DRF code, so urls.py keeps them on
+the sync viewsets, which Django runs in its thread pool.
+"""
+from adrf import generics as async_generics
+from adrf import mixins as async_mixins
+from adrf import viewsets as async_viewsets
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.response import Response
+
+from .audit import record_login_attempt
+from .views import (
+    CookieViewSet, LoginView, PaymentViewSet, RegisterView, ServiceViewSet,
+    SubscriptionViewSet, UserServiceViewSet
+)
+
+
+class AsyncQuerysetMixin:
+    """Run the sync filter_queryset chain (backends, ?fields=, list defers) off the loop"""
+
+    async def afilter_queryset(self, queryset):
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def perform_aupdate(self, serializer):
+        await sync_to_async(self.perform_update)(serializer)
+
+
+class AsyncModelViewSet(
+    async_mixins.RetrieveModelMixin,
+    async_mixins.UpdateModelMixin,
+    async_mixins.DestroyModelMixin,
+    async_viewsets.GenericViewSet,
+):
+    """adrf's ModelViewSet detail actions in DRF's order, so it can sit in front of our viewsets"""
+
+
+class AsyncCatalogMixin(AsyncQuerysetMixin):
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(request, super().aretrieve, *args, **kwargs)
+
+
+class AsyncSubscriptionViewSet(AsyncCatalogMixin, async_viewsets.ReadOnlyModelViewSet, SubscriptionViewSet):
+    pass
+
+
+class AsyncServiceViewSet(AsyncCatalogMixin, async_viewsets.ReadOnlyModelViewSet, ServiceViewSet):
+    pass
+
+
+class AsyncUserServiceViewSet(AsyncQuerysetMixin, AsyncModelViewSet, UserServiceViewSet):
+    pass
+
+
+class AsyncPaymentViewSet(AsyncQuerysetMixin, AsyncModelViewSet, PaymentViewSet):
+    pass
+
+
+class AsyncCookieViewSet(AsyncQuerysetMixin, AsyncModelViewSet, CookieViewSet):
+    pass
+
+
+class AsyncLoginView(async_generics.GenericAPIView, LoginView):
+    async def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        # Field validation only, credentials are checked by avalidate
+        attrs = serializer.to_internal_value(request.data)
+        data = await serializer.avalidate(attrs)
+
+        await sync_to_async(record_login_attempt)(
+            user=serializer.user,
+            success=True,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            location_data={
+                'ip': request.META.get('REMOTE_ADDR'),
+                'forwarded_for': request.META.get('HTTP_X_FORWARDED_FOR', '')
+            }
+        )
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AsyncRegisterView(async_generics.GenericAPIView, RegisterView):
+    async def post(self, request):
+        # Hashing, the insert and queueing the verification email run in one
+        # transaction on a worker thread
+        return await sync_to_async(super().post)(request)
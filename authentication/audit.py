@@ -0,0 +1,240 @@
+"""
+Write-behind buffer for append-only audit rows (LoginAttempt,
+CookieInjectionLog). Requests queue an event and return; a Celery task
+inserts queued events with bulk_create once MAX_SIZE events are waiting, and
+the beat schedule flushes whatever is left every FLUSH_INTERVAL seconds.
+
+Backends, chosen by settings.AUDIT_BUFFER['BACKEND']:
+
+- redis: events are pushed to a Redis list shared by all processes
+- memory: events are batched per process and handed to Celery as task args,
+  at MAX_SIZE or by a timer FLUSH_INTERVAL seconds after the first one
+- sync: events are inserted immediately, inside the request
+
+Without a Celery broker the sync backend is always used. The settings pick
+redis only when CELERY_BROKER_URL is set in the environment and DEBUG is off.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import models
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Seconds between tracebacks while Redis is down; every audited request
+# would log one otherwise
+WARNING_INTERVAL = 60
+
+DEFAULTS = {
+    'BACKEND': 'sync',
+    'MAX_SIZE': 500,
+    'FLUSH_INTERVAL': 5,
+    'REDIS_URL': None,
+    'REDIS_KEY': 'audit:events',
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'AUDIT_BUFFER', {})}
+    if not getattr(settings, 'CELERY_BROKER_URL', None):
+        config['BACKEND'] = 'sync'
+    return config
+
+
+class EventEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds, keep the full timestamp
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_event(model, fields):
+    fields = {
+        name: value.pk if isinstance(value, models.Model) else value
+        for name, value in fields.items()
+    }
+    fields.setdefault('id', uuid.uuid4())
+    fields.setdefault('timestamp', timezone.now())
+    return json.dumps({'model': model._meta.label_lower, 'fields': fields}, cls=EventEncoder)
+
+
+def write_events(events):
+    """Insert encoded events, one bulk_create per model"""
+    by_model = {}
+    for event in events:
+        data = json.loads(event)
+        model = apps.get_model(data['model'])
+        fields = {
+            model._meta.get_field(name).attname: model._meta.get_field(name).to_python(value)
+            for name, value in data['fields'].items()
+        }
+        by_model.setdefault(model, []).append(model(**fields))
+    for model, objs in by_model.items():
+        # Events carry their own ids, so a retried flush does not duplicate rows
+        model.objects.bulk_create(objs, batch_size=500, ignore_conflicts=True)
+    return sum(len(objs) for objs in by_model.values())
+
+
+def schedule_flush(events=None):
+    """Hand a flush to Celery, or write inline if the broker is unreachable"""
+    from .tasks import flush_audit_events
+    try:
+        flush_audit_events.delay(events)
+    except Exception:
+        logger.warning('Could not queue audit flush, writing inline', exc_info=True)
+        if events:
+            write_events(events)
+        else:
+            get_buffer().flush()
+
+
+class SyncBuffer:
+    def add(self, event):
+        write_events([event])
+
+    def flush(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class MemoryBuffer:
+    def __init__(self, max_size, flush_interval):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.events = []
+        self.timer = None
+        atexit.register(self.flush)
+
+    def add(self, event):
+        with self.lock:
+            if not self.events:
+                # Hands the batch over after FLUSH_INTERVAL even if no more
+                # events come in; beat can't reach this process's memory
+                self.timer = threading.Timer(self.flush_interval, self.flush_due)
+                self.timer.daemon = True
+                self.timer.start()
+            self.events.append(event)
+            batch = self.take() if len(self.events) >= self.max_size else None
+        if batch:
+            schedule_flush(batch)
+
+    def take(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.events = self.events, []
+        return batch
+
+    def flush_due(self):
+        with self.lock:
+            batch = self.take()
+        if batch:
+            schedule_flush(batch)
+
+    def flush(self):
+        with self.lock:
+            batch = self.take()
+        return write_events(batch) if batch else 0
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+class RedisBuffer:
+    # Drops a written batch from the head of the list, unless another flush
+    # got there first; events are unique, so the head identifies the batch
+    TRIM_SCRIPT = """
+    if redis.call('LINDEX', KEYS[1], 0) == ARGV[1] then
+        redis.call('LTRIM', KEYS[1], ARGV[2], -1)
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, url, key, max_size):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.errors = redis.RedisError
+        self.key = key
+        self.max_size = max_size
+        self.trim = self.client.register_script(self.TRIM_SCRIPT)
+        self.warned_at = None
+
+    def add(self, event):
+        try:
+            queued = self.client.rpush(self.key, event)
+        except self.errors:
+            now = time.monotonic()
+            if self.warned_at is None or now - self.warned_at >= WARNING_INTERVAL:
+                self.warned_at = now
+                logger.warning('Audit buffer unavailable, writing inline', exc_info=True)
+            write_events([event])
+            return
+        if queued % self.max_size == 0:
+            schedule_flush()
+
+    def flush(self):
+        # Events leave the list only once they are in the database; a batch
+        # written twice by overlapping flushes is deduplicated by event id
+        written = 0
+        while True:
+            events = self.client.lrange(self.key, 0, self.max_size - 1)
+            if not events:
+                return written
+            written += write_events([event.decode() for event in events])
+            self.trim(keys=[self.key], args=[events[0], len(events)])
+
+    def close(self):
+        self.client.close()
+
+
+@lru_cache(maxsize=1)
+def get_buffer():
+    config = get_config()
+    if config['BACKEND'] == 'redis':
+        url = config['REDIS_URL'] or settings.CELERY_BROKER_URL
+        return RedisBuffer(url, config['REDIS_KEY'], config['MAX_SIZE'])
+    if config['BACKEND'] == 'memory':
+        return MemoryBuffer(config['MAX_SIZE'], config['FLUSH_INTERVAL'])
+    return SyncBuffer()
+
+
+@receiver(setting_changed)
+def reset_buffer(sender, setting, **kwargs):
+    if setting in ('AUDIT_BUFFER', 'CELERY_BROKER_URL'):
+        if get_buffer.cache_info().currsize:
+            get_buffer().close()
+        get_buffer.cache_clear()
+
+
+def record(model, **fields):
+    get_buffer().add(encode_event(model, fields))
+
+
+def record_login_attempt(**fields):
+    from .models import LoginAttempt
+    record(LoginAttempt, **fields)
+
+
+def record_cookie_injection(**fields):
+    from .models import CookieInjectionLog
+    record(CookieInjectionLog, **fields)
@@ -0,0 +1,234 @@
+"""
+Streaming bulk loads of companies, branches, login types and users from
+CSV or JSONL files, for onboarding a tenant in one pass.
+
+Rows are read lazily and written in batches, so memory stays flat however
+large the file is. Foreign keys are given by natural key (company_code,
+branch_code, login_type) and resolved through dicts of key -> pk read once
+when a loader starts. Rows whose unique key (code or email) already exists
+are skipped, not updated; rows that fail to resolve or convert are skipped
+and reported.
+
+On PostgreSQL each batch is streamed with COPY into a temporary table and
+moved over with INSERT ... ON CONFLICT DO NOTHING. Other databases use
+bulk_create(ignore_conflicts=True).
+"""
+import csv
+import io
+import json
+import secrets
+import time
+
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+
+from .models import Branch, Company, LoginType, User
+
+MAX_REPORTED_ERRORS = 20
+
+
+def read_rows(path, format=None):
+    """Yield dicts from a .csv or .jsonl file without reading it all in"""
+    format = format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def copy_text(value):
+    """A value in PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+class Loader:
+    """
+    Turns rows into model instances and writes them in batches. Subclasses
+    name the model, its unique natural key, the plain columns they accept
+    and the natural-key columns to resolve to foreign keys.
+    """
+    model = None
+    key = None
+    fields = ()
+    # column -> (foreign key attname, related model, related natural key)
+    relations = {}
+
+    def __init__(self, batch_size=5000, using='default'):
+        self.batch_size = batch_size
+        self.using = using
+        self.maps = {
+            column: dict(model._default_manager.using(using).values_list(key, 'pk'))
+            for column, (attname, model, key) in self.relations.items()
+        }
+        self.model_fields = {field.name: field for field in self.model._meta.concrete_fields}
+        self.stats = {'rows': 0, 'inserted': 0, 'skipped': 0, 'seconds': 0.0, 'errors': []}
+
+    def build(self, row):
+        """A model instance for one row; raises ValueError or ValidationError"""
+        values = {}
+        for name in self.fields:
+            value = row.get(name)
+            # Leave missing and blank columns to the model defaults
+            if value is None or value == '':
+                continue
+            values[name] = self.model_fields[name].to_python(value)
+        for column, (attname, model, key) in self.relations.items():
+            code = row.get(column)
+            if code in (None, ''):
+                continue
+            try:
+                values[attname] = self.maps[column][code]
+            except KeyError:
+                raise ValueError(f"unknown {column} {code!r}")
+        if not values.get(self.key):
+            raise ValueError(f"missing {self.key}")
+        return self.model(**values)
+
+    def load(self, rows):
+        """Write every row, batch by batch, and return the stats"""
+        started = time.perf_counter()
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            self.stats['rows'] += 1
+            try:
+                batch.append(self.build(row))
+            except (ValueError, ValidationError) as e:
+                self.skip(line, e)
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        self.stats['seconds'] = time.perf_counter() - started
+        return self.stats
+
+    def skip(self, line, error):
+        self.stats['skipped'] += 1
+        if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+            message = '; '.join(error.messages) if isinstance(error, ValidationError) else str(error)
+            self.stats['errors'].append(f"row {line}: {message}")
+
+    def flush(self, batch):
+        connection = connections[self.using]
+        with transaction.atomic(using=self.using):
+            if connection.vendor == 'postgresql':
+                inserted = self.copy(connection, batch)
+            else:
+                inserted = self.bulk_create(batch)
+        self.stats['inserted'] += inserted
+
+    def bulk_create(self, batch):
+        # ignore_conflicts reports nothing back, so count the keys that are
+        # already there first; duplicates within the batch collapse by key
+        batch = list({getattr(obj, self.key): obj for obj in batch}.values())
+        keys = [getattr(obj, self.key) for obj in batch]
+        existing = self.model._default_manager.using(self.using).filter(**{f'{self.key}__in': keys}).count()
+        self.model._default_manager.using(self.using).bulk_create(batch, ignore_conflicts=True)
+        return len(batch) - existing
+
+    def copy(self, connection, batch):
+        meta = self.model._meta
+        fields = [f for f in meta.concrete_fields if not (f.primary_key and f.db_returning)]
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        table = connection.ops.quote_name(meta.db_table)
+        staging = connection.ops.quote_name(f'bulkload_{meta.db_table}')
+
+        buffer = io.StringIO()
+        for obj in batch:
+            buffer.write('\t'.join(
+                copy_text(f.get_db_prep_save(f.pre_save(obj, add=True), connection)) for f in fields
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP '
+                f'AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.cursor.copy_expert(f'COPY {staging} ({columns}) FROM STDIN', buffer)
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING'
+            )
+            inserted = cursor.rowcount
+            cursor.execute(f'TRUNCATE {staging}')
+        return inserted
+
+
+class CompanyLoader(Loader):
+    model = Company
+    key = 'company_code'
+    fields = ('company_code', 'company_name', 'company_type', 'head_office', 'longitude', 'latitude', 'is_active')
+
+
+class LoginTypeLoader(Loader):
+    model = LoginType
+    key = 'login_type'
+    fields = ('login_type', 'is_active')
+
+
+class BranchLoader(Loader):
+    model = Branch
+    key = 'branch_code'
+    fields = ('branch_code', 'branch_name', 'address', 'longitude', 'latitude', 'is_active')
+    relations = {'company_code': ('company_id', Company, 'company_code')}
+
+
+class UserLoader(Loader):
+    """
+    Users with their company, branch and login type. A password column must
+    hold an already encoded hash, as exported from another Django site;
+    hashing raw passwords would cost far more than the load itself. Users
+    without one get an unusable password and set theirs through the reset
+    flow.
+    """
+    model = User
+    key = 'email'
+    fields = ('email', 'full_name', 'phone_number', 'is_active', 'is_staff', 'email_verified')
+    relations = {
+        'company_code': ('company_id', Company, 'company_code'),
+        'branch_code': ('branch_id', Branch, 'branch_code'),
+        'login_type': ('login_type_id', LoginType, 'login_type'),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.branch_companies = dict(Branch.objects.using(self.using).values_list('pk', 'company_id'))
+
+    def build(self, row):
+        if row.get('email'):
+            row = {**row, 'email': BaseUserManager.normalize_email(row['email'])}
+        user = super().build(row)
+        if user.branch_id and not user.company_id:
+            user.company_id = self.branch_companies[user.branch_id]
+
+        password = row.get('password')
+        if password:
+            # Raises ValueError for anything that is not an encoded hash
+            identify_hasher(password)
+            user.password = password
+        else:
+            # make_password(None), minus its per-character SystemRandom calls
+            user.password = UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(30)
+        return user
+
+
+LOADERS = {
+    'companies': CompanyLoader,
+    'logintypes': LoginTypeLoader,
+    'branches': BranchLoader,
+    'users': UserLoader,
+}
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def catalog_version_key(name):
+    return f'catalog:{name}:version'
+
+
+def catalog_version(name):
+    """
+    Current version token of a catalog. Cached responses are keyed by it,
+    so bumping the token invalidates every page at once.
+    """
+    version = cache.get(catalog_version_key(name))
+    if version is None:
+        version = uuid.uuid4().hex
+        # Another process may have set it first, keep theirs
+        if not cache.add(catalog_version_key(name), version, None):
+            version = cache.get(catalog_version_key(name), version)
+    return version
+
+
+def bump_catalog(name):
+    cache.set(catalog_version_key(name), uuid.uuid4().hex, None)
+
+
+def catalog_response_key(name, request):
+    url = request.build_absolute_uri()
+    media_type = getattr(request, 'accepted_media_type', '')
+    digest = hashlib.sha256(f'{url}|{media_type}'.encode()).hexdigest()
+    return f'catalog:{name}:{catalog_version(name)}:{digest}'
+
+
+def strong_etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha256(body.encode()).hexdigest()
@@ -1,14 +1,66 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .hashers import ahash_password, averify_password, hash_password, verify_password
+from .user_cache import get_user_cache
 
 User = get_user_model()
 
 class EmailBackend(ModelBackend):
-  def authenticate(self, request, username=None, password=None, **kwargs):
+  def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+    email = email or username
+    if email is None or password is None:
+      return None
     try:
-      user = User.objects.get(username=username)
+      user = User.objects.get(email=email)
     except User.DoesNotExist:
+      # Run the hasher anyway so response time does not reveal unknown emails
+      hash_password(password)
       return None
-    if user.check_password(password):
+    if verify_password(user, password):
       return user
     return None
+
+  async def aauthenticate(self, request, username=None, password=None, email=None, **kwargs):
+    email = email or username
+    if email is None or password is None:
+      return None
+    try:
+      user = await User.objects.aget(email=email)
+    except User.DoesNotExist:
+      await ahash_password(password)
+      return None
+    if await averify_password(user, password):
+      return user
+    return None
+
+
+def load_user(user_id):
+  return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+  """JWTAuthentication that resolves the token's user through the user cache"""
+
+  def get_user(self, validated_token):
+    try:
+      user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+      raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    user = get_user_cache().get(user_id, load_user)
+    if user is None:
+      raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+      raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+    if api_settings.CHECK_REVOKE_TOKEN:
+      if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+        raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+    return user
@@ -0,0 +1,52 @@
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+def get_encryption_keys():
+    """Return the configured keys, newest first"""
+    keys = list(getattr(settings, 'ENCRYPTION_KEYS', None) or [])
+    if not keys:
+        keys = [settings.ENCRYPTION_KEY]
+    return keys
+
+
+@lru_cache(maxsize=1)
+def get_fernets():
+    return tuple(Fernet(key.encode()) for key in get_encryption_keys())
+
+
+@lru_cache(maxsize=1)
+def get_keyring():
+    """
+    Build the process-wide keyring once. The first key encrypts, every key
+    is tried on decrypt so rows written under a retired key stay readable
+    until they are rotated.
+    """
+    return MultiFernet(get_fernets())
+
+
+def get_encryption_key():
+    """Get the shared keyring for sensitive data"""
+    return get_keyring()
+
+
+def needs_rotation(token):
+    """Check whether a token was written under a key other than the newest"""
+    if not token:
+        return False
+    try:
+        get_fernets()[0].decrypt(token.encode())
+    except InvalidToken:
+        return True
+    return False
+
+
+@receiver(setting_changed)
+def reset_keyring(sender, setting, **kwargs):
+    if setting in ('ENCRYPTION_KEY', 'ENCRYPTION_KEYS'):
+        get_fernets.cache_clear()
+        get_keyring.cache_clear()
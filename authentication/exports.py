@@ -0,0 +1,192 @@
+"""
+Streaming CSV/JSONL exports of payments and login attempts for the finance
+and security teams, served by ExportView and the export command.
+
+Rows come from a values_list() queryset read with .iterator(), so only one
+chunk of rows is in memory at a time and no model instances are built.
+Output is encoded in blocks of roughly BLOCK_SIZE bytes and can be gzipped
+on the fly, so memory stays flat however many rows match. Under ASGI the
+blocks go through aiter_blocks(), as Django reads a sync iterator into a
+list before sending any of it.
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import LoginAttempt, Payment
+
+BLOCK_SIZE = 64 * 1024
+FORMATS = ('csv', 'jsonl')
+# Leading characters that make a spreadsheet treat a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Export:
+    """A model, the columns to export as (header, lookup) and how ?status= filters it"""
+
+    def __init__(self, model, columns, status_filter):
+        self.model = model
+        self.columns = columns
+        self.status_filter = status_filter
+
+    @property
+    def headers(self):
+        return [header for header, lookup in self.columns]
+
+    def queryset(self, since=None, until=None, status=None):
+        queryset = self.model.objects.all()
+        if since is not None:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(timestamp__lt=until)
+        if status:
+            queryset = queryset.filter(**self.status_filter(status))
+        return queryset.order_by('timestamp', 'pk').values_list(*[lookup for header, lookup in self.columns])
+
+
+def payment_status(status):
+    if status not in dict(Payment.PAYMENT_STATUS_CHOICES):
+        raise ValueError(f"status must be one of {', '.join(dict(Payment.PAYMENT_STATUS_CHOICES))}")
+    return {'payment_status': status}
+
+
+def login_status(status):
+    if status not in ('success', 'failure'):
+        raise ValueError("status must be success or failure")
+    return {'success': status == 'success'}
+
+
+EXPORTS = {
+    'payments': Export(Payment, [
+        ('id', 'id'),
+        ('timestamp', 'timestamp'),
+        ('user', 'user__email'),
+        ('amount', 'amount'),
+        ('status', 'payment_status'),
+        ('subscription', 'subscription__name'),
+        ('transaction_id', 'transaction_id'),
+        ('payment_method', 'payment_method'),
+        ('refund_reason', 'refund_reason'),
+    ], payment_status),
+    'login-attempts': Export(LoginAttempt, [
+        ('id', 'id'),
+        ('timestamp', 'timestamp'),
+        ('user', 'user__email'),
+        ('success', 'success'),
+        ('ip_address', 'ip_address'),
+        ('user_agent', 'user_agent'),
+        ('location', 'location_data'),
+    ], login_status),
+}
+
+
+def parse_bound(value, name):
+    """A date or datetime query value as an aware datetime; a date means its midnight"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"{name} must be an ISO date or datetime")
+        parsed = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def plain(value):
+    """A value as JSON would carry it"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return value
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def csv_cell(value):
+    """A value for a CSV cell, with text a spreadsheet would run as a formula escaped"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    # user_agent and refund_reason come straight from users
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return plain(value)
+
+
+def render_csv(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow([csv_cell(v) for v in row])
+        if buffer.tell() >= BLOCK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def render_jsonl(headers, rows):
+    block = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(headers, map(plain, row)))) + '\n'
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block).encode()
+            block, size = [], 0
+    yield ''.join(block).encode()
+
+
+def gzip_stream(blocks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(name, format='csv', gzip=False, since=None, until=None, status=None, chunk_size=2000):
+    """
+    Encoded blocks of an export. Filters are checked here, before the first
+    block, so bad input raises ValueError instead of cutting a response short.
+    """
+    export = EXPORTS[name]
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    queryset = export.queryset(parse_bound(since, 'since'), parse_bound(until, 'until'), status)
+    render = render_csv if format == 'csv' else render_jsonl
+    blocks = render(export.headers, queryset.iterator(chunk_size=chunk_size))
+    return gzip_stream(blocks) if gzip else blocks
+
+
+async def aiter_blocks(blocks):
+    """
+    stream()'s blocks as an async iterator. Each block is produced on the
+    request's sync thread, which holds the database cursor.
+    """
+    next_block = sync_to_async(next)
+    try:
+        while (block := await next_block(blocks, None)) is not None:
+            yield block
+    finally:
+        # Releases the cursor when the client goes away mid-download
+        await sync_to_async(blocks.close)()
+
+
+def filename(name, format, gzip=False):
+    return f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{format}{'.gz' if gzip else ''}"
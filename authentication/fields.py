@@ -0,0 +1,149 @@
+import ast
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from .encryption import get_encryption_key
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON is always available
+    msgpack = None
+
+JSON_MARKER = b'j'
+MSGPACK_MARKER = b'm'
+
+
+def encode_payload(value):
+    """Serialize a value into the compact tagged payload that gets encrypted"""
+    codec = getattr(settings, 'ENCRYPTED_FIELD_CODEC', 'json')
+    if codec == 'msgpack':
+        if msgpack is None:
+            raise ImportError("ENCRYPTED_FIELD_CODEC is 'msgpack' but msgpack is not installed")
+        return MSGPACK_MARKER + msgpack.packb(value, use_bin_type=True)
+    return JSON_MARKER + json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def decode_payload(payload):
+    """Deserialize a decrypted payload written by either codec"""
+    marker, body = payload[:1], payload[1:]
+    if marker == JSON_MARKER:
+        return json.loads(body)
+    if marker == MSGPACK_MARKER:
+        if msgpack is None:
+            raise ImportError('msgpack is required to read this value')
+        return msgpack.unpackb(body, raw=False)
+    # Rows written before the field existed hold str(value)
+    return ast.literal_eval(payload.decode())
+
+
+def is_legacy_payload(payload):
+    return payload[:1] not in (JSON_MARKER, MSGPACK_MARKER)
+
+
+class Ciphertext(str):
+    """Encrypted column value, as opposed to a plaintext assignment"""
+
+
+class EncryptedJSONAttribute(DeferredAttribute):
+    """
+    Holds the ciphertext loaded from the database and decrypts it once, on
+    first access. Assigning a plaintext value marks the field dirty; an
+    untouched value is written back as-is on save without re-encrypting.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if not isinstance(value, Ciphertext):
+            return value
+        data = instance.__dict__
+        if self.field.plaintext_key not in data:
+            payload = self.field.decrypt_payload(value)
+            data[self.field.payload_key] = payload
+            data[self.field.plaintext_key] = decode_payload(payload) if payload else {}
+        return data[self.field.plaintext_key]
+
+    def __set__(self, instance, value):
+        data = instance.__dict__
+        data[self.field.attname] = value
+        data.pop(self.field.plaintext_key, None)
+        data.pop(self.field.payload_key, None)
+
+
+class EncryptedJSONField(models.TextField):
+    """Stores a JSON-serializable value encrypted with the shared keyring"""
+
+    descriptor_class = EncryptedJSONAttribute
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', dict)
+        kwargs.setdefault('blank', True)
+        super().__init__(*args, **kwargs)
+
+    @property
+    def plaintext_key(self):
+        return f'_{self.attname}_plaintext'
+
+    @property
+    def payload_key(self):
+        return f'_{self.attname}_payload'
+
+    def decrypt_payload(self, token):
+        if not token:
+            return b''
+        return get_encryption_key().decrypt(token.encode())
+
+    def decrypt(self, token):
+        payload = self.decrypt_payload(token)
+        return decode_payload(payload) if payload else {}
+
+    def encrypt(self, value):
+        if not value:
+            return Ciphertext('')
+        return Ciphertext(get_encryption_key().encrypt(encode_payload(value)).decode())
+
+    def is_dirty(self, instance):
+        data = instance.__dict__
+        value = data.get(self.attname)
+        if not isinstance(value, Ciphertext):
+            return True
+        if self.plaintext_key not in data:
+            return False
+        # The decrypted value was handed out and may have been mutated in place
+        plaintext = data[self.plaintext_key]
+        payload = encode_payload(plaintext) if plaintext else b''
+        return payload != data[self.payload_key]
+
+    def pre_save(self, model_instance, add):
+        data = model_instance.__dict__
+        if not self.is_dirty(model_instance):
+            return data[self.attname]
+        value = self.value_from_object(model_instance)
+        token = self.encrypt(value)
+        data[self.attname] = token
+        # Keep the plaintext we just wrote so it is not decrypted again
+        data[self.plaintext_key] = value
+        data[self.payload_key] = encode_payload(value) if value else b''
+        return token
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Ciphertext(value)
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, Ciphertext):
+            return value
+        return self.encrypt(value)
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj), cls=DjangoJSONEncoder)
+
+    def formfield(self, **kwargs):
+        from django.forms import JSONField
+        return super().formfield(**{'form_class': JSONField, **kwargs})
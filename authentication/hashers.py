@@ -0,0 +1,118 @@
+"""
+Password hashing off the request thread.
+
+Hashes are computed in a bounded thread pool of settings.PASSWORD_HASHING
+['WORKERS'] threads. Argon2 (argon2-cffi) and PBKDF2 (hashlib) release the
+GIL while hashing, so the pool runs on several cores at once, and a burst
+of logins queues for the pool instead of taking every worker's CPU.
+
+Only hashing runs in the pool. Database writes, such as saving an upgraded
+hash, stay on the caller's thread and connection.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'WORKERS': os.cpu_count() or 1,
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 19 * 1024,
+    'ARGON2_PARALLELISM': 1,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class TunableArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with its cost taken from settings.PASSWORD_HASHING. Hashes made
+    with other parameters report must_update, so raising the cost upgrades
+    each password on its next successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return get_config()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_config()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_config()['ARGON2_PARALLELISM']
+
+
+@lru_cache(maxsize=1)
+def get_pool():
+    return ThreadPoolExecutor(max_workers=get_config()['WORKERS'], thread_name_prefix='password-hasher')
+
+
+@receiver(setting_changed)
+def reset_pool(sender, setting, **kwargs):
+    if setting == 'PASSWORD_HASHING' and get_pool.cache_info().currsize:
+        get_pool().shutdown(wait=False)
+        get_pool.cache_clear()
+
+
+def run(fn, *args):
+    """Run fn in the hashing pool and wait for the result"""
+    return get_pool().submit(fn, *args).result()
+
+
+async def arun(fn, *args):
+    """Run fn in the hashing pool without blocking the event loop"""
+    return await asyncio.wrap_future(get_pool().submit(fn, *args))
+
+
+def check(password, encoded):
+    """(matches, must_update) for a raw password against a stored hash"""
+    must_update = []
+    matches = hashers.check_password(password, encoded, setter=must_update.append)
+    return matches, bool(must_update)
+
+
+def hash_password(password):
+    return run(hashers.make_password, password)
+
+
+async def ahash_password(password):
+    return await arun(hashers.make_password, password)
+
+
+def set_password(user, password):
+    """User.set_password with the hash computed in the pool"""
+    if password is None:
+        user.set_unusable_password()
+        return
+    user.password = hash_password(password)
+    # AbstractBaseUser.save passes it on to the password validators
+    user._password = password
+
+
+def verify_password(user, password):
+    """
+    User.check_password with the hash computed in the pool. A matching
+    password stored with an outdated hasher or cost is rehashed and saved.
+    """
+    matches, must_update = run(check, password, user.password)
+    if matches and must_update:
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return matches
+
+
+async def averify_password(user, password):
+    matches, must_update = await arun(check, password, user.password)
+    if matches and must_update:
+        user.password = await ahash_password(password)
+        await user.asave(update_fields=['password'])
+    return matches
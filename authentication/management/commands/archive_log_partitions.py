@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from authentication import partitions
+
+
+class Command(BaseCommand):
+  help = (
+    'Archives login attempts and cookie injection logs older than the retention period to gzipped JSONL, '
+    'one file per month, and drops them'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--retention-months', type=int, help='Months to keep, default LOG_PARTITIONS["RETENTION_MONTHS"]')
+    parser.add_argument('--archive-dir', help='Default LOG_PARTITIONS["ARCHIVE_DIR"]')
+    parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+    parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+  def handle(self, *args, **options):
+    started = time.monotonic()
+    archived = partitions.archive_partitions(
+      using=options['database'], retention_months=options['retention_months'],
+      archive_dir=options['archive_dir'], dry_run=options['dry_run'],
+    )
+    for table, month, count, path in archived:
+      rows = 'would be archived' if count is None else f'{count} rows'
+      self.stdout.write(f"{table} {month:%Y-%m}: {rows} -> {path}")
+    if not options['dry_run']:
+      self.stdout.write(self.style.SUCCESS(
+        f"Archived {len(archived)} months in {time.monotonic() - started:.1f}s"
+      ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from authentication.models import User
+
+
+class Command(BaseCommand):
+  help = 'Recomputes the stored subscription expiry for every user'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--chunk-size', type=int, default=5000)
+
+  def handle(self, *args, **options):
+    chunk_size = options['chunk_size']
+    started = time.monotonic()
+    total = updated = 0
+    last_pk = None
+
+    while True:
+      users = User.objects.order_by('pk')
+      if last_pk is not None:
+        users = users.filter(pk__gt=last_pk)
+      pks = list(users.values_list('pk', flat=True)[:chunk_size])
+      if not pks:
+        break
+      updated += User.objects.filter(pk__in=pks).refresh_subscription_expiry()
+      total += len(pks)
+      last_pk = pks[-1]
+      self.stdout.write(f"  {total} users processed")
+
+    elapsed = time.monotonic() - started
+    self.stdout.write(self.style.SUCCESS(f"Backfilled subscription expiry for {updated} users in {elapsed:.1f}s"))
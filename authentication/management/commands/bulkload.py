@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from authentication.bulkload import LOADERS, read_rows
+
+
+class Command(BaseCommand):
+  help = (
+    'Streams companies, branches, login types and users from CSV or JSONL files, '
+    'e.g. bulkload companies=companies.csv branches=branches.csv users=users.jsonl'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('files', nargs='+', metavar='kind=path', help=f"kind is one of {', '.join(LOADERS)}")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='Default: from the file extension')
+    parser.add_argument('--database', default='default')
+
+  def handle(self, *args, **options):
+    files = {}
+    for spec in options['files']:
+      kind, _, path = spec.partition('=')
+      if kind not in LOADERS or not path:
+        raise CommandError(f"Expected kind=path with kind one of {', '.join(LOADERS)}, got {spec!r}")
+      files[kind] = path
+
+    # Load parents first so their codes resolve for the rows that follow
+    for kind, loader_class in LOADERS.items():
+      if kind not in files:
+        continue
+      loader = loader_class(batch_size=options['batch_size'], using=options['database'])
+      stats = loader.load(read_rows(files[kind], options['format']))
+      rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+      self.stdout.write(self.style.SUCCESS(
+        f"{kind}: {stats['inserted']} inserted, {stats['rows'] - stats['inserted'] - stats['skipped']} already present, "
+        f"{stats['skipped']} skipped of {stats['rows']} rows in {stats['seconds']:.1f}s ({rate:.0f} rows/s)"
+      ))
+      for error in stats['errors']:
+        self.stderr.write(f"  {error}")
@@ -1,22 +1,14 @@
 from django.core.management.base import BaseCommand
-from authentication.models import Branch, Company
+from authentication.bulkload import BranchLoader
 
 class Command(BaseCommand):
   help = 'Creates default branches'
 
   def handle(self, *args, **kwargs):
-    try:
-      company1 = Company.objects.get(company_code='ACME')
-      company2 = Company.objects.get(company_code='GLOBEX')
-      company3 = Company.objects.get(company_code='INITECH')
-    except Company.DoesNotExist:
-      self.stderr.write("Company with code 'ACME' not found.")
-      return
-
     data = [
       {
         'branch_code': 'ACME-DHK',
-        'company': company1,
+        'company_code': 'ACME',
         'branch_name': 'Dhaka Branch',
         'address': 'Banani, Dhaka',
         'longitude': 90.4120,
@@ -24,7 +16,7 @@ class Command(BaseCommand):
       },
       {
         'branch_code': 'GLOBEX-CTG',
-        'company': company2,
+        'company_code': 'GLOBEX',
         'branch_name': 'Chittagong Branch',
         'address': 'Chawkbazar, Chittagong',
         'longitude': 91.7832,
@@ -32,7 +24,7 @@ class Command(BaseCommand):
       },
       {
         'branch_code': 'INITECH-SYL',
-        'company': company3,
+        'company_code': 'INITECH',
         'branch_name': 'Sylhet Branch',
         'address': 'Zindabazar, Sylhet',
         'longitude': 91.8714,
@@ -40,7 +32,7 @@ class Command(BaseCommand):
       },
       {
         'branch_code': 'INITECH-CTG',
-        'company': company3,
+        'company_code': 'INITECH',
         'branch_name': 'Chittagong Branch',
         'address': 'Chawkbazar, Chittagong',
         'longitude': 91.7832,
@@ -48,7 +40,7 @@ class Command(BaseCommand):
       },
       {
         'branch_code': 'INITECH-DHK',
-        'company': company3,
+        'company_code': 'INITECH',
         'branch_name': 'Dhaka Branch',
         'address': 'Banani, Dhaka',
         'longitude': 90.4120,
@@ -56,9 +48,10 @@ class Command(BaseCommand):
       }
     ]
 
-    for item in data:
-      obj, created = Branch.objects.get_or_create(branch_code=item['branch_code'], defaults=item)
-      if created:
-        self.stdout.write(self.style.SUCCESS(f"Created branch: {obj.branch_name}"))
-      else:
-        self.stdout.write(f"Branch already exists: {obj.branch_name}")
+    stats = BranchLoader().load(data)
+    self.stdout.write(self.style.SUCCESS(
+      f"Created {stats['inserted']} branches, {len(data) - stats['inserted'] - stats['skipped']} already existed"
+    ))
+    # Branches whose company has not been created yet, see createcompanies
+    for error in stats['errors']:
+      self.stderr.write(error)
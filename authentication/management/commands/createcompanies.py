@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from authentication.models import Company
+from authentication.bulkload import CompanyLoader
 
 class Command(BaseCommand):
   help = 'Creates default companies'
@@ -32,9 +32,7 @@ class Command(BaseCommand):
       },
     ]
 
-    for item in data:
-      obj, created = Company.objects.get_or_create(company_code=item['company_code'], defaults=item)
-      if created:
-        self.stdout.write(self.style.SUCCESS(f"Created company: {obj.company_name}"))
-      else:
-        self.stdout.write(f"Company already exists: {obj.company_name}")
+    stats = CompanyLoader().load(data)
+    self.stdout.write(self.style.SUCCESS(
+      f"Created {stats['inserted']} companies, {len(data) - stats['inserted']} already existed"
+    ))
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from authentication.models import LoginType
+from authentication.bulkload import LoginTypeLoader
 
 class Command(BaseCommand):
   help = 'Creates default login types'
@@ -7,9 +7,7 @@ class Command(BaseCommand):
   def handle(self, *args, **kwargs):
     types = ['fmc', 'erp', 'vendor', 'customer']
 
-    for login_type in types:
-      obj, created = LoginType.objects.get_or_create(login_type=login_type)
-      if created:
-        self.stdout.write(self.style.SUCCESS(f"Created login type: {login_type}"))
-      else:
-        self.stdout.write(f"Login type already exists: {login_type}")
+    stats = LoginTypeLoader().load({'login_type': login_type} for login_type in types)
+    self.stdout.write(self.style.SUCCESS(
+      f"Created {stats['inserted']} login types, {len(types) - stats['inserted']} already existed"
+    ))
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from authentication import exports
+
+
+class Command(BaseCommand):
+  help = 'Streams payments or login attempts to a CSV or JSONL file, optionally gzipped'
+
+  def add_arguments(self, parser):
+    parser.add_argument('name', choices=list(exports.EXPORTS))
+    parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+    parser.add_argument('--since', help='ISO date or datetime, inclusive')
+    parser.add_argument('--until', help='ISO date or datetime, exclusive')
+    parser.add_argument('--status', help='Payment status, or success/failure for login attempts')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--output', '-o', help="Default: a timestamped file in the current directory; '-' for stdout")
+
+  def handle(self, *args, **options):
+    try:
+      blocks = exports.stream(
+        options['name'], options['format'], gzip=options['gzip'], since=options['since'],
+        until=options['until'], status=options['status'], chunk_size=options['chunk_size'],
+      )
+    except ValueError as e:
+      raise CommandError(e)
+
+    output = options['output'] or exports.filename(options['name'], options['format'], options['gzip'])
+    started = time.monotonic()
+    written = 0
+    f = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+      for block in blocks:
+        f.write(block)
+        written += len(block)
+    finally:
+      if f is not sys.stdout.buffer:
+        f.close()
+    if output != '-':
+      self.stdout.write(self.style.SUCCESS(
+        f"Wrote {written / 1024:.0f} KiB to {output} in {time.monotonic() - started:.1f}s"
+      ))
@@ -0,0 +1,41 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from authentication.revocation import get_revocations, purge_expired_tokens, table_sizes
+
+
+class Command(BaseCommand):
+  help = 'Deletes expired outstanding and blacklisted tokens and reports revocation check latency'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--reload', action='store_true', help='Rebuild the revocation set from the database')
+    parser.add_argument('--samples', type=int, default=1000, help='Revocation checks to time')
+
+  def handle(self, *args, **options):
+    self.report('Before', table_sizes())
+    started = time.monotonic()
+    deleted = purge_expired_tokens(chunk_size=options['chunk_size'])
+    elapsed = time.monotonic() - started
+    self.stdout.write(f"Deleted {deleted} expired outstanding tokens in {elapsed:.1f}s")
+
+    revocations = get_revocations()
+    if options['reload']:
+      self.stdout.write(f"Loaded {revocations.load()} revoked tokens into the {revocations.name} set")
+    self.report('After', table_sizes())
+
+    samples = options['samples']
+    if samples > 0:
+      started = time.perf_counter()
+      for _ in range(samples):
+        revocations.contains(uuid.uuid4().hex)
+      mean_us = (time.perf_counter() - started) / samples * 1e6
+      self.stdout.write(self.style.SUCCESS(f"Revocation check ({revocations.name}): {mean_us:.1f}us mean over {samples}"))
+
+  def report(self, label, sizes):
+    revocation_set = 'n/a' if sizes['revocation_set'] is None else sizes['revocation_set']
+    self.stdout.write(
+      f"{label}: {sizes['outstanding']} outstanding, {sizes['blacklisted']} blacklisted, "
+      f"{revocation_set} in revocation set"
+    )
@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from authentication.encryption import get_keyring, needs_rotation
+from authentication.fields import Ciphertext
+from authentication.models import Cookie, UserService
+
+TARGETS = (
+  (UserService, 'credentials'),
+  (Cookie, 'cookie_data'),
+)
+
+
+def rotate_chunk(model, field, rows):
+  """Re-encrypt one chunk under the newest key in a short transaction"""
+  keyring = get_keyring()
+  rotated = [
+    (pk, value, Ciphertext(keyring.rotate(value.encode()).decode()))
+    for pk, value in rows
+    if needs_rotation(value)
+  ]
+  updated = 0
+  with transaction.atomic():
+    for pk, old, new in rotated:
+      # Skip rows that were rewritten since we read them
+      updated += model.objects.filter(pk=pk, **{field: old}).update(**{field: new})
+  return updated
+
+
+def rotate_chunk_in_thread(model, field, rows):
+  try:
+    return rotate_chunk(model, field, rows)
+  finally:
+    connections.close_all()
+
+
+class Command(BaseCommand):
+  help = 'Re-encrypts stored credentials and cookie data under the newest encryption key'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+
+  def handle(self, *args, **options):
+    chunk_size = options['chunk_size']
+    workers = max(options['workers'], 1)
+
+    for model, field in TARGETS:
+      total = model.objects.exclude(**{field: ''}).count()
+      label = model._meta.label
+      self.stdout.write(f"Rotating {total} {label}.{field} rows")
+      started = time.monotonic()
+      done = updated = 0
+
+      if workers == 1:
+        for chunk in self.chunks(model, field, chunk_size):
+          updated += rotate_chunk(model, field, chunk)
+          done += len(chunk)
+          self.report(label, done, total)
+      else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+          pending = []
+          for chunk in self.chunks(model, field, chunk_size):
+            pending.append((len(chunk), pool.submit(rotate_chunk_in_thread, model, field, chunk)))
+            # Bound the number of chunks held in memory
+            if len(pending) >= workers * 2:
+              size, future = pending.pop(0)
+              updated += future.result()
+              done += size
+              self.report(label, done, total)
+          for size, future in pending:
+            updated += future.result()
+            done += size
+            self.report(label, done, total)
+
+      elapsed = time.monotonic() - started
+      self.stdout.write(self.style.SUCCESS(
+        f"Re-encrypted {updated} of {total} {label} rows in {elapsed:.1f}s"
+      ))
+
+  def chunks(self, model, field, size):
+    """Walk the table by primary key so no cursor stays open between chunks"""
+    queryset = model.objects.exclude(**{field: ''}).order_by('pk').values_list('pk', field)
+    last_pk = None
+    while True:
+      page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+      chunk = list(page[:size])
+      if not chunk:
+        return
+      yield chunk
+      last_pk = chunk[-1][0]
+
+  def report(self, label, done, total):
+    percent = (done / total * 100) if total else 100
+    self.stdout.write(f"  {label}: {done}/{total} ({percent:.0f}%)")
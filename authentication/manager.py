@@ -1,36 +1,110 @@
+from datetime import timedelta
+
 from django.contrib.auth.base_user import BaseUserManager
 from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models.functions import Now
 from django.utils.translation import gettext_lazy as _
 
+from .hashers import set_password
+
+
+class UserQuerySet(models.QuerySet):
+    def with_subscription_status(self):
+        """Annotate `subscription_active` from the stored expiry, no joins"""
+        return self.annotate(
+            subscription_active=models.Case(
+                models.When(subscription_expires_at__gte=Now(), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            )
+        )
+
+    def active_subscribers(self):
+        return self.filter(subscription_expires_at__gte=Now())
+
+    def expired_subscribers(self):
+        return self.filter(
+            models.Q(subscription_expires_at__lt=Now()) | models.Q(subscription_expires_at__isnull=True)
+        )
+
+    def latest_success_payment(self):
+        Payment = self.model._meta.get_field('payments').related_model
+        return models.Subquery(
+            Payment.objects.filter(user=models.OuterRef('pk'), payment_status='success')
+            .order_by('-timestamp')
+            .values('timestamp')[:1]
+        )
+
+    def refresh_subscription_expiry(self):
+        """
+        Recompute `subscription_expires_at` in SQL, one UPDATE per
+        subscription plan, and return the number of users touched
+        """
+        Subscription = self.model._meta.get_field('subscription').related_model
+        updated = self.filter(subscription__isnull=True).update(subscription_expires_at=None)
+        plans = Subscription.objects.filter(
+            pk__in=self.filter(subscription__isnull=False).values('subscription')
+        ).values_list('pk', 'duration_days')
+        for plan_id, duration_days in plans:
+            updated += self.filter(subscription_id=plan_id).update(
+                subscription_expires_at=models.ExpressionWrapper(
+                    self.latest_success_payment() + models.Value(
+                        timedelta(days=duration_days), output_field=models.DurationField()
+                    ),
+                    output_field=models.DateTimeField(),
+                )
+            )
+        return updated
+
+
+class CookieQuerySet(models.QuerySet):
+    def currently_valid(self):
+        """Cookies that are marked valid and have not passed expires_at"""
+        return self.filter(status='valid', expires_at__gt=Now())
 
-class CustomUserManager(BaseUserManager):
-    def create_user(self, email, first_name, last_name, password=None, **extra_fields):
+    def stale(self):
+        """Cookies still marked valid although expires_at has passed"""
+        return self.filter(status='valid', expires_at__lte=Now())
+
+    def expire_stale(self, chunk_size=1000):
+        """
+        Mark stale cookies as expired in chunks, each a short indexed
+        UPDATE, and return the number of rows changed
+        """
+        expired = 0
+        while True:
+            pks = list(self.stale().values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return expired
+            expired += self.filter(pk__in=pks, status='valid').update(
+                status='expired', last_validated=Now()
+            )
+
+
+class CustomUserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError(_('The Email field must be set'))
         email = self.normalize_email(email)
-        user = self.model(
-            email=email,
-            first_name=first_name,
-            last_name=last_name,
-            **extra_fields
-        )
-        user.set_password(password)
+        user = self.model(email=email, **extra_fields)
+        set_password(user, password)
         user.save(using=self._db)
         return user
 
-    def create_superuser(self, email, first_name, last_name, password=None, **extra_fields):
+    def create_superuser(self, email, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
         extra_fields.setdefault('is_active', True)
-        extra_fields.setdefault('is_verified', True)
+        extra_fields.setdefault('email_verified', True)
 
         if extra_fields.get('is_staff') is not True:
             raise ValueError(_('Superuser must have is_staff=True.'))
         if extra_fields.get('is_superuser') is not True:
             raise ValueError(_('Superuser must have is_superuser=True.'))
 
-        mobile = extra_fields.get('mobile')
-        if mobile and self.model.objects.filter(mobile=mobile).exists():
-            raise ValidationError(_('A user with that mobile number already exists.'))
+        phone_number = extra_fields.get('phone_number')
+        if phone_number and self.model.objects.filter(phone_number=phone_number).exists():
+            raise ValidationError(_('A user with that phone number already exists.'))
 
-        return self.create_user(email, first_name, last_name, password, **extra_fields)
\ No newline at end of file
+        return self.create_user(email, password, **extra_fields)
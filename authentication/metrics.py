@@ -0,0 +1,267 @@
+"""
+Request metrics in Prometheus text format, without sending traces off-box.
+
+MetricsMiddleware records per view (URL name), method and status class:
+- latency (seconds)
+- database queries per request
+- response body size (bytes, non-streaming responses only)
+
+Each is a cumulative histogram. Views are labelled by URL name, so label
+cardinality stays bounded.
+
+Counts live in a per-process Registry. Every PUBLISH_INTERVAL seconds a
+process copies its snapshot into the shared cache. /metrics sums the
+snapshots of every live process, so one scrape covers all workers behind
+the same cache. With the local-memory cache it only covers the process
+that answers.
+
+Queries are counted by a wrapper installed on every new database
+connection. The wrapper increments a per-request counter held in a
+ContextVar, which also follows async views into their sync_to_async
+threads.
+"""
+import contextvars
+import hmac
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+DEFAULTS = {
+    'ENABLED': True,
+    # /metrics needs this bearer token or a REMOTE_ADDR in ALLOWED_IPS;
+    # with neither configured nobody can scrape it
+    'TOKEN': None,
+    'ALLOWED_IPS': (),
+    'PUBLISH_INTERVAL': 10,
+    'CACHE_PREFIX': 'metrics',
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'QUERY_BUCKETS': (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    'SIZE_BUCKETS': (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+    'EXCLUDE_PATHS': ('/metrics',),
+}
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('LATENCY_BUCKETS', 'Request latency by view'),
+    'http_request_db_queries': ('QUERY_BUCKETS', 'Database queries per request by view'),
+    'http_response_size_bytes': ('SIZE_BUCKETS', 'Response body size by view'),
+}
+
+_query_count = contextvars.ContextVar('metrics_query_count', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class Registry:
+    """
+    Cumulative histograms keyed by (metric, labels). A series is
+    [bucket counts..., +Inf count, sum]. Only the first len(buckets)
+    entries are per bucket; they are made cumulative when rendered.
+    """
+
+    def __init__(self, config):
+        self.buckets = {name: tuple(config[key]) for name, (key, _) in HISTOGRAMS.items()}
+        self.series = {}
+        self.lock = threading.Lock()
+        self.published_at = 0.0
+
+    def observe(self, name, labels, value):
+        buckets = self.buckets[name]
+        with self.lock:
+            series = self.series.get((name, labels))
+            if series is None:
+                series = self.series[(name, labels)] = [0] * (len(buckets) + 2)
+            series[bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {key: list(series) for key, series in self.series.items()}
+
+
+@lru_cache(maxsize=1)
+def get_registry():
+    return Registry(get_config())
+
+
+@receiver(setting_changed)
+def reset_registry(sender, setting, **kwargs):
+    if setting == 'METRICS':
+        get_registry.cache_clear()
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    # Fired on every reconnect of the same wrapper, so guard against stacking
+    if query_counter not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_counter)
+
+
+def query_counter(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def process_key(config):
+    return f"{config['CACHE_PREFIX']}:{socket.gethostname()}:{os.getpid()}"
+
+
+def publish(registry, config, force=False):
+    """Copy this process's snapshot into the shared cache, at most every PUBLISH_INTERVAL"""
+    now = time.monotonic()
+    if not force and now - registry.published_at < config['PUBLISH_INTERVAL']:
+        return
+    registry.published_at = now
+    timeout = config['PUBLISH_INTERVAL'] * 6
+    key = process_key(config)
+    index_key = f"{config['CACHE_PREFIX']}:processes"
+    cache.set(key, registry.snapshot(), timeout)
+    # The index is read-modify-write; a lost update is repaired on the next publish
+    processes = cache.get(index_key) or {}
+    processes[key] = time.time() + timeout
+    cache.set(index_key, {k: expiry for k, expiry in processes.items() if expiry > time.time()}, None)
+
+
+def collect(config):
+    """Sum of the snapshots of every live process"""
+    registry = get_registry()
+    publish(registry, config, force=True)
+    processes = cache.get(f"{config['CACHE_PREFIX']}:processes") or {}
+    totals = {}
+    for snapshot in cache.get_many(list(processes)).values():
+        for key, series in snapshot.items():
+            total = totals.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+    return registry.buckets, totals
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def render(buckets, totals, gauges=()):
+    lines = []
+    for name, (_, help_text) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (series_name, labels), series in sorted(totals.items()):
+            if series_name != name:
+                continue
+            label_text = format_labels(labels)
+            cumulative = 0
+            for bound, count in zip(buckets[name], series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            count = sum(series[:-1])
+            lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{label_text}}} {series[-1]}')
+            lines.append(f'{name}_count{{{label_text}}} {count}')
+    for name, help_text, kind, samples in gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for labels, value in samples:
+            lines.append(f'{name}{{{format_labels(labels)}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def process_gauges():
+    """This process's cache and revocation counters"""
+    from .revocation import get_revocations
+    from .user_cache import get_user_cache
+
+    user_cache = get_user_cache().stats()
+    revocations = get_revocations().stats()
+    return [
+        ('user_cache_lookups_total', 'JWT user lookups in this process by outcome', 'counter', [
+            ((('outcome', outcome),), user_cache[outcome]) for outcome in ('local_hits', 'shared_hits', 'misses')
+        ]),
+        ('token_revocation_checks_total', 'Refresh token revocation checks in this process', 'counter', [
+            ((('backend', revocations['backend']),), revocations['checks'])
+        ]),
+        ('token_revocation_check_seconds_mean', 'Mean revocation check time in this process', 'gauge', [
+            ((('backend', revocations['backend']),), revocations['mean_check_us'] / 1e6)
+        ]),
+    ]
+
+
+def scrape_allowed(request, config):
+    token = config['TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS']
+
+
+def metrics_view(request):
+    config = get_config()
+    if not scrape_allowed(request, config):
+        return HttpResponseForbidden()
+    buckets, totals = collect(config)
+    return HttpResponse(render(buckets, totals, process_gauges()), content_type='text/plain; version=0.0.4')
+
+
+class MetricsMiddleware:
+    """Records latency, query count and response size per view; sync and async capable"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            count_queries(None, connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_config()
+        if not config['ENABLED'] or request.path in config['EXCLUDE_PATHS']:
+            return self.get_response(request)
+        token = _query_count.set([0])
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self.record(config, request, response, time.perf_counter() - started)
+        finally:
+            _query_count.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not config['ENABLED'] or request.path in config['EXCLUDE_PATHS']:
+            return await self.get_response(request)
+        token = _query_count.set([0])
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self.record(config, request, response, time.perf_counter() - started)
+        finally:
+            _query_count.reset(token)
+        return response
+
+    def record(self, config, request, response, elapsed):
+        match = request.resolver_match
+        view = (match.view_name or match.route) if match else '<unmatched>'
+        labels = (('view', view), ('method', request.method), ('status', f'{response.status_code // 100}xx'))
+        registry = get_registry()
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        registry.observe('http_request_db_queries', labels, _query_count.get()[0])
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', labels, len(response.content))
+        publish(registry, config)
@@ -0,0 +1,511 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:51
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.migrations.exceptions import IrreversibleError
+
+
+def referencing_columns(schema_editor, table):
+    """(table, column, constraint) for every foreign key pointing at table.id."""
+    introspection = schema_editor.connection.introspection
+    with schema_editor.connection.cursor() as cursor:
+        return [
+            (other, info['columns'][0], name)
+            for other in introspection.table_names(cursor)
+            for name, info in introspection.get_constraints(cursor, other).items()
+            if info['foreign_key'] == (table, 'id')
+        ]
+
+
+class LegacyUserIds(migrations.AlterField):
+    """
+    Switch User.id from BigAutoField to UUIDField without losing rows.
+
+    Legacy id n becomes UUID(int=n) in the user table and in every column
+    that references it, so existing users keep their groups, permissions,
+    tokens and audit links; users created afterwards get random UUIDs.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        table = from_state.apps.get_model(app_label, self.model_name)._meta.db_table
+        if schema_editor.connection.vendor == 'postgresql':
+            self.alter_postgres(
+                schema_editor, table, 'uuid', "lpad(to_hex({column}), 32, '0')::uuid",
+            )
+            return
+        # SQLite rebuilds the tables and copies the integers into the char(32)
+        # columns as they are; pad them into the same hex form.
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+        quote = schema_editor.quote_name
+        for other, column in self.columns(schema_editor, table):
+            schema_editor.execute(
+                f'UPDATE {quote(other)} SET {quote(column)} = printf(%s, {quote(column)}) '
+                f'WHERE length({quote(column)}) < 32',
+                ['%032x'],
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        table = from_state.apps.get_model(app_label, self.model_name)._meta.db_table
+        quote = schema_editor.quote_name
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'SELECT {quote("id")} FROM {quote(table)}')
+            ids = [uuid.UUID(str(pk)) for pk, in cursor.fetchall()]
+        if any(pk.int >= 2 ** 63 for pk in ids):
+            raise IrreversibleError(
+                'Users created after 0004 have UUID ids that do not fit a bigint.'
+            )
+        if schema_editor.connection.vendor == 'postgresql':
+            self.alter_postgres(
+                schema_editor, table, 'bigint',
+                "('x' || right(replace({column}::text, '-', ''), 16))::bit(64)::bigint",
+            )
+            return
+        for other, column in self.columns(schema_editor, table):
+            for pk in ids:
+                schema_editor.execute(
+                    f'UPDATE {quote(other)} SET {quote(column)} = %s WHERE {quote(column)} = %s',
+                    [str(pk.int), pk.hex],
+                )
+        # AlterField reverses by running its forwards with the states swapped
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def columns(self, schema_editor, table):
+        return [(table, 'id')] + [
+            (other, column) for other, column, _ in referencing_columns(schema_editor, table)
+        ]
+
+    def alter_postgres(self, schema_editor, table, db_type, using):
+        # The bigint and uuid types have no cast between them, so the columns
+        # are converted by hand with the foreign keys dropped in between.
+        quote = schema_editor.quote_name
+        references = referencing_columns(schema_editor, table)
+        for other, column, name in references:
+            schema_editor.execute(f'ALTER TABLE {quote(other)} DROP CONSTRAINT {quote(name)}')
+        if db_type == 'uuid':
+            schema_editor.execute(
+                f'ALTER TABLE {quote(table)} ALTER COLUMN {quote("id")} DROP IDENTITY IF EXISTS'
+            )
+        for other, column in [(table, 'id')] + [(o, c) for o, c, _ in references]:
+            schema_editor.execute(
+                f'ALTER TABLE {quote(other)} ALTER COLUMN {quote(column)} '
+                f'TYPE {db_type} USING {using.format(column=quote(column))}'
+            )
+        if db_type == 'bigint':
+            schema_editor.execute(
+                f'ALTER TABLE {quote(table)} ALTER COLUMN {quote("id")} '
+                f'ADD GENERATED BY DEFAULT AS IDENTITY'
+            )
+            schema_editor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f'coalesce(max({quote("id")}), 0) + 1, false) FROM {quote(table)}',
+                [table],
+            )
+        for other, column, name in references:
+            schema_editor.execute(
+                f'ALTER TABLE {quote(other)} ADD CONSTRAINT {quote(name)} '
+                f'FOREIGN KEY ({quote(column)}) REFERENCES {quote(table)} ({quote("id")}) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0003_alter_user_branch_alter_user_company_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cookie',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('_cookie_data', models.TextField()),
+                ('extracted_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('valid', 'Valid'), ('expired', 'Expired'), ('revoked', 'Revoked')], default='valid', max_length=20)),
+                ('last_validated', models.DateTimeField(auto_now=True)),
+                ('validation_errors', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8, validators=[django.core.validators.MinValueValidator(0)])),
+                ('duration_days', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('features', models.JSONField(default=dict)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='user',
+            options={},
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='date_joined',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='email_verified',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='full_name',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_admin',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='two_factor_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='email address'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups'),
+        ),
+        LegacyUserIds(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='last_login',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='user_permissions',
+            field=models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions'),
+        ),
+        # The User columns and the Company, Branch and LoginType tables that the
+        # models dropped stay in the database with their data; they only leave
+        # the migration state (0012 takes the tables back). Columns Django no
+        # longer writes become nullable and foreign keys to User lose their
+        # constraints, so new rows and deletes don't trip over them.
+        migrations.AlterField(
+            model_name='user',
+            name='username',
+            field=models.CharField(max_length=255, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='mobile',
+            field=models.CharField(max_length=15, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='first_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='last_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='created_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='last_update',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_deleted',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_verified',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='status',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='deleted_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='updated_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='deleted_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='updated_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='branch',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='branch',
+            name='deleted_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='branch',
+            name='updated_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='logintype',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='logintype',
+            name='deleted_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='logintype',
+            name='updated_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='authentication.subscription'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='user',
+                    name='branch',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='created_by',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='deleted_by',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='updated_by',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='company',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='created_by',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='deleted_by',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='updated_by',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='login_type',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='created_by',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='created_date',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='deleted_by',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='deleted_date',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='first_name',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='is_deleted',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='is_verified',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='last_name',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='last_update',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='mobile',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='role_id',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='status',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='updated_by',
+                ),
+                migrations.RemoveField(
+                    model_name='user',
+                    name='username',
+                ),
+                migrations.DeleteModel(
+                    name='Branch',
+                ),
+                migrations.DeleteModel(
+                    name='Company',
+                ),
+                migrations.DeleteModel(
+                    name='LoginType',
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CookieInjectionLog',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('injection_status', models.CharField(choices=[('success', 'Success'), ('failure', 'Failure')], max_length=20)),
+                ('message', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('ip_address', models.GenericIPAddressField(null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('request_data', models.JSONField(default=dict)),
+                ('cookie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='injection_logs', to='authentication.cookie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LoginAttempt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('success', models.BooleanField()),
+                ('ip_address', models.GenericIPAddressField()),
+                ('user_agent', models.TextField()),
+                ('location_data', models.JSONField(default=dict)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='login_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Service',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('login_url', models.URLField()),
+                ('description', models.TextField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('required_subscription', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services', to='authentication.subscription')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed'), ('refunded', 'Refunded')], default='pending', max_length=20)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('transaction_id', models.CharField(max_length=255, unique=True)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('billing_details', models.JSONField(default=dict)),
+                ('refund_reason', models.TextField(blank=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to=settings.AUTH_USER_MODEL)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='authentication.subscription')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserService',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('_credentials', models.TextField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(null=True)),
+                ('usage_count', models.IntegerField(default=0)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_services', to='authentication.service')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_services', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cookie',
+            name='user_service',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cookies', to='authentication.userservice'),
+        ),
+    ]
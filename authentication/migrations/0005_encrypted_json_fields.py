@@ -0,0 +1,82 @@
+from django.db import migrations
+
+import authentication.fields
+from authentication.encryption import get_encryption_key
+from authentication.fields import Ciphertext, decode_payload, encode_payload, is_legacy_payload
+
+CHUNK_SIZE = 500
+
+
+def convert_rows(model, field, convert):
+    keyring = get_encryption_key()
+    queryset = model.objects.exclude(**{field: Ciphertext('')}).order_by('pk').values_list('pk', field)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:CHUNK_SIZE])
+        if not rows:
+            return
+        for pk, token in rows:
+            payload = convert(keyring.decrypt(token.encode()))
+            if payload is not None:
+                new_token = Ciphertext(keyring.encrypt(payload).decode())
+                model.objects.filter(pk=pk).update(**{field: new_token})
+        last_pk = rows[-1][0]
+
+
+def to_json(payload):
+    if not is_legacy_payload(payload):
+        return None
+    return encode_payload(decode_payload(payload))
+
+
+def to_legacy(payload):
+    if is_legacy_payload(payload):
+        return None
+    return str(decode_payload(payload)).encode()
+
+
+def encode_rows(apps, schema_editor):
+    convert_rows(apps.get_model('authentication', 'UserService'), 'credentials', to_json)
+    convert_rows(apps.get_model('authentication', 'Cookie'), 'cookie_data', to_json)
+
+
+def decode_rows(apps, schema_editor):
+    convert_rows(apps.get_model('authentication', 'UserService'), 'credentials', to_legacy)
+    convert_rows(apps.get_model('authentication', 'Cookie'), 'cookie_data', to_legacy)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_sync_models_with_schema'),
+    ]
+
+    operations = [
+        # The columns keep their names, only the model attributes change
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='userservice',
+                    old_name='_credentials',
+                    new_name='credentials',
+                ),
+                migrations.AlterField(
+                    model_name='userservice',
+                    name='credentials',
+                    field=authentication.fields.EncryptedJSONField(blank=True, db_column='_credentials', default=dict),
+                ),
+                migrations.RenameField(
+                    model_name='cookie',
+                    old_name='_cookie_data',
+                    new_name='cookie_data',
+                ),
+                migrations.AlterField(
+                    model_name='cookie',
+                    name='cookie_data',
+                    field=authentication.fields.EncryptedJSONField(blank=True, db_column='_cookie_data', default=dict),
+                ),
+            ],
+        ),
+        migrations.RunPython(encode_rows, decode_rows),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_encrypted_json_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='subscription_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_user_subscription_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cookie',
+            index=models.Index(fields=['user_service', 'status', 'expires_at'], name='cookie_service_status_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cookieinjectionlog',
+            index=models.Index(fields=['cookie', 'timestamp'], name='injectionlog_cookie_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['user', 'timestamp'], name='loginattempt_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'payment_status', '-timestamp'], name='payment_user_status_ts_idx'),
+        ),
+    ]
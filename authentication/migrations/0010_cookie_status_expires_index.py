@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cookie',
+            index=models.Index(fields=['status', 'expires_at'], name='cookie_status_expires_idx'),
+        ),
+    ]
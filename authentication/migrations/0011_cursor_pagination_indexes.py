@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_cookie_status_expires_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cookie',
+            index=models.Index(fields=['user_service', '-extracted_at', '-id'], name='cookie_service_extracted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='payment_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userservice',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='userservice_user_created_idx'),
+        ),
+    ]
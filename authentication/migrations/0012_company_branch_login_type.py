@@ -0,0 +1,249 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deactivate_deleted(apps, schema_editor):
+    # The models have no soft delete; a deleted row is an inactive one
+    for name in ('Company', 'Branch', 'LoginType'):
+        apps.get_model('authentication', name).objects.filter(is_deleted=True).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('authentication', '0011_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        # 0004 removed Company, Branch, LoginType and the User foreign keys
+        # from the migration state only; the tables, columns and rows are
+        # still there. Take them back as they stand in the database, then
+        # reshape them into the current models.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Company',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('created_date', models.DateTimeField(auto_now_add=True)),
+                        ('last_update', models.DateTimeField(auto_now=True)),
+                        ('is_deleted', models.BooleanField(default=False)),
+                        ('deleted_date', models.DateTimeField(blank=True, null=True)),
+                        ('status', models.BooleanField(default=True)),
+                        ('company_name', models.CharField(max_length=255)),
+                        ('company_code', models.CharField(max_length=255, unique=True)),
+                        ('company_type', models.CharField(max_length=255)),
+                        ('head_office', models.CharField(max_length=255)),
+                        ('longitude', models.FloatField(blank=True, null=True)),
+                        ('latitude', models.FloatField(blank=True, null=True)),
+                        ('created_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL)),
+                        ('deleted_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL)),
+                        ('updated_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL)),
+                    ],
+                ),
+                migrations.CreateModel(
+                    name='Branch',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('created_date', models.DateTimeField(auto_now_add=True)),
+                        ('last_update', models.DateTimeField(auto_now=True)),
+                        ('is_deleted', models.BooleanField(default=False)),
+                        ('deleted_date', models.DateTimeField(blank=True, null=True)),
+                        ('status', models.BooleanField(default=True)),
+                        ('branch_code', models.CharField(max_length=255, unique=True)),
+                        ('branch_name', models.CharField(max_length=255)),
+                        ('address', models.CharField(max_length=255)),
+                        ('longitude', models.FloatField(blank=True, null=True)),
+                        ('latitude', models.FloatField(blank=True, null=True)),
+                        ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='branches', to='authentication.company')),
+                        ('created_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL)),
+                        ('deleted_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL)),
+                        ('updated_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL)),
+                    ],
+                ),
+                migrations.CreateModel(
+                    name='LoginType',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('created_date', models.DateTimeField(auto_now_add=True)),
+                        ('last_update', models.DateTimeField(auto_now=True)),
+                        ('is_deleted', models.BooleanField(default=False)),
+                        ('deleted_date', models.DateTimeField(blank=True, null=True)),
+                        ('status', models.BooleanField(default=True)),
+                        ('login_type', models.CharField(max_length=255, unique=True)),
+                        ('created_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created_by', to=settings.AUTH_USER_MODEL)),
+                        ('deleted_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_deleted_by', to=settings.AUTH_USER_MODEL)),
+                        ('updated_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated_by', to=settings.AUTH_USER_MODEL)),
+                    ],
+                ),
+                migrations.AddField(
+                    model_name='user',
+                    name='branch',
+                    field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='authentication.branch'),
+                ),
+                migrations.AddField(
+                    model_name='user',
+                    name='company',
+                    field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='authentication.company'),
+                ),
+                migrations.AddField(
+                    model_name='user',
+                    name='login_type',
+                    field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='authentication.logintype'),
+                ),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='company',
+            old_name='created_date',
+            new_name='created_at',
+        ),
+        migrations.RenameField(
+            model_name='company',
+            old_name='last_update',
+            new_name='updated_at',
+        ),
+        migrations.RenameField(
+            model_name='company',
+            old_name='status',
+            new_name='is_active',
+        ),
+        migrations.RenameField(
+            model_name='branch',
+            old_name='created_date',
+            new_name='created_at',
+        ),
+        migrations.RenameField(
+            model_name='branch',
+            old_name='last_update',
+            new_name='updated_at',
+        ),
+        migrations.RenameField(
+            model_name='branch',
+            old_name='status',
+            new_name='is_active',
+        ),
+        migrations.RenameField(
+            model_name='logintype',
+            old_name='created_date',
+            new_name='created_at',
+        ),
+        migrations.RenameField(
+            model_name='logintype',
+            old_name='last_update',
+            new_name='updated_at',
+        ),
+        migrations.RenameField(
+            model_name='logintype',
+            old_name='status',
+            new_name='is_active',
+        ),
+        migrations.RunPython(deactivate_deleted, migrations.RunPython.noop),
+        # Soft delete and audit columns stay in the database, unused
+        migrations.AlterField(
+            model_name='company',
+            name='is_deleted',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='branch',
+            name='is_deleted',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='logintype',
+            name='is_deleted',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='company',
+                    name='is_deleted',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='deleted_date',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='created_by',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='deleted_by',
+                ),
+                migrations.RemoveField(
+                    model_name='company',
+                    name='updated_by',
+                ),
+                migrations.RemoveField(
+                    model_name='branch',
+                    name='is_deleted',
+                ),
+                migrations.RemoveField(
+                    model_name='branch',
+                    name='deleted_date',
+                ),
+                migrations.RemoveField(
+                    model_name='branch',
+                    name='created_by',
+                ),
+                migrations.RemoveField(
+                    model_name='branch',
+                    name='deleted_by',
+                ),
+                migrations.RemoveField(
+                    model_name='branch',
+                    name='updated_by',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='is_deleted',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='deleted_date',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='created_by',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='deleted_by',
+                ),
+                migrations.RemoveField(
+                    model_name='logintype',
+                    name='updated_by',
+                ),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='branch',
+            options={'verbose_name_plural': 'branches'},
+        ),
+        migrations.AlterModelOptions(
+            name='company',
+            options={'verbose_name_plural': 'companies'},
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='authentication.branch'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='authentication.company'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='login_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='authentication.logintype'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_company_branch_login_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['timestamp', 'id'], name='loginattempt_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['timestamp', 'id'], name='payment_ts_idx'),
+        ),
+    ]
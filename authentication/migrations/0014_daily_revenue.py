@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0013_export_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(max_length=50)),
+                ('success_count', models.IntegerField(default=0)),
+                ('success_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_count', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='authentication.subscription')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'subscription', 'payment_method'), name='dailyrevenue_bucket_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# (table, expression) for every admin search field. Django compiles
+# field__icontains to UPPER(<column>::text) LIKE UPPER(%s) on PostgreSQL
+# (HOST(<column>) for inet), and a GIN trigram index on that same
+# expression serves it.
+SEARCHED = [
+    ('authentication_user', 'email', 'UPPER("email"::text)'),
+    ('authentication_user', 'full_name', 'UPPER("full_name"::text)'),
+    ('authentication_subscription', 'name', 'UPPER("name"::text)'),
+    ('authentication_service', 'name', 'UPPER("name"::text)'),
+    ('authentication_payment', 'transaction_id', 'UPPER("transaction_id"::text)'),
+    ('authentication_cookieinjectionlog', 'message', 'UPPER("message"::text)'),
+    ('authentication_outboxemail', 'subject', 'UPPER("subject"::text)'),
+    ('authentication_loginattempt', 'ip_address', 'UPPER(HOST("ip_address"))'),
+]
+
+
+def index_name(table, column):
+    return f"{table.removeprefix('authentication_')}_{column}_trgm_idx"
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column, expression in SEARCHED:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name(table, column)}" '
+            f'ON "{table}" USING gin (({expression}) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column, _ in SEARCHED:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and keeps
+    # the audit tables writable while the indexes build
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0014_daily_revenue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from authentication.partitions import convert_table
+
+TABLES = ('authentication_loginattempt', 'authentication_cookieinjectionlog')
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        convert_table(schema_editor.connection, table, partitioned=True)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        convert_table(schema_editor.connection, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    # Copies every row of both tables while holding their locks; on a large
+    # install plan the downtime or run it in a maintenance window
+
+    dependencies = [
+        ('authentication', '0015_admin_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,98 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import permissions, status
+from rest_framework.response import Response
+
+from .cache import CATALOG_CACHE_TIMEOUT, catalog_response_key, strong_etag
+from .serializers import requested_fields
+
+class ListDetailSerializerMixin:
+    """
+    Use a lighter serializer for list responses and keep the columns it
+    does not render (typically encrypted blobs) out of the SELECT.
+    """
+
+    list_serializer_class = None
+    list_deferred_fields = ()
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and self.list_deferred_fields:
+            queryset = queryset.defer(*self.list_deferred_fields)
+        return queryset
+
+
+class SparseFieldsMixin:
+    """Select only the columns behind the fields requested with ?fields="""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        requested = requested_fields(self.request)
+        if not requested or self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+
+        rendered = set(self.get_serializer_class().Meta.fields)
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = requested & rendered & concrete
+        if columns:
+            # A cursor paginator reads its ordering columns off the rows to
+            # build the next link; deferred, each would cost a query per row
+            ordering = getattr(self.paginator, 'ordering', ())
+            if isinstance(ordering, str):
+                ordering = (ordering,)
+            ordering = {name.lstrip('-') for name in ordering}
+            queryset = queryset.only(queryset.model._meta.pk.name, *columns, *ordering)
+        return queryset
+
+
+class CachedCatalogMixin:
+    """
+    Serve list and detail responses from the shared cache with a strong
+    ETag. Entries are dropped when the catalog changes (see signals.py),
+    and a matching If-None-Match gets a bodyless 304.
+    """
+
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_entry(self, request):
+        key = catalog_response_key(self.catalog_name, request)
+        return key, cache.get(key)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        key, entry = self.cached_entry(request)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {'data': response.data, 'etag': strong_etag(response.data)}
+            cache.set(key, entry, CATALOG_CACHE_TIMEOUT)
+        return self.etag_response(request, entry)
+
+    async def acached_response(self, request, view, *args, **kwargs):
+        # Django's cache backends are sync, so look up the version and the entry in one hop
+        key, entry = await sync_to_async(self.cached_entry)(request)
+        if entry is None:
+            response = await view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {'data': response.data, 'etag': await sync_to_async(strong_etag)(response.data)}
+            await cache.aset(key, entry, CATALOG_CACHE_TIMEOUT)
+        return self.etag_response(request, entry)
+
+    def etag_response(self, request, entry):
+        etag = entry['etag']
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(entry['data'], headers={'ETag': etag})
@@ -2,15 +2,54 @@ import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
-from .manager import CustomUserManager
+from .manager import CookieQuerySet, CustomUserManager
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.utils import timezone
-from cryptography.fernet import Fernet
+from .fields import EncryptedJSONField
 
-def get_encryption_key():
-    """Get or create encryption key for sensitive data"""
-    return Fernet(settings.ENCRYPTION_KEY.encode())
+class Company(models.Model):
+    company_name = models.CharField(max_length=255)
+    company_code = models.CharField(max_length=255, unique=True)
+    company_type = models.CharField(max_length=255)
+    head_office = models.CharField(max_length=255)
+    longitude = models.FloatField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'companies'
+
+    def __str__(self):
+        return self.company_name
+
+class Branch(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='branches')
+    branch_code = models.CharField(max_length=255, unique=True)
+    branch_name = models.CharField(max_length=255)
+    address = models.CharField(max_length=255)
+    longitude = models.FloatField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'branches'
+
+    def __str__(self):
+        return self.branch_name
+
+class LoginType(models.Model):
+    login_type = models.CharField(max_length=255, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.login_type
 
 class User(AbstractBaseUser, PermissionsMixin):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -31,6 +70,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     email_verified = models.BooleanField(default=False)
     phone_number = models.CharField(max_length=15, null=True, blank=True)
     two_factor_enabled = models.BooleanField(default=False)
+    # Denormalized from Payment/Subscription, kept current by signals
+    subscription_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+    company = models.ForeignKey(Company, null=True, blank=True, on_delete=models.SET_NULL, related_name='users')
+    branch = models.ForeignKey(Branch, null=True, blank=True, on_delete=models.SET_NULL, related_name='users')
+    login_type = models.ForeignKey(LoginType, null=True, blank=True, on_delete=models.SET_NULL, related_name='users')
 
     objects = CustomUserManager()
 
@@ -40,19 +84,57 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
-    def has_subscription(self):
-        """Check if user has an active subscription"""
-        if not self.subscription:
-            return False
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_subscription_id = instance.__dict__.get('subscription_id')
+        # Cached module profiles are keyed by email, see profiles.py
+        instance._loaded_email = instance.__dict__.get('email')
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_subscription_id', None)
+        update_fields = kwargs.get('update_fields')
+        if self.subscription_id != loaded:
+            self.subscription_expires_at = self.compute_subscription_expiry()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'subscription_expires_at'}
+        elif update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # The Payment and Subscription signals update the stored expiry in
+            # SQL, so an instance loaded before them holds a stale copy
+            kwargs['update_fields'] = {
+                field.attname for field in self._meta.concrete_fields if not field.primary_key
+            } - self.get_deferred_fields() - {'subscription_expires_at'}
+        super().save(*args, **kwargs)
+        self._loaded_subscription_id = self.subscription_id
+        self._loaded_email = self.email
+
+    def compute_subscription_expiry(self):
+        """Work out the expiry from the latest successful payment"""
+        if not self.subscription_id or self.pk is None or self._state.adding:
+            return None
         latest_payment = self.payments.filter(
             payment_status='success'
         ).order_by('-timestamp').first()
         if not latest_payment:
-            return False
-        expiry_date = latest_payment.timestamp + timezone.timedelta(
+            return None
+        return latest_payment.timestamp + timezone.timedelta(
             days=self.subscription.duration_days
         )
-        return timezone.now() <= expiry_date
+
+    def tokens(self):
+        from .tokens import RefreshToken
+        refresh = RefreshToken.for_user(self)
+        return {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+
+    def has_subscription(self):
+        """Check if user has an active subscription"""
+        if not self.subscription_expires_at:
+            return False
+        return timezone.now() <= self.subscription_expires_at
 
 class Subscription(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -107,9 +189,37 @@ class Payment(models.Model):
     billing_details = models.JSONField(default=dict)
     refund_reason = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'payment_status', '-timestamp'], name='payment_user_status_ts_idx'),
+            models.Index(fields=['user', '-timestamp', '-id'], name='payment_user_ts_idx'),
+            # Date-range exports across all users, see exports.py
+            models.Index(fields=['timestamp', 'id'], name='payment_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.amount} - {self.payment_status}"
 
+class DailyRevenue(models.Model):
+    """Payment totals per day, plan and payment method, kept current by signals (see revenue.py)"""
+    date = models.DateField()
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='daily_revenue')
+    payment_method = models.CharField(max_length=50)
+    success_count = models.IntegerField(default=0)
+    success_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_count = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    failed_count = models.IntegerField(default=0)
+    pending_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'subscription', 'payment_method'], name='dailyrevenue_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.subscription_id} - {self.payment_method}"
+
 class Service(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=50)
@@ -140,30 +250,16 @@ class UserService(models.Model):
         on_delete=models.CASCADE,
         related_name='user_services'
     )
-    _credentials = models.TextField()  # Encrypted credentials
+    credentials = EncryptedJSONField(db_column='_credentials')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_used = models.DateTimeField(null=True)
     usage_count = models.IntegerField(default=0)
 
-    @property
-    def credentials(self):
-        """Decrypt credentials before returning"""
-        if not self._credentials:
-            return {}
-        fernet = get_encryption_key()
-        decrypted = fernet.decrypt(self._credentials.encode())
-        return eval(decrypted.decode())
-
-    @credentials.setter
-    def credentials(self, value):
-        """Encrypt credentials before saving"""
-        if not value:
-            self._credentials = ''
-            return
-        fernet = get_encryption_key()
-        encrypted = fernet.encrypt(str(value).encode())
-        self._credentials = encrypted.decode()
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='userservice_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.service.name}"
@@ -181,7 +277,7 @@ class Cookie(models.Model):
         on_delete=models.CASCADE,
         related_name='cookies'
     )
-    _cookie_data = models.TextField()  # Encrypted cookie data
+    cookie_data = EncryptedJSONField(db_column='_cookie_data')
     extracted_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     status = models.CharField(
@@ -192,24 +288,14 @@ class Cookie(models.Model):
     last_validated = models.DateTimeField(auto_now=True)
     validation_errors = models.TextField(blank=True)
 
-    @property
-    def cookie_data(self):
-        """Decrypt cookie data before returning"""
-        if not self._cookie_data:
-            return {}
-        fernet = get_encryption_key()
-        decrypted = fernet.decrypt(self._cookie_data.encode())
-        return eval(decrypted.decode())
-
-    @cookie_data.setter
-    def cookie_data(self, value):
-        """Encrypt cookie data before saving"""
-        if not value:
-            self._cookie_data = ''
-            return
-        fernet = get_encryption_key()
-        encrypted = fernet.encrypt(str(value).encode())
-        self._cookie_data = encrypted.decode()
+    objects = CookieQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_service', 'status', 'expires_at'], name='cookie_service_status_exp_idx'),
+            models.Index(fields=['status', 'expires_at'], name='cookie_status_expires_idx'),
+            models.Index(fields=['user_service', '-extracted_at', '-id'], name='cookie_service_extracted_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_service.service.name} cookie for {self.user_service.user.email}"
@@ -237,11 +323,16 @@ class CookieInjectionLog(models.Model):
         choices=INJECTION_STATUS_CHOICES
     )
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True)
     user_agent = models.TextField(blank=True)
     request_data = models.JSONField(default=dict)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['cookie', 'timestamp'], name='injectionlog_cookie_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.cookie.user_service.service.name} injection - {self.injection_status}"
 
@@ -252,11 +343,48 @@ class LoginAttempt(models.Model):
         on_delete=models.CASCADE,
         related_name='login_attempts'
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     success = models.BooleanField()
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField()
     location_data = models.JSONField(default=dict)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='loginattempt_user_ts_idx'),
+            models.Index(fields=['timestamp', 'id'], name='loginattempt_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {'Success' if self.success else 'Failure'}"
+
+
+class OutboxEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed')
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} - {self.status}"
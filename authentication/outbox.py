@@ -0,0 +1,141 @@
+"""
+Transactional email outbox. Views write an OutboxEmail row in the same
+transaction as the change that triggers it; a worker sends due rows in
+batches over one SMTP connection and retries failures with backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 100
+PUBLISH_TIMEOUT = 1
+
+
+def queue_email(subject, recipient_list, message):
+    """Store an email to be sent once the surrounding transaction commits"""
+    if not recipient_list:
+        raise ValueError("Recipient list is empty")
+    email = OutboxEmail.objects.create(
+        subject=subject, message=message, recipients=list(recipient_list)
+    )
+    transaction.on_commit(schedule_delivery)
+    return email
+
+
+def schedule_delivery():
+    from .tasks import deliver_outbox_emails
+    if not getattr(settings, 'CELERY_BROKER_URL', None):
+        deliver_pending()
+        return
+    try:
+        # One quick attempt: this runs inside the request, and the beat
+        # schedule covers a broker that is down
+        with deliver_outbox_emails.app.connection_for_write(
+            connect_timeout=PUBLISH_TIMEOUT,
+            transport_options={'max_retries': 0, 'socket_connect_timeout': PUBLISH_TIMEOUT},
+        ) as connection:
+            deliver_outbox_emails.apply_async(connection=connection, retry=False)
+    except Exception:
+        # The beat schedule picks the rows up on its next run
+        logger.warning('Could not queue outbox delivery', exc_info=True)
+
+
+def backoff(attempts):
+    return timedelta(minutes=min(2 ** attempts, 60))
+
+
+def due_emails(batch_size):
+    """Lock and return the next batch of due emails, skipping rows another worker holds"""
+    return list(
+        OutboxEmail.objects.select_for_update(skip_locked=True)
+        .filter(status='pending', next_attempt_at__lte=timezone.now())
+        .order_by('next_attempt_at')[:batch_size]
+    )
+
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + backoff(email.attempts)
+
+
+def save_batch(emails):
+    OutboxEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+
+def defer_due(error, batch_size=BATCH_SIZE):
+    """Count a failed attempt against every due email, e.g. when SMTP is down"""
+    failed = 0
+    while True:
+        with transaction.atomic():
+            emails = due_emails(batch_size)
+            for email in emails:
+                record_failure(email, error)
+            save_batch(emails)
+        failed += len(emails)
+        if len(emails) < batch_size:
+            return failed
+
+
+def deliver_batch(batch_size=BATCH_SIZE, connection=None):
+    """Send one batch of due emails and return (sent, failed)"""
+    sent = failed = 0
+    if not OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=timezone.now()).exists():
+        return sent, failed
+
+    connection = connection or get_connection()
+    # Connect before claiming any rows, so no locks are held while it's tried
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning('Could not connect to the mail server', exc_info=True)
+        return sent, defer_due(e, batch_size)
+
+    try:
+        with transaction.atomic():
+            emails = due_emails(batch_size)
+            for email in emails:
+                message = EmailMessage(
+                    subject=email.subject, body=email.message,
+                    to=email.recipients, connection=connection
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    record_failure(email, e)
+                    failed += 1
+                else:
+                    email.attempts += 1
+                    email.status = 'sent'
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent += 1
+            save_batch(emails)
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def deliver_pending(batch_size=BATCH_SIZE, connection=None):
+    """Drain every due email, batch by batch"""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_batch(batch_size, connection)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
@@ -0,0 +1,143 @@
+import json
+
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate for a queryset on PostgreSQL, exact COUNT(*)
+    elsewhere. Returns (count, is_estimate).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']), True
+
+
+def table_estimate(model, using):
+    """
+    Row count of a model's whole table from pg_class.reltuples, summed over
+    its partitions for a partitioned table (see partitions.py). None off
+    PostgreSQL and for a table never vacuumed or analyzed.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        # reltuples is -1 until the first VACUUM or ANALYZE, and always for a
+        # partitioned parent, which autovacuum skips
+        cursor.execute(
+            "SELECT sum(greatest(reltuples, 0)), bool_or(reltuples >= 0) FROM pg_class "
+            "WHERE relkind <> 'p' AND (oid = %s::regclass OR oid IN "
+            "(SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass))",
+            [table, table],
+        )
+        total, analyzed = cursor.fetchone()
+    return int(total) if analyzed else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator for tables too big to COUNT(*) on every page load. When
+    pg_class puts the table above `threshold` rows, the count is that
+    estimate for an unfiltered list and the planner's estimate (see
+    estimate_count) for a filtered or searched one. Smaller tables and
+    other databases get the exact count.
+    """
+
+    threshold = 100_000
+    is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet):
+            total = table_estimate(queryset.model, queryset.db)
+            if total is not None and total > self.threshold:
+                self.is_estimate = True
+                if not queryset.query.where and not queryset.query.distinct:
+                    return total
+                return estimate_count(queryset)[0]
+        return super().count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # An estimate can be low, so pages past it may still hold rows
+            if self.is_estimate and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_estimate:
+            return super().page(number)
+        # Paginator.page() would cut the slice off at the estimated count
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+class TimeCursorPagination(CursorPagination):
+    """
+    Keyset pagination on a time column: every page is an indexed range
+    scan, with no COUNT(*) and no OFFSET. Pass ?include_total=true to get an
+    approximate total alongside the page.
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    total_query_param = 'include_total'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = None
+        if request.query_params.get(self.total_query_param) in ('1', 'true'):
+            self.total = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.total is not None:
+            payload['total'], payload['total_is_estimate'] = self.total
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['total'] = {'type': 'integer', 'nullable': True}
+        response_schema['properties']['total_is_estimate'] = {'type': 'boolean'}
+        return response_schema
+
+
+class PaymentPagination(TimeCursorPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class CookiePagination(TimeCursorPagination):
+    ordering = ('-extracted_at', '-id')
+
+
+class UserServicePagination(TimeCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class AuditLogPagination(TimeCursorPagination):
+    """For LoginAttempt and CookieInjectionLog listings"""
+
+    ordering = ('-timestamp', '-id')
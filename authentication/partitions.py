@@ -0,0 +1,331 @@
+"""
+Monthly partitions for the append-only audit tables (LoginAttempt,
+CookieInjectionLog) on PostgreSQL.
+
+Each table is range partitioned on timestamp, one partition per calendar
+month in UTC named <table>_pYYYYMM. A <table>_default partition catches
+rows outside every month. The models are unchanged: Django reads and
+writes the parent table, and PostgreSQL routes each row and skips
+partitions outside a timestamp range. The primary key is (id, timestamp),
+because unique constraints on a partitioned table must include the
+partition key. The UUID keeps id unique on its own.
+
+ensure_partitions() creates the coming months, and the
+create_log_partitions task runs it daily. archive_partitions() handles
+every month older than RETENTION_MONTHS: it detaches the partition, writes
+its rows to <ARCHIVE_DIR>/<table>/<partition>.jsonl.gz and drops it. On
+other databases there are no partitions, so archiving exports and deletes
+the same months' rows through the ORM instead.
+"""
+import datetime
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .audit import EventEncoder
+
+DEFAULTS = {
+    'MONTHS_AHEAD': 3,
+    'RETENTION_MONTHS': 12,
+    'ARCHIVE_DIR': 'archive',
+    'CHUNK_SIZE': 2000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LOG_PARTITIONS', {})}
+
+
+def partitioned_models():
+    from .models import CookieInjectionLog, LoginAttempt
+    return [LoginAttempt, CookieInjectionLog]
+
+
+def month_start(value):
+    value = value.astimezone(datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def archive_path(archive_dir, table, month):
+    return Path(archive_dir) / table / f'{partition_name(table, month)}.jsonl.gz'
+
+
+def partition_sql(connection, parent, table, month):
+    qn = connection.ops.quote_name
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    return f"CREATE TABLE {qn(partition_name(table, month))} PARTITION OF {qn(parent)} FOR VALUES FROM ('{start}') TO ('{end}')"
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [connection.ops.quote_name(table)])
+        return cursor.fetchone() is not None
+
+
+def partitions(connection, table):
+    """{month: partition name} for the monthly partitions attached to table"""
+    pattern = re.compile(rf'^{re.escape(table)}_p(\d{{4}})(\d{{2}})$')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass',
+            [connection.ops.quote_name(table)],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months[datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)] = name
+    return months
+
+
+def detached_partitions(connection, table):
+    """{month: table name} for monthly partitions detached by an archive run that didn't finish"""
+    pattern = re.compile(rf'^{re.escape(table)}_p(\d{{4}})(\d{{2}})$')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relnamespace = current_schema()::regnamespace "
+            "AND relkind = 'r' AND NOT relispartition AND starts_with(relname, %s)",
+            [f'{table}_p'],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months[datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)] = name
+    return months
+
+
+def convert_table(connection, table, partitioned=True, months_ahead=None):
+    """
+    Rebuild table as a monthly partitioned table, or back into a plain one,
+    keeping its rows, indexes and foreign keys. Used by migration 0016.
+    """
+    qn = connection.ops.quote_name
+    staging = f'{table}_staging'
+    default = f'{table}_default'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s',
+            [table, f'{table}_pkey'],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [qn(table)],
+        )
+        foreign_keys = cursor.fetchall()
+
+        partition_by = ' PARTITION BY RANGE ("timestamp")' if partitioned else ''
+        cursor.execute(f'CREATE TABLE {qn(staging)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}')
+        if partitioned:
+            cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM {qn(table)}')
+            first, last = cursor.fetchone()
+            current = month_start(timezone.now())
+            month = month_start(first) if first else current
+            last = max(month_start(last), current) if last else current
+            end = add_months(last, get_config()['MONTHS_AHEAD'] if months_ahead is None else months_ahead)
+            while month <= end:
+                cursor.execute(partition_sql(connection, staging, table, month))
+                month = add_months(month, 1)
+            cursor.execute(f'CREATE TABLE {qn(default)} PARTITION OF {qn(staging)} DEFAULT')
+        cursor.execute(f'INSERT INTO {qn(staging)} SELECT * FROM {qn(table)}')
+        # Frees the index and constraint names for the new table
+        cursor.execute(f'DROP TABLE {qn(table)}')
+        cursor.execute(f'ALTER TABLE {qn(staging)} RENAME TO {qn(table)}')
+        primary_key = 'id, "timestamp"' if partitioned else 'id'
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + "_pkey")} PRIMARY KEY ({primary_key})')
+        for indexdef in indexes:
+            cursor.execute(indexdef)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+
+def create_partition(connection, table, month):
+    """Add one month, moving any of its rows out of the default partition first"""
+    qn = connection.ops.quote_name
+    default = f'{table}_default'
+    start, end = month, add_months(month, 1)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1', [start, end])
+        stranded = cursor.fetchone() is not None
+        # PostgreSQL refuses a new partition while the default holds rows in its range
+        if stranded:
+            cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}')
+        cursor.execute(partition_sql(connection, table, table, month))
+        if stranded:
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO {qn(table)} SELECT * FROM moved',
+                [start, end],
+            )
+            cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT')
+
+
+def ensure_partitions(using='default', months_ahead=None, now=None):
+    """Create the partitions for this month and the next MONTHS_AHEAD; returns the names created"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return []
+    if months_ahead is None:
+        months_ahead = get_config()['MONTHS_AHEAD']
+    current = month_start(now or timezone.now())
+    created = []
+    for model in partitioned_models():
+        table = model._meta.db_table
+        if not is_partitioned(connection, table):
+            continue
+        existing = partitions(connection, table)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                create_partition(connection, table, month)
+                created.append(partition_name(table, month))
+    return created
+
+
+def export_archive(path, lines):
+    """
+    gzip JSONL lines to a temporary file next to path. Returns (temp path,
+    lines written); publish_archive() moves it into place.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f'{path.name}.', suffix='.tmp')
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as out:
+            for line in lines:
+                out.write(line.encode() + b'\n')
+                count += 1
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return temp, count
+
+
+def publish_archive(temp, path):
+    """
+    Move an export into place. A path that already exists gets it as one
+    more gzip member, which gzip readers treat as a continuation of the
+    same file.
+    """
+    if path.exists():
+        with open(temp, 'rb') as source, open(path, 'ab') as target:
+            shutil.copyfileobj(source, target)
+        os.unlink(temp)
+    else:
+        os.replace(temp, path)
+
+
+def archive_partition(connection, table, name, path, chunk_size, detach=True):
+    """
+    Detach one partition, export it and drop it. The parent is locked only
+    for the DETACH; the export reads the detached table on its own. The
+    archive is published after the DROP commits, so a failed run leaves a
+    detached table for the next one and no rows in the archive twice.
+    """
+    qn = connection.ops.quote_name
+    if detach:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+    temp = None
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.chunked_cursor() as cursor:
+                cursor.cursor.itersize = chunk_size
+                cursor.execute(f'SELECT row_to_json(t)::text FROM {qn(name)} t ORDER BY "timestamp", id')
+                temp, count = export_archive(path, (line for line, in cursor))
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {qn(name)}')
+    except BaseException:
+        if temp:
+            os.unlink(temp)
+        raise
+    publish_archive(temp, path)
+    return count
+
+
+def archive_rows(model, using, month, path, chunk_size):
+    """archive_partition() without partitions: export and delete one month's rows"""
+    manager = model._default_manager.using(using)
+    rows = manager.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1)).order_by('timestamp', 'pk')
+    columns = [field.attname for field in model._meta.concrete_fields]
+    pk = model._meta.pk.attname
+
+    def lines():
+        # Deletes exactly the rows written out, so a row inserted meanwhile
+        # is either in this archive or left for the next run
+        while batch := list(rows.values(*columns)[:chunk_size]):
+            manager.filter(pk__in=[row[pk] for row in batch]).delete()
+            yield from (json.dumps(row, cls=EventEncoder) for row in batch)
+
+    temp = None
+    try:
+        with transaction.atomic(using=using):
+            temp, count = export_archive(path, lines())
+    except BaseException:
+        if temp:
+            os.unlink(temp)
+        raise
+    publish_archive(temp, path)
+    return count
+
+
+def archive_partitions(using='default', retention_months=None, archive_dir=None, dry_run=False, now=None):
+    """
+    Archive and drop every month older than retention_months. Returns
+    [(table, month, rows or None on a dry run, archive path)].
+    """
+    config = get_config()
+    if retention_months is None:
+        retention_months = config['RETENTION_MONTHS']
+    archive_dir = archive_dir or config['ARCHIVE_DIR']
+    cutoff = add_months(month_start(now or timezone.now()), -retention_months)
+    connection = connections[using]
+    archived = []
+    for model in partitioned_models():
+        table = model._meta.db_table
+        if connection.vendor == 'postgresql' and is_partitioned(connection, table):
+            expired = [
+                (month, name, True) for month, name in partitions(connection, table).items() if month < cutoff
+            ]
+            expired += [(month, name, False) for month, name in detached_partitions(connection, table).items()]
+            expired.sort()
+        else:
+            queryset = model._default_manager.using(using)
+            first = queryset.order_by('timestamp').values_list('timestamp', flat=True).first()
+            expired = []
+            month = month_start(first) if first else cutoff
+            while month < cutoff:
+                end = add_months(month, 1)
+                if queryset.filter(timestamp__gte=month, timestamp__lt=end).exists():
+                    expired.append((month, None, False))
+                month = end
+        for month, name, attached in expired:
+            path = archive_path(archive_dir, table, month)
+            if dry_run:
+                count = None
+            elif name:
+                count = archive_partition(connection, table, name, path, config['CHUNK_SIZE'], detach=attached)
+            else:
+                count = archive_rows(model, using, month, path, config['CHUNK_SIZE'])
+            archived.append((table, month, count, path))
+    return archived
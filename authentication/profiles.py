@@ -0,0 +1,55 @@
+"""
+Serialized user profiles for the fmc/erp/customer/vendor module logins.
+
+A profile is loaded with its company, branch and login type in one query
+and cached per email. Signals drop cached profiles when the user or their
+company or branch changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'PROFILE_CACHE_TIMEOUT', 60 * 15)
+
+
+def profile_cache_key(email):
+    return f'profile:{email}'
+
+
+def build_profile(user):
+    return {
+        'email': user.email,
+        'full_name': user.full_name,
+        'mobile': user.phone_number,
+        'username': user.email,
+        'company': user.company.company_name if user.company else None,
+        'branch': user.branch.branch_name if user.branch else None,
+        'is_superuser': user.is_superuser,
+        'is_staff': user.is_staff,
+        'is_verified': user.email_verified,
+        'is_active': user.is_active,
+        'login_type': user.login_type.login_type if user.login_type else None,
+    }
+
+
+def get_profile(email):
+    """Cached profile for the user with this email, or None if there is no such user"""
+    key = profile_cache_key(email)
+    profile = cache.get(key)
+    if profile is None:
+        user = (
+            User.objects.select_related('company', 'branch', 'login_type')
+            .filter(email=email)
+            .first()
+        )
+        if user is None:
+            return None
+        profile = build_profile(user)
+        cache.set(key, profile, PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def invalidate_profiles(*emails):
+    if emails:
+        cache.delete_many([profile_cache_key(email) for email in emails if email])
@@ -0,0 +1,170 @@
+"""
+Daily revenue rollup over Payment.
+
+DailyRevenue holds one row per (day, plan, payment method) with counts per
+status and the success and refunded amounts. Saving or deleting a Payment
+moves its contribution between buckets in the same transaction, so status
+changes such as success -> refunded show up immediately. Payments are
+bucketed by the local date of their timestamp.
+
+QuerySet.update() and bulk_create() skip the signals; rebuild() recomputes
+a date range from Payment, and the refresh_revenue_rollup task does that
+for the last few days.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import DailyRevenue, Payment
+
+STATE_FIELDS = ('timestamp', 'subscription_id', 'payment_method', 'payment_status', 'amount')
+COUNTED = {
+    'success': 'success_count',
+    'refunded': 'refunded_count',
+    'failed': 'failed_count',
+    'pending': 'pending_count',
+}
+SUMMED = {'success': 'success_amount', 'refunded': 'refunded_amount'}
+TOTALS = ('success_count', 'success_amount', 'refunded_count', 'refunded_amount', 'failed_count', 'pending_count')
+GROUPS = {'day': 'date', 'subscription': 'subscription__name', 'payment_method': 'payment_method'}
+
+
+def payment_state(payment):
+    return {field: getattr(payment, field) for field in STATE_FIELDS}
+
+
+def contribution(state):
+    """(bucket, {column: delta}) for one payment state, or None if it counts nowhere"""
+    if state is None or state['payment_status'] not in COUNTED or state['timestamp'] is None:
+        return None
+    bucket = (timezone.localdate(state['timestamp']), state['subscription_id'], state['payment_method'])
+    deltas = {COUNTED[state['payment_status']]: 1}
+    if state['payment_status'] in SUMMED:
+        deltas[SUMMED[state['payment_status']]] = Decimal(str(state['amount']))
+    return bucket, deltas
+
+
+def apply(bucket, deltas):
+    date, subscription_id, payment_method = bucket
+    rows = DailyRevenue.objects.filter(date=date, subscription_id=subscription_id, payment_method=payment_method)
+    updates = {column: F(column) + delta for column, delta in deltas.items()}
+    if rows.update(**updates):
+        return
+    # Nothing to subtract from, e.g. the bucket went with its plan
+    if any(delta < 0 for delta in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            DailyRevenue.objects.create(
+                date=date, subscription_id=subscription_id, payment_method=payment_method, **deltas
+            )
+    except IntegrityError:
+        # Another transaction created the bucket first
+        rows.update(**updates)
+
+
+def record_change(old, new):
+    """Move a payment's contribution from its old state to its new one"""
+    before, after = contribution(old), contribution(new)
+    if before == after:
+        return
+    changes = {}
+    if before:
+        bucket, deltas = before
+        changes[bucket] = {column: -delta for column, delta in deltas.items()}
+    if after:
+        bucket, deltas = after
+        merged = changes.setdefault(bucket, {})
+        for column, delta in deltas.items():
+            merged[column] = merged.get(column, 0) + delta
+    for bucket, deltas in changes.items():
+        deltas = {column: delta for column, delta in deltas.items() if delta}
+        if deltas:
+            apply(bucket, deltas)
+
+
+def parse_day(value, name):
+    """An ISO date query value, or None when absent"""
+    if not value:
+        return None
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValueError(f"{name} must be an ISO date")
+    return date
+
+
+def day_range(since=None, until=None):
+    """Aware datetimes bounding local dates [since, until)"""
+    def start(date):
+        return timezone.make_aware(datetime.datetime.combine(date, datetime.time()))
+    return (start(since) if since else None), (start(until) if until else None)
+
+
+@transaction.atomic
+def rebuild(since=None, until=None):
+    """Recompute the rollup for local dates [since, until) from Payment; returns the bucket count"""
+    rollup = DailyRevenue.objects.all()
+    payments = Payment.objects.all()
+    start, end = day_range(since, until)
+    if since:
+        rollup = rollup.filter(date__gte=since)
+        payments = payments.filter(timestamp__gte=start)
+    if until:
+        rollup = rollup.filter(date__lt=until)
+        payments = payments.filter(timestamp__lt=end)
+    rollup.delete()
+
+    zero = Value(Decimal(0), output_field=DecimalField(max_digits=14, decimal_places=2))
+    aggregates = {column: Count('pk', filter=Q(payment_status=status)) for status, column in COUNTED.items()}
+    aggregates.update({
+        column: Coalesce(Sum('amount', filter=Q(payment_status=status)), zero)
+        for status, column in SUMMED.items()
+    })
+    buckets = (
+        payments.filter(payment_status__in=list(COUNTED))
+        .order_by()
+        .annotate(date=TruncDate('timestamp'))
+        .values('date', 'subscription_id', 'payment_method')
+        .annotate(**aggregates)
+    )
+    created = DailyRevenue.objects.bulk_create(
+        (DailyRevenue(**bucket) for bucket in buckets.iterator()), batch_size=1000
+    )
+    return len(created)
+
+
+def summary(since=None, until=None, group_by='day'):
+    """Revenue and churn for local dates [since, until), answered from the rollup"""
+    rollup = DailyRevenue.objects.all()
+    if since:
+        rollup = rollup.filter(date__gte=since)
+    if until:
+        rollup = rollup.filter(date__lt=until)
+    sums = {column: Sum(column) for column in TOTALS}
+
+    def describe(row):
+        counts = {column: row[column] or 0 for column in TOTALS}
+        paid = counts['success_count'] + counts['refunded_count']
+        counts['gross_amount'] = counts['success_amount'] + counts['refunded_amount']
+        counts['net_amount'] = counts['success_amount']
+        # Churn: share of paid payments that were refunded
+        counts['churn_rate'] = round(counts['refunded_count'] / paid, 4) if paid else 0.0
+        return counts
+
+    group = GROUPS[group_by]
+    rows = rollup.order_by(group).values(group).annotate(**sums)
+    return {
+        'since': since,
+        'until': until,
+        'totals': describe(rollup.aggregate(**sums)),
+        'group_by': group_by,
+        'rows': [{group_by: row[group], **describe(row)} for row in rows],
+    }
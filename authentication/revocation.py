@@ -0,0 +1,282 @@
+"""
+Revoked refresh token ids (JTIs), kept out of the token_blacklist tables
+on the hot path. Refresh and logout check a set of JTIs that is loaded from
+BlacklistedToken on first use and updated whenever a row is blacklisted.
+Each member remembers the token's expiry, so purge() can drop members that
+could no longer be presented anyway.
+
+Backends, chosen by settings.TOKEN_REVOCATION['BACKEND']:
+
+- redis: a sorted set of JTIs scored by expiry, shared by all processes
+- memory: a per-process dict, only correct with a single process
+- database: the simplejwt query against BlacklistedToken
+
+Without a Celery broker the database backend is always used. A Redis error
+falls back to the database for that check. The Redis set is rebuilt from the
+database every READY_TTL seconds, and a JTI that could not be added is kept
+in the process and written again on its next check, so a failed write
+doesn't leave a revoked token accepted once Redis is back.
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+READY_TTL = 300
+
+DEFAULTS = {
+    'BACKEND': 'database',
+    'REDIS_URL': None,
+    'REDIS_KEY': 'jwt:revoked',
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'TOKEN_REVOCATION', {})}
+    if config['BACKEND'] == 'redis' and not (config['REDIS_URL'] or getattr(settings, 'CELERY_BROKER_URL', None)):
+        config['BACKEND'] = 'database'
+    return config
+
+
+def is_blacklisted_in_db(jti):
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def unexpired_blacklist():
+    """(jti, expiry timestamp) of every blacklisted token still in its lifetime"""
+    rows = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        .values_list('token__jti', 'token__expires_at')
+        .iterator(chunk_size=5000)
+    )
+    for jti, expires_at in rows:
+        yield jti, expires_at.timestamp()
+
+
+class Timed:
+    """Per-process check counter and cumulative latency"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checks = 0
+        self.seconds = 0.0
+
+    def contains(self, jti):
+        started = time.perf_counter()
+        try:
+            return self.lookup(jti)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.checks += 1
+                self.seconds += elapsed
+
+    def stats(self):
+        with self.lock:
+            mean_us = self.seconds / self.checks * 1e6 if self.checks else 0.0
+            return {'backend': self.name, 'checks': self.checks, 'mean_check_us': mean_us}
+
+
+class DatabaseRevocations(Timed):
+    name = 'database'
+
+    def lookup(self, jti):
+        return is_blacklisted_in_db(jti)
+
+    def add(self, jti, expires_at):
+        pass
+
+    def load(self):
+        return 0
+
+    def purge(self):
+        return 0
+
+    def size(self):
+        return None
+
+
+class MemoryRevocations(Timed):
+    name = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self.members = None
+
+    def ensure_loaded(self):
+        if self.members is None:
+            self.load()
+
+    def lookup(self, jti):
+        self.ensure_loaded()
+        return jti in self.members
+
+    def add(self, jti, expires_at):
+        self.ensure_loaded()
+        self.members[jti] = expires_at
+
+    def load(self):
+        members = dict(unexpired_blacklist())
+        self.members = members
+        return len(members)
+
+    def purge(self):
+        self.ensure_loaded()
+        now = time.time()
+        expired = [jti for jti, expires_at in list(self.members.items()) if expires_at <= now]
+        for jti in expired:
+            self.members.pop(jti, None)
+        return len(expired)
+
+    def size(self):
+        self.ensure_loaded()
+        return len(self.members)
+
+
+class RedisRevocations(Timed):
+    name = 'redis'
+
+    def __init__(self, url, key):
+        super().__init__()
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.errors = redis.RedisError
+        self.key = key
+        # Set once the sorted set holds the whole blacklist, expires so the
+        # set is rebuilt even if a process died before replaying a failed add
+        self.ready_key = f'{key}:ready'
+        # JTIs whose add failed, written again on the next check
+        self.unsynced = {}
+
+    def sync(self):
+        pending = dict(self.unsynced)
+        self.client.zadd(self.key, pending)
+        for jti in pending:
+            self.unsynced.pop(jti, None)
+
+    def lookup(self, jti):
+        try:
+            if self.unsynced:
+                self.sync()
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.exists(self.ready_key)
+                pipe.zscore(self.key, jti)
+                ready, score = pipe.execute()
+            if ready:
+                return score is not None
+            # One process rebuilds the set, the others use the database meanwhile
+            if self.client.set(f'{self.key}:lock', 1, nx=True, ex=60):
+                self.load()
+        except self.errors:
+            logger.warning('Revocation set unavailable, checking the database', exc_info=True)
+        return is_blacklisted_in_db(jti)
+
+    def add(self, jti, expires_at):
+        try:
+            self.client.zadd(self.key, {jti: expires_at})
+        except self.errors:
+            logger.warning('Could not add %s to the revocation set', jti, exc_info=True)
+            self.unsynced[jti] = expires_at
+            try:
+                # Without the marker every process checks the database until the set is reloaded
+                self.client.delete(self.ready_key)
+            except self.errors:
+                pass
+
+    def load(self):
+        """Rebuild the set from the database and swap it in atomically"""
+        staging = f'{self.key}:loading'
+        try:
+            self.client.delete(staging)
+            loaded = 0
+            batch = {}
+            for jti, expires_at in unexpired_blacklist():
+                batch[jti] = expires_at
+                if len(batch) >= 5000:
+                    loaded += self.client.zadd(staging, batch)
+                    batch = {}
+            if batch:
+                loaded += self.client.zadd(staging, batch)
+            with self.client.pipeline(transaction=True) as pipe:
+                # Keep members added while the snapshot was being read
+                pipe.zunionstore(self.key, [staging, self.key], aggregate='MAX')
+                pipe.delete(staging)
+                pipe.set(self.ready_key, 1, ex=READY_TTL)
+                pipe.execute()
+        except self.errors:
+            logger.warning('Could not load the revocation set', exc_info=True)
+            return 0
+        return loaded
+
+    def purge(self):
+        try:
+            return self.client.zremrangebyscore(self.key, '-inf', time.time())
+        except self.errors:
+            logger.warning('Could not purge the revocation set', exc_info=True)
+            return 0
+
+    def size(self):
+        try:
+            return self.client.zcard(self.key)
+        except self.errors:
+            return None
+
+
+@lru_cache(maxsize=1)
+def get_revocations():
+    config = get_config()
+    if config['BACKEND'] == 'redis':
+        return RedisRevocations(config['REDIS_URL'] or settings.CELERY_BROKER_URL, config['REDIS_KEY'])
+    if config['BACKEND'] == 'memory':
+        return MemoryRevocations()
+    return DatabaseRevocations()
+
+
+@receiver(setting_changed)
+def reset_revocations(sender, setting, **kwargs):
+    if setting in ('TOKEN_REVOCATION', 'CELERY_BROKER_URL'):
+        get_revocations.cache_clear()
+
+
+def is_revoked(jti):
+    return get_revocations().contains(jti)
+
+
+def revoke(jti, expires_at):
+    get_revocations().add(jti, expires_at.timestamp())
+
+
+def purge_expired_tokens(chunk_size=5000):
+    """
+    Delete outstanding tokens past their expiry, with their blacklist rows,
+    in chunks of chunk_size. Returns the number of outstanding tokens removed.
+    """
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).order_by('pk')
+    deleted = 0
+    while True:
+        pks = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        # Blacklist rows go with their outstanding token by cascade
+        deleted += OutstandingToken.objects.filter(pk__in=pks).delete()[1].get(OutstandingToken._meta.label, 0)
+    get_revocations().purge()
+    return deleted
+
+
+def table_sizes():
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+    return {
+        'outstanding': OutstandingToken.objects.count(),
+        'blacklisted': BlacklistedToken.objects.count(),
+        'revocation_set': get_revocations().size(),
+    }
@@ -1,7 +1,10 @@
-from rest_framework import serializers
+from asgiref.sync import sync_to_async
+from rest_framework import permissions, serializers
 from django.contrib.auth import authenticate
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import TokenError
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
@@ -10,8 +13,32 @@ from .models import (
     User, Subscription, Payment, Service, 
     UserService, Cookie, CookieInjectionLog
 )
+from .customAuth import EmailBackend
+from .hashers import set_password
+from .tokens import RefreshToken
 from .validators import clean_first_name, clean_last_name, password_validator
 
+
+def requested_fields(request):
+    """Field names from a comma separated ?fields= parameter on reads"""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Only render the fields the client asked for with ?fields="""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(max_length=68, min_length=8, write_only=True)
     confirm_password = serializers.CharField(max_length=68, min_length=8, write_only=True)
@@ -40,21 +67,38 @@ class UserCreateSerializer(serializers.ModelSerializer):
 class LoginSerializer(serializers.ModelSerializer):
     email = serializers.EmailField()
     password = serializers.CharField(max_length=68, write_only=True)
-    tokens = serializers.SerializerMethodField()
+    tokens = serializers.DictField(read_only=True)
 
     class Meta:
         model = User
         fields = ('email', 'password', 'tokens')
 
-    def get_tokens(self, obj):
-        user = User.objects.get(email=obj['email'])
-        return user.tokens()
-
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(email=email, password=password)
-        
+        user = authenticate(self.context.get('request'), email=email, password=password)
+        self.check_user(user)
+
+        # Keep the authenticated instance so the view does not load it again
+        self.user = user
+        return {
+            'email': user.email,
+            'tokens': user.tokens()
+        }
+
+    async def avalidate(self, attrs):
+        """validate() for async views: the password is checked in the hashing pool"""
+        user = await EmailBackend().aauthenticate(
+            self.context.get('request'), email=attrs.get('email'), password=attrs.get('password')
+        )
+        self.check_user(user)
+        self.user = user
+        return {
+            'email': user.email,
+            'tokens': await sync_to_async(user.tokens)()
+        }
+
+    def check_user(self, user):
         if not user:
             raise AuthenticationFailed('Invalid credentials')
         if not user.is_active:
@@ -62,11 +106,6 @@ class LoginSerializer(serializers.ModelSerializer):
         if not user.email_verified:
             raise AuthenticationFailed('Email not verified')
 
-        return {
-            'email': user.email,
-            'tokens': user.tokens()
-        }
-
 class EmailVerificationSerializer(serializers.ModelSerializer):
     token = serializers.CharField(max_length=555)
 
@@ -93,7 +132,7 @@ class SetNewPasswordSerializer(serializers.Serializer):
             if not PasswordResetTokenGenerator().check_token(user, token):
                 raise AuthenticationFailed('Reset link is invalid or has expired')
 
-            user.set_password(password)
+            set_password(user, password)
             user.save()
             return user
         except Exception as e:
@@ -114,39 +153,90 @@ class LogoutSerializer(serializers.Serializer):
         return attrs
 
     def save(self, **kwargs):
+        request = self.context.get('request')
         try:
-            RefreshToken(self.token).blacklist()
+            token = RefreshToken(self.token)
+            # The outstanding row needs the token's user; reuse the request's when it is the same one
+            user = getattr(request, 'user', None)
+            if user is None or str(user.pk) != str(token.payload.get(api_settings.USER_ID_CLAIM)):
+                user = None
+            token.blacklist(user=user)
         except TokenError:
             raise serializers.ValidationError('Token is invalid or expired')
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    simplejwt's refresh with the user loaded once; the base serializer,
+    blacklist() and outstand() each looked it up
+    """
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist(user=user)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand(user=user)
+            data['refresh'] = str(refresh)
+        return data
+
+class SubscriptionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Subscription
         fields = ['id', 'name', 'price', 'duration_days', 'features', 'description']
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['id', 'name', 'login_url', 'description', 'required_subscription']
 
-class UserServiceSerializer(serializers.ModelSerializer):
+class UserServiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    credentials = serializers.JSONField(required=False)
+
     class Meta:
         model = UserService
         fields = ['id', 'service', 'credentials', 'is_active', 'created_at', 'last_used', 'usage_count']
         read_only_fields = ['created_at', 'last_used', 'usage_count']
 
-class PaymentSerializer(serializers.ModelSerializer):
+class UserServiceListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """List rows without the encrypted credentials"""
+
+    class Meta:
+        model = UserService
+        fields = ['id', 'service', 'is_active', 'created_at', 'last_used', 'usage_count']
+        read_only_fields = fields
+
+class PaymentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'amount', 'payment_status', 'subscription', 'transaction_id', 'payment_method', 'billing_details']
         read_only_fields = ['timestamp']
 
-class CookieSerializer(serializers.ModelSerializer):
+class CookieSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    cookie_data = serializers.JSONField(required=False)
+
     class Meta:
         model = Cookie
         fields = ['id', 'user_service', 'cookie_data', 'expires_at', 'status']
         read_only_fields = ['extracted_at', 'last_validated']
 
+class CookieListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """List rows without the encrypted cookie data"""
+
+    class Meta:
+        model = Cookie
+        fields = ['id', 'user_service', 'expires_at', 'status']
+        read_only_fields = fields
+
 class LogEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = LogEntry
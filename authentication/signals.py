@@ -0,0 +1,90 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .cache import bump_catalog
+from .models import Branch, Company, Payment, Service, Subscription, User
+from .profiles import invalidate_profiles
+from .revenue import STATE_FIELDS, payment_state, record_change
+from .revocation import revoke
+from .user_cache import invalidate_users
+
+EXPIRY_PAYMENT_STATUSES = ('success', 'refunded')
+
+
+@receiver(pre_save, sender=Payment)
+def payment_changing(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or instance._state.adding:
+        return
+    previous = Payment.objects.filter(pk=instance.pk).values(*STATE_FIELDS).first()
+    instance._previous_state = previous
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    if not raw:
+        record_change(previous, payment_state(instance))
+    # Leaving success matters as much as reaching it
+    previous_status = previous['payment_status'] if previous else None
+    if instance.payment_status in EXPIRY_PAYMENT_STATUSES or previous_status in EXPIRY_PAYMENT_STATUSES:
+        User.objects.filter(pk=instance.user_id).refresh_subscription_expiry()
+        invalidate_users(instance.user_id)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    record_change(payment_state(instance), None)
+    if instance.payment_status == 'success':
+        User.objects.filter(pk=instance.user_id).refresh_subscription_expiry()
+        invalidate_users(instance.user_id)
+
+
+@receiver(pre_save, sender=Subscription)
+def subscription_changing(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._duration_changed = False
+        return
+    previous = Subscription.objects.filter(pk=instance.pk).values_list('duration_days', flat=True).first()
+    instance._duration_changed = previous is not None and previous != instance.duration_days
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_saved(sender, instance, **kwargs):
+    if getattr(instance, '_duration_changed', False):
+        users = User.objects.filter(subscription=instance)
+        users.refresh_subscription_expiry()
+        invalidate_users(*users.values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_users(instance.pk)
+    invalidate_profiles(instance.email, getattr(instance, '_loaded_email', None))
+
+
+@receiver([post_save, pre_delete], sender=Company)
+@receiver([post_save, pre_delete], sender=Branch)
+def organisation_changed(sender, instance, **kwargs):
+    # Profiles embed the name; on delete, look users up before the FK is nulled
+    field = 'company' if sender is Company else 'branch'
+    invalidate_profiles(*User.objects.filter(**{field: instance.pk}).values_list('email', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def subscription_catalog_changed(sender, **kwargs):
+    bump_catalog('subscription')
+    # Deleting a plan nulls Service.required_subscription without signals
+    bump_catalog('service')
+
+
+@receiver([post_save, post_delete], sender=Service)
+def service_catalog_changed(sender, **kwargs):
+    bump_catalog('service')
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        revoke(instance.token.jti, instance.token.expires_at)
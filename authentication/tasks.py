@@ -0,0 +1,63 @@
+import logging
+
+from celery import shared_task
+from celery.signals import worker_shutting_down
+
+from .audit import get_buffer, write_events
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def flush_audit_events(events=None):
+    """Insert a batch handed over by a web process, or drain the shared buffer"""
+    if events:
+        return write_events(events)
+    return get_buffer().flush()
+
+
+@shared_task(ignore_result=True)
+def deliver_outbox_emails():
+    """Send due outbox emails over a single SMTP connection per batch"""
+    from .outbox import deliver_pending
+    return deliver_pending()
+
+
+@shared_task(ignore_result=True)
+def expire_cookies(chunk_size=1000):
+    """Move cookies past expires_at from valid to expired"""
+    from .models import Cookie
+    return Cookie.objects.expire_stale(chunk_size=chunk_size)
+
+
+@shared_task(ignore_result=True)
+def purge_expired_tokens(chunk_size=5000):
+    """Delete expired outstanding and blacklisted tokens, then log what is left"""
+    from .revocation import get_revocations, purge_expired_tokens, table_sizes
+    deleted = purge_expired_tokens(chunk_size=chunk_size)
+    logger.info(
+        'Purged %s expired tokens, remaining %s, revocation checks %s',
+        deleted, table_sizes(), get_revocations().stats()
+    )
+    return deleted
+
+
+@shared_task(ignore_result=True)
+def refresh_revenue_rollup(days=2):
+    """Rebuild the last few days of the revenue rollup to pick up changes made without signals"""
+    import datetime
+    from django.utils import timezone
+    from .revenue import rebuild
+    return rebuild(since=timezone.localdate() - datetime.timedelta(days=days))
+
+
+@shared_task(ignore_result=True)
+def create_log_partitions():
+    """Create the audit log partitions for this month and the next few"""
+    from .partitions import ensure_partitions
+    return ensure_partitions()
+
+
+@worker_shutting_down.connect
+def drain_audit_buffer(**kwargs):
+    get_buffer().flush()
@@ -1,3 +1,1622 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+import warnings
+from collections import Counter
+from datetime import datetime, timedelta
+from importlib import import_module
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from cryptography.fernet import Fernet
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core import mail
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from .models import (
+    User, Subscription, Payment, Service,
+    UserService, Cookie, CookieInjectionLog, LoginAttempt, OutboxEmail,
+    Company, Branch, LoginType, DailyRevenue
+)
+from . import (
+    async_views, audit, bulkload, encryption, exports, fields, hashers, metrics, outbox, pagination, partitions,
+    profiles, revenue, revocation, tracing, urls, user_cache, views,
+)
+from .customAuth import load_user
+from .management.commands import rotate_encryption_keys
+from .hashers import set_password
+from .tokens import RefreshToken
+
+
+def seed_data(users=20, rows_per_user=5):
+    """Create a small but realistic spread of rows for every model"""
+    subscription = Subscription.objects.create(name='Pro', price=10, duration_days=30)
+    services = [
+        Service.objects.create(
+            name=f'Service {i}', login_url=f'https://service{i}.example.com/login',
+            description='', required_subscription=subscription
+        )
+        for i in range(3)
+    ]
+    now = timezone.now()
+    for i in range(users):
+        user = User.objects.create(
+            email=f'user{i}@example.com', full_name=f'User {i}',
+            subscription=subscription, email_verified=True
+        )
+        user.set_password('Password123')
+        user.save(update_fields=['password'])
+        for j in range(rows_per_user):
+            Payment.objects.create(
+                user=user, subscription=subscription, amount=10,
+                payment_status='success' if j % 2 else 'failed',
+                transaction_id=f'txn-{i}-{j}', payment_method='card'
+            )
+            LoginAttempt.objects.create(
+                user=user, success=bool(j % 2), ip_address='127.0.0.1', user_agent='tests'
+            )
+        for service in services:
+            user_service = UserService.objects.create(
+                user=user, service=service, credentials={'username': user.email}
+            )
+            for j in range(rows_per_user):
+                cookie = Cookie.objects.create(
+                    user_service=user_service, cookie_data={'session': f'{i}-{j}'},
+                    expires_at=now + timedelta(days=j - 2),
+                    status='valid' if j % 3 else 'revoked'
+                )
+                CookieInjectionLog.objects.create(
+                    cookie=cookie, injection_status='success', message='ok', ip_address='127.0.0.1'
+                )
+    return User.objects.order_by('email').first()
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the querysets the viewsets and admin run and fail when one of
+    them has to scan a whole table instead of using an index. The catalog
+    tables (Subscription, Service) are small by design and not checked.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data()
+        cls.user_service = UserService.objects.filter(user=cls.user).first()
+        cls.cookie = Cookie.objects.filter(user_service=cls.user_service).first()
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Small seeded tables are cheaper to scan, so only fall back to a
+            # sequential scan when no usable index exists
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        tables = {queryset.model._meta.db_table}
+        tables.update(
+            field.related_model._meta.db_table
+            for field in queryset.model._meta.get_fields()
+            if field.many_to_one and field.related_model is not None
+        )
+        for line in plan.splitlines():
+            for table in tables:
+                if connection.vendor == 'postgresql':
+                    scanned = f'Seq Scan on {table}' in line
+                else:
+                    # SQLite reports "SCAN <table>" for full (index) scans and
+                    # "SEARCH <table> USING INDEX" for index lookups
+                    scanned = re.search(rf'\bSCAN {table}\b', line) is not None
+                if scanned:
+                    self.fail(f'Full scan of {table}:\n{plan}\n\n{queryset.query}')
+
+    def viewset_queryset(self, viewset_class, action='list'):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.user
+        view = viewset_class(request=request, action=action, format_kwarg=None, kwargs={})
+        return view.get_queryset()
+
+    def admin_queryset(self, model):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return admin.site._registry[model].get_queryset(request)
+
+    def test_user_service_viewset(self):
+        self.assertUsesIndex(self.viewset_queryset(views.UserServiceViewSet))
+
+    def test_payment_viewset(self):
+        self.assertUsesIndex(self.viewset_queryset(views.PaymentViewSet))
+
+    def test_cookie_viewset(self):
+        self.assertUsesIndex(self.viewset_queryset(views.CookieViewSet))
+
+    def test_latest_success_payment(self):
+        self.assertUsesIndex(
+            Payment.objects.filter(user=self.user, payment_status='success').order_by('-timestamp')[:1]
+        )
+
+    def test_valid_cookies_for_service(self):
+        self.assertUsesIndex(
+            Cookie.objects.filter(
+                user_service=self.user_service, status='valid', expires_at__gt=timezone.now()
+            )
+        )
+
+    def test_expiry_sweep(self):
+        self.assertUsesIndex(Cookie.objects.stale().values('pk')[:1000])
+
+    def test_login_attempts_for_user(self):
+        self.assertUsesIndex(LoginAttempt.objects.filter(user=self.user).order_by('-timestamp'))
+
+    def test_injection_logs_for_cookie(self):
+        self.assertUsesIndex(CookieInjectionLog.objects.filter(cookie=self.cookie).order_by('-timestamp'))
+
+    def test_exports(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assertUsesIndex(exports.EXPORTS['payments'].queryset(since=since, status='success'))
+        self.assertUsesIndex(exports.EXPORTS['login-attempts'].queryset(since=since))
+
+    def test_admin_filtered_by_owner(self):
+        self.assertUsesIndex(self.admin_queryset(Payment).filter(user=self.user))
+        self.assertUsesIndex(self.admin_queryset(LoginAttempt).filter(user=self.user))
+        self.assertUsesIndex(self.admin_queryset(UserService).filter(user=self.user))
+        self.assertUsesIndex(self.admin_queryset(Cookie).filter(user_service=self.user_service))
+        self.assertUsesIndex(self.admin_queryset(CookieInjectionLog).filter(cookie=self.cookie))
+
+
+class QueryRecorder:
+    """Execute wrapper that keeps every (sql, params) run on a connection"""
+    # Transaction control is repeated by design
+    IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT')
+    # The same statement with different parameters this often is an N+1
+    N_PLUS_ONE = 3
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(self.IGNORED):
+            self.queries.append((sql, tuple(params) if params and not many else params))
+        return execute(sql, params, many, context)
+
+    def problems(self):
+        problems = []
+        for (sql, params), count in Counter((sql, repr(params)) for sql, params in self.queries).items():
+            if count > 1:
+                problems.append(f'{count}x identical: {sql} {params}')
+        for sql, count in Counter(sql for sql, params in self.queries).items():
+            if count >= self.N_PLUS_ONE:
+                problems.append(f'{count}x, N+1?: {sql}')
+        return problems
+
+
+# Queries allowed per request, with empty caches, keyed by (URL name, method).
+# Every named route in authentication/urls.py and the module logins needs an
+# entry; raise one only with a reason.
+QUERY_BUDGETS = {
+    ('api-root', 'GET'): 1,
+    # JWT user, COUNT for the paginator, the page
+    ('subscription-list', 'GET'): 3,
+    ('subscription-detail', 'GET'): 2,
+    ('service-list', 'GET'): 3,
+    ('service-detail', 'GET'): 2,
+    ('user-service-list', 'GET'): 2,
+    ('user-service-detail', 'GET'): 2,
+    ('payment-list', 'GET'): 2,
+    ('payment-detail', 'GET'): 2,
+    ('cookie-list', 'GET'): 2,
+    ('cookie-detail', 'GET'): 2,
+    ('register', 'POST'): 3,
+    ('login', 'POST'): 2,
+    ('email-verify', 'GET'): 1,
+    # Blacklist check, user, blacklist the old token (get + get + insert), outstand the new one
+    ('token_refresh', 'POST'): 6,
+    # Blacklist check
+    ('token_verify', 'POST'): 1,
+    # User lookup, outbox insert
+    ('request-reset-email', 'POST'): 2,
+    ('password-reset-confirm', 'GET'): 1,
+    ('password-reset-complete', 'PATCH'): 2,
+    ('logout', 'POST'): 4,
+    ('export', 'GET'): 2,
+    ('revenue', 'GET'): 3,
+    ('fmc_login', 'GET'): 1,
+    ('erp_login', 'GET'): 1,
+    ('customer_login', 'GET'): 1,
+    ('vendor_login', 'GET'): 1,
+}
+
+
+@override_settings(TOKEN_REVOCATION={'BACKEND': 'memory'}, AUDIT_BUFFER={'BACKEND': 'memory'})
+class QueryBudgetTests(TestCase):
+    """
+    Call every route against seeded data and fail on repeated queries or on
+    more queries than QUERY_BUDGETS allows
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=3, rows_per_user=5)
+        cls.user.is_staff = True
+        cls.user.save()
+
+    def tearDown(self):
+        # Write buffered login attempts inside the test transaction, not at exit
+        audit.get_buffer().flush()
+
+    def route_names(self):
+        def walk(patterns):
+            for pattern in patterns:
+                if hasattr(pattern, 'url_patterns'):
+                    yield from walk(pattern.url_patterns)
+                elif pattern.name:
+                    yield pattern.name
+        from fmc import urls as fmc_urls
+        from erp import urls as erp_urls
+        from customer import urls as customer_urls
+        from vendor import urls as vendor_urls
+        modules = (fmc_urls, erp_urls, customer_urls, vendor_urls)
+        return set(walk(urls.urlpatterns)) | {p.name for m in modules for p in m.urlpatterns}
+
+    def requests(self):
+        """(URL name, method, path, data, authenticated) for one call of every budgeted route"""
+        user = self.user
+        refresh = str(RefreshToken.for_user(user))
+        uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+        reset_token = PasswordResetTokenGenerator().make_token(user)
+        payment = Payment.objects.filter(user=user).first()
+        user_service = UserService.objects.filter(user=user).first()
+        cookie = Cookie.objects.filter(user_service=user_service).first()
+        api = '/api/auth'
+        return [
+            ('api-root', 'GET', f'{api}/', None, False),
+            ('subscription-list', 'GET', f'{api}/subscriptions/', None, True),
+            ('subscription-detail', 'GET', f'{api}/subscriptions/{user.subscription_id}/', None, True),
+            ('service-list', 'GET', f'{api}/services/', None, True),
+            ('service-detail', 'GET', f'{api}/services/{user_service.service_id}/', None, True),
+            ('user-service-list', 'GET', f'{api}/user-services/', None, True),
+            ('user-service-detail', 'GET', f'{api}/user-services/{user_service.pk}/', None, True),
+            ('payment-list', 'GET', f'{api}/payments/', None, True),
+            ('payment-detail', 'GET', f'{api}/payments/{payment.pk}/', None, True),
+            ('cookie-list', 'GET', f'{api}/cookies/', None, True),
+            ('cookie-detail', 'GET', f'{api}/cookies/{cookie.pk}/', None, True),
+            ('register', 'POST', f'{api}/register/', {
+                'email': 'budget@example.com', 'full_name': 'Budget', 'password': 'Password123',
+                'confirm_password': 'Password123',
+            }, False),
+            ('login', 'POST', f'{api}/login/', {'email': user.email, 'password': 'Password123'}, False),
+            ('email-verify', 'GET', f'{api}/email-verify/?token={user.tokens()["access"]}', None, False),
+            ('token_refresh', 'POST', f'{api}/token/refresh/', {'refresh': refresh}, False),
+            ('token_verify', 'POST', f'{api}/token/verify/', {'token': user.tokens()['access']}, False),
+            ('request-reset-email', 'POST', f'{api}/request-reset-email/', {'email': user.email}, False),
+            ('password-reset-confirm', 'GET', f'{api}/password-reset/{uidb64}/{reset_token}/', None, False),
+            ('password-reset-complete', 'PATCH', f'{api}/password-reset-complete/', {
+                'password': 'Password123', 'token': reset_token, 'uidb64': uidb64,
+            }, False),
+            ('logout', 'POST', f'{api}/logout/', {'refresh': str(RefreshToken.for_user(user))}, True),
+            ('export', 'GET', f'{api}/exports/payments.csv', None, True),
+            ('revenue', 'GET', f'{api}/revenue/', None, True),
+            ('fmc_login', 'GET', f'/api/fmc/login/?username={user.email}', None, False),
+            ('erp_login', 'GET', f'/api/erp/login/?username={user.email}', None, False),
+            ('customer_login', 'GET', f'/api/customer/login/?username={user.email}', None, False),
+            ('vendor_login', 'GET', f'/api/vendor/login/?username={user.email}', None, False),
+        ]
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(self.route_names() - {name for name, method in QUERY_BUDGETS}, set())
+        self.assertEqual({(name, method) for name, method, *rest in self.requests()}, set(QUERY_BUDGETS))
+
+    def test_routes_within_budget(self):
+        access = self.user.tokens()['access']
+        for name, method, path, data, authenticated in self.requests():
+            with self.subTest(route=name, method=method):
+                client = APIClient()
+                if authenticated:
+                    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+                cache.clear()
+                user_cache.get_user_cache().clear_local()
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    response = getattr(client, method.lower())(path, data, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+                self.assertEqual(recorder.problems(), [])
+                budget = QUERY_BUDGETS[(name, method)]
+                self.assertLessEqual(
+                    len(recorder.queries), budget,
+                    '\n'.join([f'{name} ran {len(recorder.queries)} queries, budget {budget}:']
+                               + [sql for sql, params in recorder.queries])
+                )
+
+
+# Queries per admin change-list page: session, user, COUNT, the page, and
+# one more for a foreign-key list filter's choices
+ADMIN_QUERY_BUDGETS = {
+    User: 4,
+    Subscription: 4,
+    Payment: 4,
+    Service: 5,
+    UserService: 5,
+    Cookie: 4,
+    CookieInjectionLog: 4,
+    OutboxEmail: 4,
+    LoginAttempt: 4,
+}
+
+
+class AdminChangeListTests(TestCase):
+    """Every change list, plain and searched, within a fixed query budget whatever the row count"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=3, rows_per_user=5)
+        cls.user.is_staff = cls.user.is_superuser = True
+        cls.user.save()
+        outbox.queue_email('Welcome', [cls.user.email], 'Hello')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, recorder
+
+    def test_every_admin_has_a_budget(self):
+        registered = {model for model in admin.site._registry if model._meta.app_label == 'authentication'}
+        self.assertEqual(registered, set(ADMIN_QUERY_BUDGETS))
+
+    def test_change_lists_within_budget(self):
+        for model, budget in ADMIN_QUERY_BUDGETS.items():
+            for params in ({}, {'q': 'user1'}):
+                with self.subTest(model=model.__name__, **params):
+                    response, recorder = self.changelist(model, **params)
+                    self.assertEqual(recorder.problems(), [])
+                    self.assertLessEqual(
+                        len(recorder.queries), budget,
+                        '\n'.join([f'{model.__name__} ran {len(recorder.queries)} queries, budget {budget}:']
+                                  + [sql for sql, params in recorder.queries])
+                    )
+
+    def test_change_forms_within_budget(self):
+        # Foreign keys to big tables are raw id inputs; a <select> would render
+        # every row's __str__. The raw id widget fetches its object again for
+        # the label, so repeats are expected here and only the total is capped.
+        budget = 11
+        for model in ADMIN_QUERY_BUDGETS:
+            obj = model.objects.first()
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_change', args=[obj.pk])
+            with self.subTest(model=model.__name__):
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(recorder.queries), budget, f'{model.__name__} ran {len(recorder.queries)} queries')
+
+    def test_search_through_foreign_keys(self):
+        owner = User.objects.get(email='user1@example.com')
+        response, _ = self.changelist(Cookie, q='user1@example')
+        self.assertEqual(
+            {cookie.pk for cookie in response.context['cl'].result_list},
+            set(Cookie.objects.filter(user_service__user=owner).values_list('pk', flat=True)),
+        )
+        response, _ = self.changelist(CookieInjectionLog, q='user1 ok')
+        self.assertEqual(
+            response.context['cl'].result_count,
+            CookieInjectionLog.objects.filter(cookie__user_service__user=owner, message__icontains='ok').count(),
+        )
+
+
+class EncryptedJSONFieldTests(TestCase):
+    def setUp(self):
+        self.user = seed_data(users=1, rows_per_user=1)
+        self.user_service = UserService.objects.filter(user=self.user).first()
+        self.field = UserService._meta.get_field('credentials')
+
+    def column(self):
+        return UserService.objects.filter(pk=self.user_service.pk).values_list('credentials', flat=True).get()
+
+    def payload(self):
+        return encryption.get_keyring().decrypt(self.column().encode())
+
+    def store_legacy(self, value):
+        # Rows written before the field existed hold the encrypted str(value)
+        token = fields.Ciphertext(encryption.get_keyring().encrypt(str(value).encode()).decode())
+        UserService.objects.filter(pk=self.user_service.pk).update(credentials=token)
+
+    def test_json_round_trip(self):
+        value = {'username': 'a@example.com', 'tokens': [1, 2.5, None, True], 'nested': {'k': 'v'}}
+        self.user_service.credentials = value
+        self.user_service.save()
+        self.assertEqual(self.payload()[:1], fields.JSON_MARKER)
+        loaded = UserService.objects.get(pk=self.user_service.pk)
+        self.assertIsInstance(loaded.__dict__['credentials'], fields.Ciphertext)
+        self.assertEqual(loaded.credentials, value)
+
+    @skipUnless(fields.msgpack, 'msgpack is not installed')
+    def test_msgpack_round_trip(self):
+        with override_settings(ENCRYPTED_FIELD_CODEC='msgpack'):
+            self.user_service.credentials = {'username': 'm@example.com', 'blob': b'\x00\x01'}
+            self.user_service.save()
+            self.assertEqual(self.payload()[:1], fields.MSGPACK_MARKER)
+        # Readable whichever codec is configured now
+        loaded = UserService.objects.get(pk=self.user_service.pk)
+        self.assertEqual(loaded.credentials, {'username': 'm@example.com', 'blob': b'\x00\x01'})
+
+    @skipIf(fields.msgpack, 'msgpack is installed')
+    def test_msgpack_codec_needs_msgpack(self):
+        with override_settings(ENCRYPTED_FIELD_CODEC='msgpack'), self.assertRaises(ImportError):
+            fields.encode_payload({'username': 'm@example.com'})
+
+    def test_legacy_rows_are_read_and_rewritten(self):
+        self.store_legacy({'username': 'legacy@example.com', 'remember': True})
+        loaded = UserService.objects.get(pk=self.user_service.pk)
+        self.assertEqual(loaded.credentials, {'username': 'legacy@example.com', 'remember': True})
+        self.assertTrue(fields.is_legacy_payload(self.payload()))
+        loaded.credentials['remember'] = False
+        loaded.save()
+        self.assertFalse(fields.is_legacy_payload(self.payload()))
+
+    def test_untouched_value_is_not_reencrypted(self):
+        loaded = UserService.objects.get(pk=self.user_service.pk)
+        token = self.column()
+        self.assertEqual(loaded.credentials, {'username': self.user.email})
+        self.assertFalse(self.field.is_dirty(loaded))
+        loaded.save()
+        self.assertEqual(self.column(), token)
+
+        # In-place changes to the decrypted value are noticed and saved
+        loaded.credentials['password'] = 'hunter2'
+        self.assertTrue(self.field.is_dirty(loaded))
+        loaded.save()
+        self.assertNotEqual(self.column(), token)
+        self.assertEqual(UserService.objects.get(pk=loaded.pk).credentials['password'], 'hunter2')
+
+    def test_ciphertext_passes_through_and_plaintext_is_encrypted(self):
+        token = self.column()
+        self.assertIs(self.field.get_prep_value(token), token)
+        UserService.objects.filter(pk=self.user_service.pk).update(credentials={'username': 'bulk@example.com'})
+        self.assertNotIn('bulk@example.com', self.column())
+        self.assertEqual(UserService.objects.get(pk=self.user_service.pk).credentials['username'], 'bulk@example.com')
+        UserService.objects.filter(pk=self.user_service.pk).update(credentials={})
+        self.assertEqual(self.column(), '')
+        self.assertEqual(UserService.objects.get(pk=self.user_service.pk).credentials, {})
+
+    def test_migration_converts_legacy_rows_both_ways(self):
+        migration = import_module('authentication.migrations.0005_encrypted_json_fields')
+        self.store_legacy({'username': 'legacy@example.com'})
+        cookie = Cookie.objects.filter(user_service=self.user_service).first()
+        migration.encode_rows(django_apps, None)
+        self.assertEqual(self.payload(), fields.JSON_MARKER + b'{"username":"legacy@example.com"}')
+        self.assertEqual(Cookie.objects.get(pk=cookie.pk).cookie_data, cookie.cookie_data)
+
+        migration.decode_rows(django_apps, None)
+        self.assertEqual(self.payload(), str({'username': 'legacy@example.com'}).encode())
+        self.assertEqual(UserService.objects.get(pk=self.user_service.pk).credentials, {'username': 'legacy@example.com'})
+
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+
+
+@override_settings(ENCRYPTION_KEYS=[OLD_KEY])
+class EncryptionKeyTests(TestCase):
+    def setUp(self):
+        self.user = seed_data(users=1, rows_per_user=2)
+
+    def rotated(self):
+        return override_settings(ENCRYPTION_KEYS=[NEW_KEY, OLD_KEY])
+
+    def test_old_key_still_decrypts_after_rotation(self):
+        token = encryption.get_keyring().encrypt(b'secret').decode()
+        self.assertFalse(encryption.needs_rotation(token))
+        with self.rotated():
+            self.assertEqual(encryption.get_keyring().decrypt(token.encode()), b'secret')
+            self.assertTrue(encryption.needs_rotation(token))
+            self.assertFalse(encryption.needs_rotation(encryption.get_keyring().encrypt(b'secret').decode()))
+            self.assertFalse(encryption.needs_rotation(''))
+            user_service = UserService.objects.filter(user=self.user).first()
+            self.assertEqual(user_service.credentials, {'username': self.user.email})
+
+    def test_keyring_follows_settings(self):
+        keyring = encryption.get_keyring()
+        self.assertIs(encryption.get_keyring(), keyring)
+        with self.rotated():
+            self.assertIsNot(encryption.get_keyring(), keyring)
+            self.assertEqual(len(encryption.get_fernets()), 2)
+        self.assertEqual(len(encryption.get_fernets()), 1)
+
+    def test_command_rotates_every_row(self):
+        with self.rotated():
+            out = io.StringIO()
+            call_command('rotate_encryption_keys', '--workers', '1', '--chunk-size', '2', stdout=out)
+            self.assertIn(f'Re-encrypted {UserService.objects.count()} of', out.getvalue())
+            for model, field in rotate_encryption_keys.TARGETS:
+                for token in model.objects.values_list(field, flat=True):
+                    self.assertFalse(encryption.needs_rotation(token))
+        with override_settings(ENCRYPTION_KEYS=[NEW_KEY]):
+            user_service = UserService.objects.filter(user=self.user).first()
+            self.assertEqual(user_service.credentials, {'username': self.user.email})
+
+    def test_command_skips_rows_changed_concurrently(self):
+        rows = list(UserService.objects.order_by('pk').values_list('pk', 'credentials'))
+        with self.rotated():
+            # Another request saves the first row after the chunk was read
+            changed = UserService.objects.get(pk=rows[0][0])
+            changed.credentials = {'username': 'changed@example.com'}
+            changed.save()
+            updated = rotate_encryption_keys.rotate_chunk(UserService, 'credentials', rows)
+            self.assertEqual(updated, len(rows) - 1)
+            changed.refresh_from_db()
+            self.assertEqual(changed.credentials, {'username': 'changed@example.com'})
+
+
+class SubscriptionExpiryTests(TestCase):
+    def setUp(self):
+        self.plan = Subscription.objects.create(name='Monthly', price=10, duration_days=30)
+        self.user = User.objects.create(email='payer@example.com', full_name='Payer', subscription=self.plan)
+
+    def pay(self, status='success', **kwargs):
+        return Payment.objects.create(
+            user=self.user, subscription=self.plan, amount=10, payment_status=status,
+            transaction_id=f'txn-{Payment.objects.count()}', payment_method='card', **kwargs
+        )
+
+    def stored(self):
+        return User.objects.get(pk=self.user.pk).subscription_expires_at
+
+    def test_payment_signals(self):
+        self.assertFalse(self.user.has_subscription())
+        self.pay('failed')
+        self.assertIsNone(self.stored())
+        payment = self.pay()
+        self.assertEqual(self.stored(), payment.timestamp + timedelta(days=30))
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_subscription())
+        payment.delete()
+        self.assertIsNone(self.stored())
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_subscription())
+
+    def test_payment_leaving_success_refreshes_expiry(self):
+        earlier = self.pay()
+        Payment.objects.filter(pk=earlier.pk).update(timestamp=timezone.now() - timedelta(days=10))
+        latest = self.pay()
+        self.assertEqual(self.stored(), latest.timestamp + timedelta(days=30))
+        latest.payment_status = 'failed'
+        latest.save()
+        earlier.refresh_from_db()
+        self.assertEqual(self.stored(), earlier.timestamp + timedelta(days=30))
+        earlier.payment_status = 'pending'
+        earlier.save()
+        self.assertIsNone(self.stored())
+
+    def test_expired_and_duration_change(self):
+        payment = self.pay()
+        Payment.objects.filter(pk=payment.pk).update(timestamp=timezone.now() - timedelta(days=40))
+        call_command('backfill_subscription_expiry', stdout=io.StringIO())
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_subscription())
+        self.plan.duration_days = 60
+        self.plan.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_subscription())
+        self.assertEqual(list(User.objects.active_subscribers()), [self.user])
+
+    def test_backfill_command(self):
+        payment = self.pay()
+        User.objects.update(subscription_expires_at=None)
+        out = io.StringIO()
+        call_command('backfill_subscription_expiry', '--chunk-size', '1', stdout=out)
+        self.assertIn('for 1 users', out.getvalue())
+        self.assertEqual(self.stored(), payment.timestamp + timedelta(days=30))
+
+    def test_stale_save_keeps_expiry(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.pay()
+        stale.full_name = 'Renamed'
+        stale.save()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.full_name, 'Renamed')
+        self.assertTrue(user.has_subscription())
+
+        # Changing the plan still recomputes the expiry
+        yearly = Subscription.objects.create(name='Yearly', price=100, duration_days=365)
+        user.subscription = yearly
+        user.save()
+        self.assertGreater(self.stored(), timezone.now() + timedelta(days=300))
+        user.subscription = None
+        user.save()
+        self.assertIsNone(self.stored())
+
+
+class CookieExpiryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(users=2, rows_per_user=5)
+
+    def test_expire_stale_moves_past_cookies_to_expired(self):
+        stale = Cookie.objects.filter(status='valid', expires_at__lte=timezone.now()).count()
+        self.assertGreater(stale, 0)
+        valid = Cookie.objects.currently_valid().count()
+
+        self.assertEqual(Cookie.objects.expire_stale(chunk_size=3), stale)
+        self.assertFalse(Cookie.objects.stale().exists())
+        self.assertEqual(Cookie.objects.currently_valid().count(), valid)
+        self.assertEqual(Cookie.objects.expire_stale(), 0)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    AUDIT_BUFFER={'BACKEND': 'sync'},
+)
+class LoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User(email='login@example.com', full_name='Login User', email_verified=True)
+        cls.user.set_password('Password123')
+        cls.user.save()
+
+    def login(self, password='Password123'):
+        return self.client.post(
+            '/api/auth/login/', {'email': self.user.email, 'password': password},
+            content_type='application/json'
+        )
+
+    def test_login_loads_user_once(self):
+        # User lookup, OutstandingToken insert, LoginAttempt insert
+        with self.assertNumQueries(3):
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['tokens']), {'refresh', 'access'})
+        self.assertTrue(LoginAttempt.objects.filter(user=self.user, success=True).exists())
+
+    def test_login_rejects_wrong_password(self):
+        response = self.login(password='WrongPassword1')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(LoginAttempt.objects.exists())
+
+
+@override_settings(AUDIT_BUFFER={'BACKEND': 'memory', 'MAX_SIZE': 100, 'FLUSH_INTERVAL': 60})
+class AuditBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='audit@example.com', full_name='Audit User')
+
+    def test_events_are_written_in_bulk_on_flush(self):
+        happened_at = timezone.now() - timedelta(minutes=5)
+        for _ in range(3):
+            audit.record_login_attempt(
+                user=self.user, success=False, ip_address='10.0.0.1',
+                user_agent='tests', timestamp=happened_at
+            )
+        self.assertFalse(LoginAttempt.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(audit.get_buffer().flush(), 3)
+        self.assertEqual(
+            list(LoginAttempt.objects.values_list('timestamp', flat=True).distinct()),
+            [happened_at]
+        )
+
+    def test_rewriting_a_batch_does_not_duplicate_rows(self):
+        event = audit.encode_event(LoginAttempt, {
+            'user': self.user, 'success': True, 'ip_address': '10.0.0.1', 'user_agent': 'tests'
+        })
+        audit.write_events([event])
+        audit.write_events([event])
+        self.assertEqual(LoginAttempt.objects.count(), 1)
+
+    def test_memory_buffer_hands_over_quiet_batches(self):
+        handed_over = threading.Event()
+        buffer = audit.MemoryBuffer(max_size=100, flush_interval=0.05)
+        with mock.patch.object(audit, 'schedule_flush', side_effect=lambda batch: handed_over.set()) as schedule:
+            buffer.add('event')
+            self.assertTrue(handed_over.wait(5))
+        schedule.assert_called_once_with(['event'])
+        self.assertEqual(buffer.events, [])
+
+    def test_redis_events_stay_queued_until_written(self):
+        event = audit.encode_event(LoginAttempt, {
+            'user': self.user, 'success': True, 'ip_address': '10.0.0.1', 'user_agent': 'tests'
+        }).encode()
+        client = mock.Mock()
+        with mock.patch('redis.Redis.from_url', return_value=client):
+            buffer = audit.RedisBuffer('redis://localhost', 'audit:events', 500)
+        client.lrange.side_effect = [[event]]
+        with mock.patch.object(audit, 'write_events', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+        buffer.trim.assert_not_called()
+
+        client.lrange.side_effect = [[event], []]
+        self.assertEqual(buffer.flush(), 1)
+        buffer.trim.assert_called_once_with(keys=['audit:events'], args=[event, 1])
+        self.assertEqual(LoginAttempt.objects.count(), 1)
+
+    def test_redis_outage_logs_one_traceback_per_interval(self):
+        import redis
+        client = mock.Mock(**{'rpush.side_effect': redis.ConnectionError('refused')})
+        with mock.patch('redis.Redis.from_url', return_value=client):
+            buffer = audit.RedisBuffer('redis://localhost', 'audit:events', 500)
+        with self.assertLogs('authentication.audit', 'WARNING') as logs:
+            for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+                buffer.add(audit.encode_event(LoginAttempt, {
+                    'user': self.user, 'success': True, 'ip_address': ip, 'user_agent': 'tests'
+                }))
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(LoginAttempt.objects.count(), 3)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OutboxTests(TestCase):
+    def test_register_queues_verification_email(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/auth/register/', {
+                'email': 'new@example.com', 'full_name': 'New User',
+                'password': 'Password123', 'confirm_password': 'Password123',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ['new@example.com'])
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(len(callbacks), 1)
+
+    def test_deliver_sends_batch_over_one_connection(self):
+        for i in range(3):
+            outbox.queue_email('Hello', [f'user{i}@example.com'], 'Body')
+        self.assertEqual(outbox.deliver_pending(batch_size=2), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
+
+    def test_failed_send_is_retried_later(self):
+        email = outbox.queue_email('Hello', ['user@example.com'], 'Body')
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('refused')):
+            self.assertEqual(outbox.deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Not due yet, so nothing is picked up
+        self.assertEqual(outbox.deliver_pending(), (0, 0))
+
+    def test_connection_failure_backs_off_every_due_email(self):
+        emails = [outbox.queue_email('Hello', [f'user{i}@example.com'], 'Body') for i in range(3)]
+        connection = mock.Mock(**{'open.side_effect': OSError('connection refused')})
+        with self.assertLogs('authentication.outbox', 'WARNING'):
+            self.assertEqual(outbox.deliver_pending(batch_size=2, connection=connection), (0, 3))
+        connection.open.assert_called_once()
+        for email in emails:
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'connection refused'))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+        # Nothing is due, so the next run doesn't even connect
+        self.assertEqual(outbox.deliver_pending(connection=connection), (0, 0))
+        connection.open.assert_called_once()
+
+    @override_settings(CELERY_BROKER_URL='redis://127.0.0.1:1/0')
+    def test_broker_down_does_not_hold_up_the_request(self):
+        from .tasks import deliver_outbox_emails
+        app = deliver_outbox_emails.app
+        connect = app.connection_for_write
+        unreachable = lambda **kwargs: connect(settings.CELERY_BROKER_URL, **kwargs)
+        with mock.patch.object(app, 'connection_for_write', unreachable), \
+                self.assertLogs('authentication.outbox', 'WARNING'):
+            started = timezone.now()
+            outbox.schedule_delivery()
+        self.assertLess(timezone.now() - started, timedelta(seconds=outbox.PUBLISH_TIMEOUT * 2))
+
+
+class SparseResponseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=1, rows_per_user=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cookie_list_does_not_load_encrypted_data(self):
+        with CaptureQueriesContext(connection) as ctx, \
+                mock.patch('authentication.fields.EncryptedJSONField.decrypt_payload') as decrypt:
+            response = self.client.get('/api/auth/cookies/')
+        self.assertEqual(response.status_code, 200)
+        decrypt.assert_not_called()
+        self.assertNotIn('cookie_data', response.json()['results'][0])
+        self.assertFalse(any('_cookie_data' in q['sql'] for q in ctx.captured_queries))
+
+    def test_user_service_detail_keeps_credentials(self):
+        user_service = UserService.objects.filter(user=self.user).first()
+        response = self.client.get(f'/api/auth/user-services/{user_service.pk}/')
+        self.assertEqual(response.json()['credentials'], {'username': self.user.email})
+
+    def test_fields_parameter_limits_output_and_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/auth/payments/', {'fields': 'id,payment_status'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'payment_status'})
+        select = next(q['sql'] for q in ctx.captured_queries if 'FROM "authentication_payment"' in q['sql'] and 'COUNT' not in q['sql'])
+        self.assertNotIn('billing_details', select)
+
+    def test_fields_parameter_keeps_cursor_columns(self):
+        for path in ('/api/auth/payments/', '/api/auth/cookies/'):
+            with self.assertNumQueries(1):
+                response = self.client.get(path, {'fields': 'id', 'page_size': 2})
+            self.assertEqual(set(response.json()['results'][0]), {'id'})
+            self.assertIsNotNone(response.json()['next'])
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='catalog@example.com', full_name='Catalog User')
+        cls.subscription = Subscription.objects.create(name='Pro', price=10, duration_days=30)
+        cls.service = Service.objects.create(
+            name='Mail', login_url='https://mail.example.com', description='',
+            required_subscription=cls.subscription
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_warm_cache_serves_without_queries(self):
+        first = self.client.get('/api/auth/services/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/auth/services/')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_matching_etag_returns_304_without_body(self):
+        etag = self.client.get(f'/api/auth/subscriptions/{self.subscription.pk}/')['ETag']
+        response = self.client.get(f'/api/auth/subscriptions/{self.subscription.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_saving_a_service_invalidates_the_catalog(self):
+        etag = self.client.get('/api/auth/services/')['ETag']
+        self.service.name = 'Webmail'
+        self.service.save()
+        response = self.client.get('/api/auth/services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['name'], 'Webmail')
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=1, rows_per_user=15)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_follow_cursor_without_count(self):
+        seen = []
+        url = '/api/auth/payments/'
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+            self.assertNotIn('total', response.json())
+            seen.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+        expected = Payment.objects.filter(user=self.user).order_by('-timestamp', '-id')
+        self.assertEqual(seen, [str(pk) for pk in expected.values_list('pk', flat=True)])
+
+    def test_total_on_request(self):
+        response = self.client.get('/api/auth/cookies/', {'include_total': 'true'})
+        self.assertEqual(response.json()['total'], Cookie.objects.filter(user_service__user=self.user).count())
+        self.assertIn('total_is_estimate', response.json())
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=2, rows_per_user=5)
+        cls.user.is_staff = cls.user.is_superuser = True
+        cls.user.save()
+
+    def paginator(self, queryset):
+        return pagination.EstimatedCountPaginator(queryset.order_by('-timestamp', '-id'), 4)
+
+    def test_exact_count_off_postgresql(self):
+        paginator = self.paginator(LoginAttempt.objects.all())
+        self.assertEqual(paginator.count, LoginAttempt.objects.count())
+        self.assertFalse(paginator.is_estimate)
+
+    def test_exact_count_below_threshold(self):
+        with mock.patch.object(pagination, 'table_estimate', return_value=500):
+            paginator = self.paginator(LoginAttempt.objects.all())
+            self.assertEqual(paginator.count, LoginAttempt.objects.count())
+        self.assertFalse(paginator.is_estimate)
+
+    def test_table_estimate_for_unfiltered_list(self):
+        with mock.patch.object(pagination, 'table_estimate', return_value=2_000_000), \
+                CaptureQueriesContext(connection) as ctx:
+            paginator = self.paginator(LoginAttempt.objects.all())
+            self.assertEqual(paginator.count, 2_000_000)
+        self.assertTrue(paginator.is_estimate)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_planner_estimate_for_filtered_list(self):
+        with mock.patch.object(pagination, 'table_estimate', return_value=2_000_000), \
+                mock.patch.object(pagination, 'estimate_count', return_value=(1200, True)) as estimate:
+            paginator = self.paginator(LoginAttempt.objects.filter(success=True))
+            self.assertEqual(paginator.count, 1200)
+        estimate.assert_called_once()
+
+    def test_pages_past_a_low_estimate(self):
+        with mock.patch.object(pagination, 'table_estimate', return_value=200_000), \
+                mock.patch.object(pagination, 'estimate_count', return_value=(4, True)):
+            paginator = self.paginator(LoginAttempt.objects.filter(success=False))
+            page = paginator.page(2)
+        self.assertEqual(len(page.object_list), LoginAttempt.objects.filter(success=False).count() - 4)
+
+    def test_admin_change_lists(self):
+        self.client.force_login(self.user)
+        for model in (Payment, LoginAttempt, CookieInjectionLog):
+            with self.subTest(model=model.__name__), \
+                    mock.patch.object(pagination, 'table_estimate', return_value=3_000_000):
+                response = self.client.get(reverse(f'admin:authentication_{model._meta.model_name}_changelist'))
+                self.assertEqual(response.context['cl'].result_count, 3_000_000)
+
+
+class CachedUserAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='cached@example.com', full_name='Cached User')
+
+    def setUp(self):
+        cache.clear()
+        self.user_cache = user_cache.get_user_cache()
+        self.user_cache.clear_local()
+        self.user_cache.reset_stats()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.tokens()['access']}")
+
+    def test_repeat_requests_skip_user_lookup(self):
+        self.client.get('/api/auth/payments/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/api/auth/payments/').status_code, 200)
+        self.assertFalse(any('FROM "authentication_user"' in q['sql'] for q in ctx.captured_queries))
+        stats = self.user_cache.stats()
+        self.assertEqual((stats['misses'], stats['local_hits']), (1, 1))
+
+    def test_shared_cache_serves_other_processes(self):
+        self.client.get('/api/auth/payments/')
+        self.user_cache.clear_local()
+        self.client.get('/api/auth/payments/')
+        self.assertEqual(self.user_cache.stats()['shared_hits'], 1)
+
+    def test_deactivation_takes_effect_immediately(self):
+        self.assertEqual(self.client.get('/api/auth/payments/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/payments/').status_code, 401)
+
+    def test_request_user_is_a_private_copy(self):
+        first = self.user_cache.get(self.user.pk, load_user)
+        first.full_name = 'Changed'
+        self.assertEqual(self.user_cache.get(self.user.pk, load_user).full_name, 'Cached User')
+
+
+class ModuleProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(company_name='Forsys', company_code='FS')
+        cls.branch = Branch.objects.create(company=cls.company, branch_code='FS-1', branch_name='Head Office')
+        cls.user = User.objects.create(
+            email='module@example.com', full_name='Module User', phone_number='5550100',
+            company=cls.company, branch=cls.branch,
+            login_type=LoginType.objects.create(login_type='erp'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_profile_is_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            profile = profiles.get_profile(self.user.email)
+        self.assertEqual(
+            (profile['company'], profile['branch'], profile['login_type'], profile['mobile']),
+            ('Forsys', 'Head Office', 'erp', '5550100')
+        )
+        with self.assertNumQueries(0):
+            profiles.get_profile(self.user.email)
+
+    def test_changes_invalidate_profile(self):
+        profiles.get_profile(self.user.email)
+        self.company.company_name = 'Forsys Ltd'
+        self.company.save()
+        self.assertEqual(profiles.get_profile(self.user.email)['company'], 'Forsys Ltd')
+        self.branch.delete()
+        self.assertIsNone(profiles.get_profile(self.user.email)['branch'])
+        user = User.objects.get(pk=self.user.pk)
+        user.full_name = 'Renamed User'
+        user.save()
+        self.assertEqual(profiles.get_profile(self.user.email)['full_name'], 'Renamed User')
+
+    def test_module_login_endpoints(self):
+        for module, key, message in (
+            ('fmc', 'Message', 'Hello From FMC Module'),
+            ('erp', 'Message', 'Hello From ERP Module'),
+            ('customer', 'message', 'Hello From Customer MOdule'),
+            ('vendor', 'Message', 'Hello From Vendor Module'),
+        ):
+            response = self.client.get(f'/api/{module}/login/', {'username': self.user.email, 'tokens': 'abc'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response.json()[key], response.json()['token']), (message, 'abc'))
+        response = self.client.get('/api/fmc/login/', {'username': 'missing@example.com'})
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkLoadTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def load(self, **files):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('bulkload', *[f'{kind}={path}' for kind, path in files.items()], stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_loads_companies_branches_and_users(self):
+        files = {
+            'companies': self.write('companies.csv', 'company_code,company_name,company_type,head_office,latitude\nACME,Acme Inc,Private,Dhaka,23.81\n'),
+            'branches': self.write('branches.csv', 'branch_code,company_code,branch_name,address\nACME-DHK,ACME,Dhaka Branch,Banani\n'),
+            'logintypes': self.write('logintypes.jsonl', '{"login_type": "erp"}\n'),
+            'users': self.write('users.jsonl', '\n'.join([
+                '{"email": "one@EXAMPLE.com", "full_name": "One", "branch_code": "ACME-DHK", "login_type": "erp"}',
+                '{"email": "two@example.com", "full_name": "Two", "password": "%s"}' % make_password('Password123'),
+                '{"email": "three@example.com", "full_name": "Three", "branch_code": "MISSING"}',
+                '{"email": "four@example.com", "full_name": "Four", "password": "Password123"}',
+            ])),
+        }
+        out, err = self.load(**files)
+
+        one = User.objects.select_related('company', 'branch', 'login_type').get(email='one@example.com')
+        self.assertEqual((one.company.company_code, one.branch.branch_code, one.login_type.login_type), ('ACME', 'ACME-DHK', 'erp'))
+        self.assertFalse(one.has_usable_password())
+        self.assertTrue(User.objects.get(email='two@example.com').check_password('Password123'))
+        self.assertEqual(Company.objects.get().latitude, 23.81)
+        self.assertIn('users: 2 inserted, 0 already present, 2 skipped of 4 rows', out)
+        self.assertIn("row 3: unknown branch_code 'MISSING'", err)
+        self.assertIn('row 4: Unknown password hashing algorithm', err)
+
+        # Loading the same files again adds nothing
+        out, err = self.load(**files)
+        self.assertIn('companies: 0 inserted, 1 already present', out)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_small_batches(self):
+        rows = ({'login_type': f'type{i}'} for i in range(25))
+        stats = bulkload.LoginTypeLoader(batch_size=10).load(rows)
+        self.assertEqual((stats['rows'], stats['inserted']), (25, 25))
+        self.assertEqual(LoginType.objects.count(), 25)
+
+    def test_copy_text_escapes(self):
+        self.assertEqual(
+            [bulkload.copy_text(v) for v in (None, True, 1.5, 'a\tb\\c\nd')],
+            ['\\N', 't', '1.5', 'a\\tb\\\\c\\nd']
+        )
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=3, rows_per_user=4)
+        cls.staff = User.objects.create(email='staff@example.com', full_name='Staff', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.token = self.staff.tokens()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def get(self, path, **params):
+        response = self.client.get(f'/api/auth/exports/{path}', params)
+        return response, b''.join(response.streaming_content) if response.streaming else None
+
+    def test_csv_streams_every_payment_in_order(self):
+        response, body = self.get('payments.csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0].split(','), exports.EXPORTS['payments'].headers)
+        self.assertEqual(len(lines) - 1, Payment.objects.count())
+        timestamps = [line.split(',')[1] for line in lines[1:]]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_filters_and_gzip(self):
+        Payment.objects.filter(pk=Payment.objects.order_by('pk').values('pk')[:1]).update(
+            payment_status='refunded', timestamp=timezone.now() - timedelta(days=30)
+        )
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response, body = self.get('payments.jsonl', status='refunded', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+        self.assertEqual([row['status'] for row in rows], ['refunded'])
+
+        response, body = self.get('payments.jsonl', status='refunded', since=since)
+        self.assertEqual(body, b'')
+        response, body = self.get('login-attempts.jsonl', status='failure')
+        self.assertEqual(len(body.splitlines()), LoginAttempt.objects.filter(success=False).count())
+
+    def test_csv_escapes_formulas(self):
+        Payment.objects.update(refund_reason='=HYPERLINK("http://evil.example")')
+        LoginAttempt.objects.update(user_agent='@SUM(1+1)')
+        rows = list(csv.reader(io.StringIO(self.get('payments.csv')[1].decode())))
+        self.assertEqual({row[-1] for row in rows[1:]}, {'\'=HYPERLINK("http://evil.example")'})
+        rows = list(csv.reader(io.StringIO(self.get('login-attempts.csv')[1].decode())))
+        self.assertEqual({row[5] for row in rows[1:]}, {"'@SUM(1+1)"})
+        # JSON keeps the raw value
+        row = json.loads(self.get('login-attempts.jsonl')[1].splitlines()[0])
+        self.assertEqual(row['user_agent'], '@SUM(1+1)')
+
+    def test_rejects_bad_input_and_non_staff(self):
+        self.assertEqual(self.get('payments.csv', since='last week')[0].status_code, 400)
+        self.assertEqual(self.get('payments.csv', status='lost')[0].status_code, 400)
+        self.assertEqual(self.get('users.csv')[0].status_code, 404)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.tokens()['access']}")
+        self.assertEqual(self.get('payments.csv')[0].status_code, 403)
+
+    async def test_streams_through_asgi_handler(self):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/auth/exports/payments.jsonl', 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {self.token}'.encode())],
+        }
+        sent = []
+        messages = asyncio.Queue()
+        messages.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+
+        async def receive():
+            # The handler cancels the wait for a disconnect once it's done
+            return await messages.get()
+
+        async def send(message):
+            sent.append(message)
+
+        # As the test client does, keep the test transaction's connection open
+        request_started.disconnect(close_old_connections)
+        try:
+            with mock.patch.object(exports, 'BLOCK_SIZE', 200), warnings.catch_warnings():
+                # Django warns when it has to buffer a sync iterator
+                warnings.simplefilter('error')
+                await ASGIHandler()(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+        self.assertEqual(sent[0]['status'], 200)
+        bodies = [message['body'] for message in sent[1:] if message.get('body')]
+        self.assertGreater(len(bodies), 2)
+        self.assertEqual(len(b''.join(bodies).splitlines()), await Payment.objects.acount())
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'payments.csv.gz')
+            call_command('export', 'payments', '--gzip', '-o', path, stdout=io.StringIO())
+            with open(path, 'rb') as f:
+                lines = gzip.decompress(f.read()).splitlines()
+        self.assertEqual(len(lines) - 1, Payment.objects.count())
+
+
+class LogPartitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(users=2, rows_per_user=3)
+        cls.old = timezone.now() - timedelta(days=430)
+        LoginAttempt.objects.filter(pk__in=LoginAttempt.objects.order_by('pk').values('pk')[:2]).update(timestamp=cls.old)
+        CookieInjectionLog.objects.filter(
+            pk__in=CookieInjectionLog.objects.order_by('pk').values('pk')[:3]
+        ).update(timestamp=cls.old)
+
+    def archive(self, directory, *args):
+        out = io.StringIO()
+        call_command('archive_log_partitions', '--archive-dir', directory, *args, stdout=out)
+        return out.getvalue()
+
+    def read(self, directory, model):
+        path = partitions.archive_path(directory, model._meta.db_table, partitions.month_start(self.old))
+        with gzip.open(path, 'rt') as f:
+            return [json.loads(line) for line in f]
+
+    def test_months(self):
+        # Months are UTC: 23:00 at UTC-1 on New Year's Eve is already January
+        january = partitions.month_start(datetime(2025, 12, 31, 23, tzinfo=timezone.get_fixed_timezone(-60)))
+        self.assertEqual(january.isoformat(), '2026-01-01T00:00:00+00:00')
+        december = partitions.add_months(january, -1)
+        self.assertEqual(partitions.add_months(december, -12).year, 2024)
+        self.assertEqual(partitions.partition_name('authentication_loginattempt', december), 'authentication_loginattempt_p202512')
+        self.assertEqual(partitions.ensure_partitions(), [])
+
+    def test_archives_expired_months(self):
+        old_attempts = {str(pk) for pk in LoginAttempt.objects.filter(timestamp=self.old).values_list('pk', flat=True)}
+        total = LoginAttempt.objects.count() + CookieInjectionLog.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = self.archive(directory, '--dry-run')
+            self.assertIn('would be archived', output)
+            self.assertEqual(LoginAttempt.objects.count() + CookieInjectionLog.objects.count(), total)
+            self.assertFalse(os.listdir(directory))
+
+            self.archive(directory)
+            self.assertFalse(LoginAttempt.objects.filter(timestamp__lt=timezone.now() - timedelta(days=365)).exists())
+            self.assertEqual(LoginAttempt.objects.count() + CookieInjectionLog.objects.count(), total - 5)
+            self.assertEqual({row['id'] for row in self.read(directory, LoginAttempt)}, old_attempts)
+            self.assertEqual(len(self.read(directory, CookieInjectionLog)), 3)
+
+            # A late row for an archived month lands in the same file
+            LoginAttempt.objects.create(
+                user=User.objects.first(), success=False, ip_address='127.0.0.1', user_agent='tests', timestamp=self.old
+            )
+            self.assertIn('1 rows', self.archive(directory))
+            self.assertEqual(len(self.read(directory, LoginAttempt)), 3)
+            self.assertNotIn('rows', self.archive(directory, '--retention-months', '12'))
+
+    def test_failed_archive_writes_nothing(self):
+        total = LoginAttempt.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch('django.db.models.query.QuerySet.delete', side_effect=DatabaseError('locked')):
+                with self.assertRaises(DatabaseError):
+                    self.archive(directory)
+            self.assertEqual(LoginAttempt.objects.count(), total)
+            self.assertEqual([files for _, _, files in os.walk(directory) if files], [])
+
+            self.archive(directory)
+            self.assertEqual(len(self.read(directory, LoginAttempt)), 2)
+
+
+class RevenueRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=4, rows_per_user=6)
+        cls.staff = User.objects.create(email='staff@example.com', full_name='Staff', is_staff=True)
+
+    def rollup(self):
+        return sorted(DailyRevenue.objects.values_list(
+            'date', 'subscription', 'payment_method', *revenue.TOTALS
+        ))
+
+    def test_signals_match_rebuild(self):
+        payment = Payment.objects.filter(payment_status='success').first()
+        payment.payment_status = 'refunded'
+        payment.save()
+        Payment.objects.filter(payment_status='failed').first().delete()
+        incremental = self.rollup()
+        revenue.rebuild()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_refund_moves_amount(self):
+        before = revenue.summary()['totals']
+        payment = Payment.objects.filter(payment_status='success').first()
+        payment.payment_status = 'refunded'
+        payment.save()
+        after = revenue.summary()['totals']
+        self.assertEqual(after['success_amount'], before['success_amount'] - payment.amount)
+        self.assertEqual(after['refunded_count'], before['refunded_count'] + 1)
+        self.assertEqual(after['gross_amount'], before['gross_amount'])
+        self.assertGreater(after['churn_rate'], before['churn_rate'])
+
+    def test_endpoint_reads_rollup_only(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.staff.tokens()['access']}")
+        today = timezone.localdate()
+        client.get('/api/auth/revenue/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/auth/revenue/', {'since': today.isoformat(), 'group_by': 'payment_method'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('"authentication_payment"' in q['sql'] for q in ctx.captured_queries))
+        data = response.json()
+        self.assertEqual(data['totals']['success_count'], Payment.objects.filter(payment_status='success').count())
+        self.assertEqual([row['payment_method'] for row in data['rows']], ['card'])
+        self.assertEqual(client.get('/api/auth/revenue/', {'until': '2026-02-30'}).status_code, 400)
+        self.assertEqual(client.get('/api/auth/revenue/', {'group_by': 'user'}).status_code, 400)
+
+
+@override_settings(METRICS={'TOKEN': 'scrape'})
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=1, rows_per_user=3)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def scrape(self):
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_latency_queries_and_size_per_view(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.tokens()['access']}")
+        body = self.client.get('/api/auth/payments/').content
+        self.client.get('/api/auth/payments/')
+        self.client.credentials()
+
+        text = self.scrape()
+        labels = 'view="payment-list",method="GET",status="2xx"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', text)
+        # User and page queries, then only the page once the user is cached
+        self.assertIn(f'http_request_db_queries_bucket{{{labels},le="1"}} 1', text)
+        self.assertIn(f'http_request_db_queries_sum{{{labels}}} 3', text)
+        self.assertIn(f'http_response_size_bytes_sum{{{labels}}} {2 * len(body)}', text)
+        self.assertIn('user_cache_lookups_total{outcome="local_hits"}', text)
+        self.assertNotIn('view="metrics"', text)
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+
+    def test_closed_without_token_or_allowed_ip(self):
+        with self.settings(METRICS={}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(METRICS={'ALLOWED_IPS': ['10.0.0.9']}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    def test_sums_published_processes(self):
+        labels = (('view', 'login'), ('method', 'POST'), ('status', '2xx'))
+        other = metrics.Registry(metrics.get_config())
+        other.observe('http_request_db_queries', labels, 3)
+        cache.set('metrics:otherhost:1', other.snapshot())
+        cache.set('metrics:processes', {'metrics:otherhost:1': float('inf')})
+        metrics.get_registry().observe('http_request_db_queries', labels, 1)
+        text = self.scrape()
+        self.assertIn('http_request_db_queries_count{view="login",method="POST",status="2xx"} 2', text)
+        self.assertIn('http_request_db_queries_sum{view="login",method="POST",status="2xx"} 4', text)
+
+
+@override_settings(SENTRY_ENVIRONMENT='production', TRACING={
+    'DEFAULT_RATE': 0.1,
+    'RULES': [(r'^/metrics$', 0), (r'^/api/auth/login/', 0.5), (r'^celery:.*expire_cookies$', 0)],
+    'ENVIRONMENTS': {'staging': {'DEFAULT_RATE': 1.0}},
+})
+class TraceSamplingTests(TestCase):
+    def test_rules_by_path_and_task(self):
+        self.assertEqual(tracing.traces_sampler({'wsgi_environ': {'PATH_INFO': '/metrics'}}), 0)
+        self.assertEqual(tracing.traces_sampler({'asgi_scope': {'path': '/api/auth/login/'}}), 0.5)
+        self.assertEqual(tracing.traces_sampler({'wsgi_environ': {'PATH_INFO': '/api/auth/payments/'}}), 0.1)
+        self.assertEqual(
+            tracing.traces_sampler({'celery_job': {'task': 'authentication.tasks.expire_cookies'}}), 0
+        )
+
+    def test_upstream_decision_wins(self):
+        self.assertEqual(tracing.traces_sampler({'parent_sampled': True, 'wsgi_environ': {'PATH_INFO': '/metrics'}}), 1.0)
+
+    def test_environment_overrides(self):
+        with self.settings(SENTRY_ENVIRONMENT='staging'):
+            self.assertEqual(tracing.traces_sampler({'wsgi_environ': {'PATH_INFO': '/api/auth/payments/'}}), 1.0)
+
+
+@override_settings(TOKEN_REVOCATION={'BACKEND': 'memory'})
+class TokenRevocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='revoke@example.com', full_name='Revoke User')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.refresh = self.user.tokens()['refresh']
+
+    def test_rotated_token_is_refused_without_blacklist_query(self):
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(any('token_blacklist_blacklistedtoken' in q['sql'] for q in ctx.captured_queries))
+
+    def test_logout_revokes_refresh_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.tokens()['access']}")
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': self.refresh}).status_code, 200)
+        self.assertTrue(revocation.is_revoked(RefreshToken(self.refresh, verify=False)['jti']))
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}).status_code, 401)
+
+    def test_purge_removes_expired_tokens(self):
+        self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh})
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        revocation.get_revocations().members = {jti: 0 for jti in revocation.get_revocations().members}
+        self.assertEqual(revocation.purge_expired_tokens(chunk_size=1), 2)
+        self.assertEqual(revocation.table_sizes(), {'outstanding': 0, 'blacklisted': 0, 'revocation_set': 0})
+
+    @override_settings(TOKEN_REVOCATION={'BACKEND': 'redis', 'REDIS_URL': 'redis://localhost'})
+    def test_failed_redis_add_is_still_revoked_after_recovery(self):
+        import redis
+        members = {}
+        down = True
+
+        def zadd(key, mapping):
+            if down:
+                raise redis.ConnectionError('refused')
+            members.update(mapping)
+
+        client = mock.MagicMock(**{'zadd.side_effect': zadd, 'delete.side_effect': redis.ConnectionError('refused')})
+        # The set is marked ready but lacks the JTI whose add failed
+        pipe = client.pipeline.return_value.__enter__.return_value
+        pipe.execute.side_effect = lambda: [1, members.get(pipe.zscore.call_args.args[1])]
+        jti = RefreshToken(self.refresh, verify=False)['jti']
+        with mock.patch('redis.Redis.from_url', return_value=client):
+            with self.assertLogs('authentication.revocation', 'WARNING'):
+                revocation.revoke(jti, timezone.now() + timedelta(days=1))
+            down = False
+            self.assertTrue(revocation.is_revoked(jti))
+        self.assertIn(jti, members)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['authentication.hashers.TunableArgon2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_HASHING={'WORKERS': 2, 'ARGON2_TIME_COST': 1, 'ARGON2_MEMORY_COST': 1024},
+    AUDIT_BUFFER={'BACKEND': 'sync'},
+)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='hash@example.com', full_name='Hash User', email_verified=True)
+
+    def login(self):
+        return self.client.post(
+            '/api/auth/login/', {'email': self.user.email, 'password': 'Password123'},
+            content_type='application/json'
+        )
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        self.user.password = make_password('Password123', hasher='md5')
+        self.user.save()
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$'))
+        self.assertTrue(self.user.check_password('Password123'))
+
+    def test_raising_the_cost_rehashes_on_login(self):
+        set_password(self.user, 'Password123')
+        self.user.save()
+        with override_settings(PASSWORD_HASHING={'WORKERS': 2, 'ARGON2_TIME_COST': 2, 'ARGON2_MEMORY_COST': 1024}):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn('t=2', self.user.password)
+
+    def test_hashing_runs_in_the_pool(self):
+        set_password(self.user, 'Password123')
+        threads = []
+        original = hashers.check
+
+        def check(*args):
+            threads.append(threading.current_thread().name)
+            return original(*args)
+
+        with mock.patch.object(hashers, 'check', check):
+            self.assertTrue(hashers.verify_password(self.user, 'Password123'))
+        self.assertTrue(threads[0].startswith('password-hasher'))
+
+
+# Mounted by AsyncViewTests through ROOT_URLCONF
+urlpatterns = [path('api/auth/', include(urls.build_urlpatterns(async_api=True)))]
+
+
+@override_settings(
+    ROOT_URLCONF='authentication.tests',
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    AUDIT_BUFFER={'BACKEND': 'sync'},
+)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_data(users=1, rows_per_user=3)
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {'Authorization': f"Bearer {self.user.tokens()['access']}"}
+
+    async def test_payments_list_and_detail(self):
+        response = await self.async_client.get('/api/auth/payments/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        detail = await self.async_client.get(f"/api/auth/payments/{results[0]['id']}/", headers=self.auth)
+        self.assertEqual(detail.json()['id'], results[0]['id'])
+
+    def test_only_detail_routes_are_async(self):
+        for name, sync_view, async_view in (
+            ('payment', views.PaymentViewSet, async_views.AsyncPaymentViewSet),
+            ('service', views.ServiceViewSet, async_views.AsyncServiceViewSet),
+        ):
+            self.assertIs(resolve(reverse(f'{name}-list')).func.cls, sync_view)
+            self.assertIs(resolve(reverse(f'{name}-detail', args=[uuid.uuid4()])).func.cls, async_view)
+
+    async def test_list_uses_light_serializer(self):
+        response = await self.async_client.get('/api/auth/user-services/', headers=self.auth)
+        self.assertNotIn('credentials', response.json()['results'][0])
+
+    async def test_catalog_is_cached_with_etag(self):
+        first = await self.async_client.get('/api/auth/services/', headers=self.auth)
+        second = await self.async_client.get(
+            '/api/auth/services/', headers={**self.auth, 'If-None-Match': first['ETag']}
+        )
+        self.assertEqual(second.status_code, 304)
+
+    async def test_cookie_delete(self):
+        cookie = await Cookie.objects.filter(user_service__user=self.user).afirst()
+        response = await self.async_client.delete(f'/api/auth/cookies/{cookie.pk}/', headers=self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await Cookie.objects.filter(pk=cookie.pk).aexists())
+
+    async def test_login(self):
+        credentials = {'email': self.user.email, 'password': 'Password123'}
+        response = await self.async_client.post('/api/auth/login/', credentials, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['tokens']), {'refresh', 'access'})
+        credentials['password'] = 'WrongPassword1'
+        response = await self.async_client.post('/api/auth/login/', credentials, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_register_queues_verification_email(self):
+        response = await self.async_client.post('/api/auth/register/', {
+            'email': 'async@example.com', 'full_name': 'Async User',
+            'password': 'Password123', 'confirm_password': 'Password123',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await OutboxEmail.objects.filter(recipients=['async@example.com']).aexists())
+
+
+class LegacyUserMigrationTests(TransactionTestCase):
+    migrate_from = [('authentication', '0003_alter_user_branch_alter_user_company_and_more')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.migrate_from)
+        old_apps = self.executor.loader.project_state(self.migrate_from).apps
+        OldUser = old_apps.get_model('authentication', 'User')
+        Group = old_apps.get_model('auth', 'Group')
+        self.admin = OldUser.objects.create(
+            username='admin', mobile='1', email='admin@example.com', first_name='A', last_name='B'
+        )
+        self.member = OldUser.objects.create(
+            username='member', mobile='2', email='member@example.com', first_name='C', last_name='D',
+            created_by=self.admin
+        )
+        self.member.groups.add(Group.objects.create(name='staff'))
+
+    def tearDown(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+    def test_legacy_users_survive_uuid_ids(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+        member = User.objects.get(email='member@example.com')
+        self.assertEqual(member.pk, uuid.UUID(int=self.member.pk))
+        self.assertEqual(list(member.groups.values_list('name', flat=True)), ['staff'])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT created_by_id FROM authentication_user WHERE email = %s', [member.email])
+            self.assertEqual(cursor.fetchone()[0], uuid.UUID(int=self.admin.pk).hex)
+        User.objects.create(email='new@example.com', full_name='New')
+        self.assertEqual(User.objects.count(), 3)
@@ -0,0 +1,44 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .revocation import is_revoked
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token checked against the revocation set instead of the
+    blacklist table. blacklist() and outstand() take the token's user when
+    the caller already has it, instead of loading it again.
+    """
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def outstanding_defaults(self, user):
+        return {
+            'user': user,
+            'created_at': self.current_time,
+            'token': str(self),
+            'expires_at': datetime_from_epoch(self.payload['exp']),
+        }
+
+    def blacklist(self, user=None):
+        if user is None:
+            return super().blacklist()
+        token, _ = OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM], defaults=self.outstanding_defaults(user)
+        )
+        return BlacklistedToken.objects.get_or_create(token=token)
+
+    def outstand(self, user=None):
+        if user is None:
+            return super().outstand()
+        # Called right after set_jti(), so the row cannot exist yet
+        return OutstandingToken.objects.create(
+            jti=self.payload[api_settings.JTI_CLAIM], **self.outstanding_defaults(user)
+        ), True
@@ -0,0 +1,69 @@
+"""
+Sentry trace sampling per URL pattern and environment.
+
+settings.TRACING['RULES'] is a list of (regex, rate) pairs matched against
+the request path, or against 'celery:<task name>' for Celery tasks. The
+first match wins and anything unmatched gets DEFAULT_RATE. Entries under
+ENVIRONMENTS[<SENTRY_ENVIRONMENT>] replace the top-level keys, so staging
+can trace everything while production samples a few percent.
+
+A request that arrives with a sampling decision from an upstream service
+keeps that decision, so distributed traces stay whole.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'DEFAULT_RATE': 0.0,
+    'RULES': [],
+    'ENVIRONMENTS': {},
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'TRACING', {})}
+    environment = getattr(settings, 'SENTRY_ENVIRONMENT', None)
+    config.update(config['ENVIRONMENTS'].get(environment, {}))
+    return config
+
+
+@lru_cache(maxsize=1)
+def get_rules():
+    config = get_config()
+    return [(re.compile(pattern), float(rate)) for pattern, rate in config['RULES']], float(config['DEFAULT_RATE'])
+
+
+@receiver(setting_changed)
+def reset_rules(sender, setting, **kwargs):
+    if setting in ('TRACING', 'SENTRY_ENVIRONMENT'):
+        get_rules.cache_clear()
+
+
+def sample_rate(target):
+    rules, default = get_rules()
+    for pattern, rate in rules:
+        if pattern.search(target):
+            return rate
+    return default
+
+
+def sampling_target(sampling_context):
+    if 'wsgi_environ' in sampling_context:
+        return sampling_context['wsgi_environ'].get('PATH_INFO', '')
+    if 'asgi_scope' in sampling_context:
+        return sampling_context['asgi_scope'].get('path', '')
+    if 'celery_job' in sampling_context:
+        return f"celery:{sampling_context['celery_job'].get('task', '')}"
+    return ''
+
+
+def traces_sampler(sampling_context):
+    """Passed to sentry_sdk.init as traces_sampler"""
+    parent_sampled = sampling_context.get('parent_sampled')
+    if parent_sampled is not None:
+        return float(parent_sampled)
+    return sample_rate(sampling_target(sampling_context))
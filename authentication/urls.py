@@ -1,23 +1,65 @@
+from adrf.routers import DefaultRouter
+from django.conf import settings
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenVerifyView
-from . import views
-
-router = DefaultRouter()
-router.register(r'subscriptions', views.SubscriptionViewSet, basename='subscription')
-router.register(r'services', views.ServiceViewSet, basename='service')
-router.register(r'user-services', views.UserServiceViewSet, basename='user-service')
-router.register(r'payments', views.PaymentViewSet, basename='payment')
-router.register(r'cookies', views.CookieViewSet, basename='cookie')
-
-urlpatterns = [
-    path('', include(router.urls)),
-    path('register/', views.RegisterView.as_view(), name="register"),
-    path('login/', views.LoginView.as_view(), name="login"),
-    path('email-verify/', views.VerifyEmail.as_view(), name="email-verify"),
-    path('token/verify/', TokenVerifyView.as_view(), name="token_verify"),
-    path('request-reset-email/', views.RequestPasswordResetEmail.as_view(), name="request-reset-email"),
-    path('password-reset/<uidb64>/<token>/', views.PasswordTokenCheckApi.as_view(), name="password-reset-confirm"),
-    path('password-reset-complete/', views.SetNewPasswordAPIView.as_view(), name="password-reset-complete"),
-    path('logout/', views.LogoutAPIView.as_view(), name="logout"),
-]
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
+from . import async_views, views
+
+
+class CollectionRouter(DefaultRouter):
+    """Only the collection routes of each viewset (list, create) and the API root"""
+    routes = [route for route in DefaultRouter.routes if not route.detail]
+
+
+class DetailRouter(DefaultRouter):
+    """Only the per-object routes (retrieve, update, destroy and detail actions)"""
+    routes = [route for route in DefaultRouter.routes if route.detail]
+    include_root_view = False
+
+
+def register(router, viewsets):
+    subscriptions, services, user_services, payments, cookies = viewsets
+    router.register(r'subscriptions', subscriptions, basename='subscription')
+    router.register(r'services', services, basename='service')
+    router.register(r'user-services', user_services, basename='user-service')
+    router.register(r'payments', payments, basename='payment')
+    router.register(r'cookies', cookies, basename='cookie')
+    return router
+
+
+def build_urlpatterns(async_api=False):
+    """URL patterns routed to the sync views, or to their async counterparts"""
+    viewsets = (
+        views.SubscriptionViewSet, views.ServiceViewSet, views.UserServiceViewSet,
+        views.PaymentViewSet, views.CookieViewSet,
+    )
+    if async_api:
+        # List pages stay on the sync viewsets: their filtering, cursor
+        # pagination and serialization are sync code, so an async list only
+        # adds a hop to the thread pool on top of Django's own
+        router_urls = register(CollectionRouter(), viewsets).urls + register(DetailRouter(), (
+            async_views.AsyncSubscriptionViewSet, async_views.AsyncServiceViewSet,
+            async_views.AsyncUserServiceViewSet, async_views.AsyncPaymentViewSet,
+            async_views.AsyncCookieViewSet,
+        )).urls
+        login_view, register_view = async_views.AsyncLoginView, async_views.AsyncRegisterView
+    else:
+        router_urls = register(DefaultRouter(), viewsets).urls
+        login_view, register_view = views.LoginView, views.RegisterView
+
+    return [
+        path('', include(router_urls)),
+        path('register/', register_view.as_view(), name="register"),
+        path('login/', login_view.as_view(), name="login"),
+        path('email-verify/', views.VerifyEmail.as_view(), name="email-verify"),
+        path('token/refresh/', TokenRefreshView.as_view(), name="token_refresh"),
+        path('token/verify/', TokenVerifyView.as_view(), name="token_verify"),
+        path('request-reset-email/', views.RequestPasswordResetEmail.as_view(), name="request-reset-email"),
+        path('password-reset/<uidb64>/<token>/', views.PasswordTokenCheckApi.as_view(), name="password-reset-confirm"),
+        path('password-reset-complete/', views.SetNewPasswordAPIView.as_view(), name="password-reset-complete"),
+        path('logout/', views.LogoutAPIView.as_view(), name="logout"),
+        path('exports/<str:name>.<str:export_format>', views.ExportView.as_view(), name="export"),
+        path('revenue/', views.RevenueView.as_view(), name="revenue"),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_API)
@@ -0,0 +1,142 @@
+"""
+Two-level cache of authenticated users for JWTAuthentication.
+
+Lookups go to a small per-process LRU first, then to the shared Django
+cache, then to the database. Saving or deleting a User drops its shared
+entry and the local entry in the saving process. Other processes may keep
+serving their local copy for up to LOCAL_TTL seconds, so keep it short.
+
+Configured by settings.USER_CACHE.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'KEY_PREFIX': 'auth:user',
+    'LOCAL_MAXSIZE': 1024,
+    'LOCAL_TTL': 5,
+    'SHARED_TTL': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'USER_CACHE', {})}
+
+
+class UserCache:
+    def __init__(self, cache, key_prefix, local_maxsize, local_ttl, shared_ttl):
+        self.cache = cache
+        self.key_prefix = key_prefix
+        self.local_maxsize = local_maxsize
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.lock = threading.Lock()
+        self.local = OrderedDict()
+        self.counters = dict.fromkeys(('local_hits', 'shared_hits', 'misses'), 0)
+
+    def key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get_local(self, user_id):
+        key = str(user_id)
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self.local[key]
+                return None
+            self.local.move_to_end(key)
+            return user
+
+    def set_local(self, user_id, user):
+        if self.local_maxsize <= 0 or self.local_ttl <= 0:
+            return
+        key = str(user_id)
+        with self.lock:
+            self.local[key] = (user, time.monotonic() + self.local_ttl)
+            self.local.move_to_end(key)
+            while len(self.local) > self.local_maxsize:
+                self.local.popitem(last=False)
+
+    def get(self, user_id, load):
+        """
+        Return a private copy of the user with this id, calling load(user_id)
+        on a miss. A None from load is not cached.
+        """
+        user = self.get_local(user_id)
+        if user is not None:
+            self.count('local_hits')
+            return copy.copy(user)
+
+        user = self.cache.get(self.key(user_id))
+        if user is not None:
+            self.count('shared_hits')
+        else:
+            self.count('misses')
+            user = load(user_id)
+            if user is None:
+                return None
+            self.cache.set(self.key(user_id), user, self.shared_ttl)
+        self.set_local(user_id, user)
+        # Callers may mutate request.user, never hand out the cached instance
+        return copy.copy(user)
+
+    def invalidate(self, *user_ids):
+        if not user_ids:
+            return
+        with self.lock:
+            for user_id in user_ids:
+                self.local.pop(str(user_id), None)
+        self.cache.delete_many([self.key(user_id) for user_id in user_ids])
+
+    def clear_local(self):
+        with self.lock:
+            self.local.clear()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, local_size=len(self.local))
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters = dict.fromkeys(self.counters, 0)
+
+
+@lru_cache(maxsize=1)
+def get_user_cache():
+    config = get_config()
+    return UserCache(
+        caches[config['CACHE']],
+        config['KEY_PREFIX'],
+        config['LOCAL_MAXSIZE'],
+        config['LOCAL_TTL'],
+        config['SHARED_TTL'],
+    )
+
+
+@receiver(setting_changed)
+def reset_user_cache(sender, setting, **kwargs):
+    if setting in ('USER_CACHE', 'CACHES'):
+        get_user_cache.cache_clear()
+
+
+def invalidate_users(*user_ids):
+    get_user_cache().invalidate(*user_ids)
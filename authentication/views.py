@@ -1,4 +1,6 @@
 from django.shortcuts import render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.http.response import HttpResponsePermanentRedirect
 from django.shortcuts import redirect
 from django.utils.encoding import smart_str, DjangoUnicodeDecodeError
@@ -7,25 +9,32 @@ from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, status, views, permissions, viewsets
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken
 from drf_yasg import openapi
 from django.conf import settings
 from django.utils import timezone
+from django.db import transaction
 import jwt
 import os
-from .utils import send_email
+from . import exports, revenue
+from .outbox import queue_email
+from .profiles import get_profile
+from .audit import record_login_attempt
 from .models import (
     User, Subscription, Payment, Service, 
     UserService, Cookie, CookieInjectionLog, LoginAttempt
 )
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .customAuth import CachedJWTAuthentication
 from .serializers import (
     UserCreateSerializer, LoginSerializer, EmailVerificationSerializer,
     ResetPasswordEmailRequestSerializer, SetNewPasswordSerializer,
     LogoutSerializer, SubscriptionSerializer, ServiceSerializer,
-    UserServiceSerializer, PaymentSerializer, CookieSerializer
+    UserServiceSerializer, UserServiceListSerializer, PaymentSerializer,
+    CookieSerializer, CookieListSerializer
 )
+from .pagination import CookiePagination, PaymentPagination, UserServicePagination
+from .mixins import CachedCatalogMixin, ListDetailSerializerMixin, SparseFieldsMixin
 
 class CustomRedirect(HttpResponsePermanentRedirect):
     allowed_schemes = [os.environ.get('APP_SCHEMA'), 'http', 'https']
@@ -36,15 +45,16 @@ class RegisterView(generics.GenericAPIView):
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
-        
-        verification_token = RefreshToken.for_user(user).access_token
-        verification_url = f"{os.environ.get('FRONTEND_BASE_URL', 'http://localhost:3000')}/verify-email?token={verification_token}"
-        send_email(
-            subject="Verify your email",
-            recipient_list=[user.email],
-            message=f"Please verify your email by clicking on the following link: {verification_url}"
-        )
+        with transaction.atomic():
+            user = serializer.save()
+
+            verification_token = AccessToken.for_user(user)
+            verification_url = f"{os.environ.get('FRONTEND_BASE_URL', 'http://localhost:3000')}/verify-email?token={verification_token}"
+            queue_email(
+                subject="Verify your email",
+                recipient_list=[user.email],
+                message=f"Please verify your email by clicking on the following link: {verification_url}"
+            )
         
         return Response({
             'email': user.email,
@@ -78,12 +88,12 @@ class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Log the login attempt
-        LoginAttempt.objects.create(
-            user=User.objects.get(email=serializer.validated_data['email']),
+        # Queued and written in bulk off the request path
+        record_login_attempt(
+            user=serializer.user,
             success=True,
             ip_address=request.META.get('REMOTE_ADDR'),
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
@@ -100,11 +110,11 @@ class RequestPasswordResetEmail(generics.GenericAPIView):
 
     def post(self, request):
         email = request.data.get('email', '')
-        if User.objects.filter(email=email).exists():
-            user = User.objects.get(email=email)
-            verification_token = RefreshToken.for_user(user).access_token
+        user = User.objects.filter(email=email).first()
+        if user is not None:
+            verification_token = AccessToken.for_user(user)
             reset_url = f"{os.environ.get('FRONTEND_BASE_URL', 'http://localhost:3000')}/reset-password?token={verification_token}"
-            send_email(
+            queue_email(
                 subject="Reset your password",
                 recipient_list=[user.email],
                 message=f"Please reset your password by clicking on the following link: {reset_url}"
@@ -153,15 +163,86 @@ class LogoutAPIView(generics.GenericAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
 
-class UserServiceViewSet(viewsets.ModelViewSet):
+class ModuleProfileView(views.APIView):
+    """
+    Profile lookup shared by the fmc/erp/customer/vendor login endpoints.
+    Each module sets its greeting; the profile itself comes from the cache.
+    """
+    module_message = None
+    message_key = 'Message'
+
+    def get(self, request):
+        profile = get_profile(request.GET.get('username'))
+        if profile is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        data = {self.message_key: self.module_message, **profile, 'token': request.GET.get('tokens')}
+        return Response(data, status=status.HTTP_200_OK)
+
+class ExportView(views.APIView):
+    """
+    Staff-only download of payments or login attempts, streamed as CSV or
+    JSONL, e.g. GET exports/payments.csv?since=2026-01-01&status=success&gzip=1
+    """
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [CachedJWTAuthentication]
+    content_types = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+    def get(self, request, name, export_format):
+        if name not in exports.EXPORTS or export_format not in exports.FORMATS:
+            return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+        params = request.query_params
+        gzip = params.get('gzip') in ('1', 'true')
+        try:
+            blocks = exports.stream(
+                name, export_format, gzip=gzip,
+                since=params.get('since'), until=params.get('until'), status=params.get('status'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if isinstance(request._request, ASGIRequest):
+            blocks = exports.aiter_blocks(blocks)
+
+        response = StreamingHttpResponse(
+            blocks, content_type='application/gzip' if gzip else self.content_types[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{exports.filename(name, export_format, gzip)}"'
+        return response
+
+class RevenueView(views.APIView):
+    """
+    Staff-only revenue and churn for local dates [since, until), read from
+    the daily rollup, e.g. GET revenue/?since=2026-01-01&group_by=subscription
+    """
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [CachedJWTAuthentication]
+
+    def get(self, request):
+        params = request.query_params
+        group_by = params.get('group_by', 'day')
+        if group_by not in revenue.GROUPS:
+            return Response(
+                {'error': f"group_by must be one of {', '.join(revenue.GROUPS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            since = revenue.parse_day(params.get('since'), 'since')
+            until = revenue.parse_day(params.get('until'), 'until')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(revenue.summary(since, until, group_by), status=status.HTTP_200_OK)
+
+class UserServiceViewSet(SparseFieldsMixin, ListDetailSerializerMixin, viewsets.ModelViewSet):
     serializer_class = UserServiceSerializer
+    list_serializer_class = UserServiceListSerializer
+    list_deferred_fields = ('credentials',)
+    pagination_class = UserServicePagination
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def get_queryset(self):
         return UserService.objects.filter(user=self.request.user)
@@ -169,22 +250,25 @@ class UserServiceViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Subscription.objects.filter(is_active=True)
+class SubscriptionViewSet(CachedCatalogMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_name = 'subscription'
+    queryset = Subscription.objects.filter(is_active=True).order_by('price', 'name')
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
-class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Service.objects.filter(is_active=True)
+class ServiceViewSet(CachedCatalogMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_name = 'service'
+    queryset = Service.objects.filter(is_active=True).order_by('name')
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
+    pagination_class = PaymentPagination
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def get_queryset(self):
         return Payment.objects.filter(user=self.request.user)
@@ -192,13 +276,20 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class CookieViewSet(viewsets.ModelViewSet):
+class CookieViewSet(SparseFieldsMixin, ListDetailSerializerMixin, viewsets.ModelViewSet):
     serializer_class = CookieSerializer
+    list_serializer_class = CookieListSerializer
+    list_deferred_fields = ('cookie_data',)
+    pagination_class = CookiePagination
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    filterset_fields = ['status', 'user_service']
 
     def get_queryset(self):
-        return Cookie.objects.filter(user_service__user=self.request.user)
+        queryset = Cookie.objects.filter(user_service__user=self.request.user)
+        if self.request.query_params.get('valid') in ('1', 'true'):
+            queryset = queryset.currently_valid()
+        return queryset
 
     def perform_create(self, serializer):
         user_service = serializer.validated_data['user_service']
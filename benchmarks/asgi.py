@@ -0,0 +1,64 @@
+"""
+Throughput and latency of the API under WSGI and ASGI at high concurrency.
+Start both servers against the same database first, for example:
+
+    gunicorn ForsysServer.wsgi -b 127.0.0.1:8000 -w 4 --threads 8
+    uvicorn ForsysServer.asgi:application --port 8001 --workers 4
+
+then log in as an existing user and load both:
+
+    python -m benchmarks.asgi --email user@example.com --password ... \\
+        [--clients 500] [--duration 20] [--path /api/auth/payments/]
+
+ForsysServer/asgi.py sets ASYNC_API=1, so the ASGI server serves login,
+register and object detail routes from authentication/async_views.py; the
+list pages in PATHS run the sync viewsets in Django's thread pool.
+"""
+import argparse
+import asyncio
+
+from . import summarize
+from .httpload import fetch, run_load
+
+PATHS = ('/api/auth/payments/', '/api/auth/user-services/', '/api/auth/services/')
+
+
+async def access_token(base_url, email, password):
+    status, body = await fetch(f'{base_url}/api/auth/login/', 'POST', data={'email': email, 'password': password})
+    if status != 200:
+        raise SystemExit(f'Login against {base_url} failed with {status}: {body}')
+    return body['tokens']['access']
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--path', action='append', help='Endpoint to load, repeatable')
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.duration:.0f}s per run")
+    print(f"{'server':<8}{'path':<28}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'non-2xx':>9}{'errors':>8}")
+    for server, base_url in (('wsgi', args.wsgi_url), ('asgi', args.asgi_url)):
+        headers = {'Authorization': f'Bearer {await access_token(base_url, args.email, args.password)}'}
+        for path in args.path or PATHS:
+            latencies, statuses, errors, elapsed = await run_load(
+                base_url + path, args.clients, args.duration, headers=headers
+            )
+            failed = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+            if not latencies:
+                print(f"{server:<8}{path:<28}{'-':>9}{'-':>9}{'-':>9}{failed:>9}{errors:>8}")
+                continue
+            stats = summarize(latencies)
+            print(
+                f"{server:<8}{path:<28}{len(latencies) / elapsed:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p99_ms']:>9.1f}{failed:>9}{errors:>8}"
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
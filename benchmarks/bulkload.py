@@ -0,0 +1,102 @@
+"""
+Tenant onboarding throughput: the bulkload loaders next to the previous
+get_or_create-per-row loop, on generated companies, branches and users.
+
+    python -m benchmarks.bulkload [--users 100000] [--batch-size 5000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from . import setup, test_database
+
+setup()
+
+from authentication.bulkload import LOADERS, read_rows  # noqa: E402
+from authentication.models import Branch, Company, LoginType, User  # noqa: E402
+
+
+def write_files(directory, users, companies=10, branches_per_company=5):
+    rows = {
+        'companies': (
+            {'company_code': f'C{c}', 'company_name': f'Company {c}', 'company_type': 'Private', 'head_office': 'Dhaka'}
+            for c in range(companies)
+        ),
+        'logintypes': ({'login_type': kind} for kind in ('fmc', 'erp', 'vendor', 'customer')),
+        'branches': (
+            {'branch_code': f'C{c}-B{b}', 'company_code': f'C{c}', 'branch_name': f'Branch {b}', 'address': 'Banani'}
+            for c in range(companies) for b in range(branches_per_company)
+        ),
+        'users': (
+            {
+                'email': f'user{i}@example.com', 'full_name': f'User {i}', 'phone_number': f'{i:010d}',
+                'branch_code': f'C{i % companies}-B{i % branches_per_company}', 'login_type': 'erp',
+            }
+            for i in range(users)
+        ),
+    }
+    paths = {}
+    for kind, kind_rows in rows.items():
+        paths[kind] = os.path.join(directory, f'{kind}.jsonl')
+        with open(paths[kind], 'w') as f:
+            for row in kind_rows:
+                f.write(json.dumps(row) + '\n')
+    return paths
+
+
+def get_or_create_loop(paths):
+    """What createcompanies/createbranches/createlogintype did, applied to files"""
+    for row in read_rows(paths['companies']):
+        Company.objects.get_or_create(company_code=row['company_code'], defaults=row)
+    for row in read_rows(paths['logintypes']):
+        LoginType.objects.get_or_create(login_type=row['login_type'])
+    for row in read_rows(paths['branches']):
+        row['company'] = Company.objects.get(company_code=row.pop('company_code'))
+        Branch.objects.get_or_create(branch_code=row['branch_code'], defaults=row)
+    for row in read_rows(paths['users']):
+        branch = Branch.objects.get(branch_code=row.pop('branch_code'))
+        row.update(
+            branch=branch, company_id=branch.company_id,
+            login_type=LoginType.objects.get(login_type=row.pop('login_type')),
+        )
+        User.objects.get_or_create(email=row['email'], defaults=row)
+
+
+def bulk_load(paths, batch_size):
+    for kind, loader_class in LOADERS.items():
+        loader_class(batch_size=batch_size).load(read_rows(paths[kind]))
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, test_database():
+        paths = write_files(directory, args.users)
+        results = []
+        for name, fn, fn_args in (
+            ('get_or_create per row', get_or_create_loop, (paths,)),
+            (f'bulkload batch={args.batch_size}', bulk_load, (paths, args.batch_size)),
+        ):
+            for model in (User, Branch, Company, LoginType):
+                model.objects.all().delete()
+            seconds = timed(fn, *fn_args)
+            results.append((name, User.objects.count(), seconds))
+
+    print(f"{'path':<28}{'users':>10}{'seconds':>10}{'users/s':>10}")
+    for name, users, seconds in results:
+        print(f"{name:<28}{users:>10}{seconds:>10.2f}{users / seconds:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Requests per second for the subscription and service catalogs with a cold
+cache, a warm cache, and a client revalidating with If-None-Match.
+
+    python -m benchmarks.catalog [--requests 500] [--services 200]
+
+Set CACHE_URL=redis://localhost:6379/1 to measure against Redis instead of
+the per-process memory cache.
+"""
+import argparse
+import time
+
+from . import setup, summarize, test_database
+
+setup()
+
+from django.core.cache import cache  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from authentication.models import Service, Subscription, User  # noqa: E402
+
+
+def run(client, url, requests, before=None, headers=None):
+    samples = []
+    for _ in range(requests):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(url, **(headers or {}))
+        samples.append(time.perf_counter() - started)
+        assert response.status_code in (200, 304), response.status_code
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--services', type=int, default=200)
+    args = parser.parse_args()
+
+    with test_database():
+        user = User.objects.create(email='bench@example.com', full_name='Bench')
+        plans = [
+            Subscription.objects.create(name=f'Plan {i}', price=i, duration_days=30, features={'tier': i})
+            for i in range(10)
+        ]
+        Service.objects.bulk_create([
+            Service(
+                name=f'Service {i}', login_url=f'https://s{i}.example.com/login',
+                description='x' * 200, required_subscription=plans[i % len(plans)]
+            )
+            for i in range(args.services)
+        ])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        print(f"{'endpoint':<26}{'mode':<8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        for url in ('/api/auth/subscriptions/', '/api/auth/services/'):
+            cache.clear()
+            etag = client.get(url)['ETag']
+            modes = [
+                ('cold', run(client, url, args.requests, before=cache.clear)),
+                ('warm', run(client, url, args.requests)),
+                ('304', run(client, url, args.requests, headers={'HTTP_IF_NONE_MATCH': etag})),
+            ]
+            for mode, samples in modes:
+                stats = summarize(samples)
+                print(f"{url:<26}{mode:<8}{len(samples) / sum(samples):>9.0f}{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Compares EncryptedJSONField with the property + eval() approach it replaced,
+on a cookie jar of realistic size.
+
+    python -m benchmarks.encrypted_field [--cookies 200] [--reads 10] [--number 200]
+"""
+import argparse
+import timeit
+
+from . import setup
+
+setup()
+
+from cryptography.fernet import Fernet  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from authentication.fields import Ciphertext  # noqa: E402
+from authentication.models import Cookie  # noqa: E402
+
+
+class LegacyCookie:
+    """The previous Cookie.cookie_data property, kept here for comparison"""
+
+    def __init__(self, token=''):
+        self._cookie_data = token
+
+    @property
+    def cookie_data(self):
+        if not self._cookie_data:
+            return {}
+        fernet = Fernet(settings.ENCRYPTION_KEY.encode())
+        decrypted = fernet.decrypt(self._cookie_data.encode())
+        return eval(decrypted.decode())
+
+    @cookie_data.setter
+    def cookie_data(self, value):
+        if not value:
+            self._cookie_data = ''
+            return
+        fernet = Fernet(settings.ENCRYPTION_KEY.encode())
+        encrypted = fernet.encrypt(str(value).encode())
+        self._cookie_data = encrypted.decode()
+
+
+def make_jar(size):
+    return {
+        f'cookie_{i}': {
+            'value': 'x' * 64,
+            'domain': '.example.com',
+            'path': '/',
+            'secure': True,
+            'httpOnly': bool(i % 2),
+            'expires': 1700000000 + i,
+        }
+        for i in range(size)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cookies', type=int, default=200)
+    parser.add_argument('--reads', type=int, default=10, help='property reads per loaded row')
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    jar = make_jar(args.cookies)
+    field = Cookie._meta.get_field('cookie_data')
+
+    legacy_token = LegacyCookie()
+    legacy_token.cookie_data = jar
+    legacy_token = legacy_token._cookie_data
+    field_token = field.encrypt(jar)
+
+    def legacy_load_and_read():
+        obj = LegacyCookie(legacy_token)
+        for _ in range(args.reads):
+            obj.cookie_data
+
+    def field_load_and_read():
+        obj = Cookie(cookie_data=Ciphertext(field_token))
+        for _ in range(args.reads):
+            obj.cookie_data
+
+    def legacy_write():
+        LegacyCookie().cookie_data = jar
+
+    def field_write():
+        field.encrypt(jar)
+
+    def legacy_resave_unchanged():
+        # The old property left the token alone, but every read before a
+        # save paid a full decrypt + eval
+        obj = LegacyCookie(legacy_token)
+        obj.cookie_data
+
+    def field_resave_unchanged():
+        obj = Cookie(cookie_data=Ciphertext(field_token))
+        obj.cookie_data
+        field.pre_save(obj, add=False)
+
+    cases = [
+        (f'load + {args.reads} reads', legacy_load_and_read, field_load_and_read),
+        ('encrypt on write', legacy_write, field_write),
+        ('read then save unchanged', legacy_resave_unchanged, field_resave_unchanged),
+    ]
+    print(f"{args.cookies} cookies, stored size: legacy {len(legacy_token)} B, field {len(field_token)} B")
+    print(f"{'case':<28}{'legacy ms':>12}{'field ms':>12}{'speedup':>10}")
+    for name, legacy, new in cases:
+        legacy_ms = min(timeit.repeat(legacy, number=args.number, repeat=3)) / args.number * 1000
+        new_ms = min(timeit.repeat(new, number=args.number, repeat=3)) / args.number * 1000
+        print(f"{name:<28}{legacy_ms:>12.3f}{new_ms:>12.3f}{legacy_ms / new_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Peak Python memory of a payments export: the streaming exporter next to
+building the rows from a fully evaluated queryset, as paging through
+the API or the admin did.
+
+    python -m benchmarks.export [--payments 200000] [--chunk-size 2000]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+
+from . import setup, test_database
+
+setup()
+
+from django.utils import timezone  # noqa: E402
+
+from authentication import exports  # noqa: E402
+from authentication.models import Payment, Subscription, User  # noqa: E402
+
+
+def seed(payments):
+    subscription = Subscription.objects.create(name='Pro', price=10, duration_days=30)
+    users = User.objects.bulk_create(
+        User(email=f'user{i}@example.com', full_name=f'User {i}') for i in range(100)
+    )
+    now = timezone.now()
+    Payment.objects.bulk_create(
+        (
+            Payment(
+                user=users[i % len(users)], amount=10, subscription=subscription, timestamp=now,
+                payment_status='success', transaction_id=uuid.uuid4().hex, payment_method='card',
+                billing_details={'country': 'BD'},
+            )
+            for i in range(payments)
+        ),
+        batch_size=5000,
+    )
+
+
+def materialized():
+    """Every Payment instance in memory, then the same CSV rows"""
+    rows = [
+        (p.id, p.timestamp, p.user.email, p.amount, p.payment_status, p.subscription.name,
+         p.transaction_id, p.payment_method, p.refund_reason)
+        for p in list(Payment.objects.select_related('user', 'subscription').order_by('timestamp', 'pk'))
+    ]
+    return sum(map(len, exports.render_csv(exports.EXPORTS['payments'].headers, rows)))
+
+
+def streamed(chunk_size):
+    return sum(map(len, exports.stream('payments', 'csv', chunk_size=chunk_size)))
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn(*args)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--payments', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database():
+        seed(args.payments)
+        results = [
+            ('materialized queryset', *measure(materialized)),
+            (f'streamed chunk={args.chunk_size}', *measure(streamed, args.chunk_size)),
+        ]
+
+    print(f"{'path':<26}{'MiB out':>9}{'seconds':>10}{'peak MiB':>10}")
+    for name, size, seconds, peak in results:
+        print(f"{name:<26}{size / 2**20:>9.1f}{seconds:>10.2f}{peak / 2**20:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Minimal asyncio HTTP/1.1 load generator used by the server benchmarks.
+Each client keeps one connection open and sends requests back to back.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        if self.writer is None:
+            await self.open()
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            data = b''.join(chunks)
+        else:
+            data = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, data
+
+
+def split_url(url):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return parts.hostname, parts.port or 80, path
+
+
+async def fetch(url, method='GET', headers=None, data=None):
+    """One-off request, returns (status, decoded JSON or bytes)"""
+    host, port, path = split_url(url)
+    body = b''
+    headers = dict(headers or {})
+    if data is not None:
+        body = json.dumps(data).encode()
+        headers['Content-Type'] = 'application/json'
+    connection = Connection(host, port)
+    try:
+        status, response_headers, payload = await connection.request(method, path, headers, body)
+    finally:
+        await connection.close()
+    if response_headers.get('content-type', '').startswith('application/json'):
+        payload = json.loads(payload)
+    return status, payload
+
+
+async def run_load(url, clients, duration, headers=None, method='GET', body=b'', warmup=1.0):
+    """
+    Drive `clients` concurrent connections at url for `duration` seconds.
+    Returns (latencies in seconds, status counts, errors, elapsed seconds).
+    """
+    host, port, path = split_url(url)
+    latencies = []
+    statuses = {}
+    errors = 0
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def client():
+        nonlocal errors
+        connection = Connection(host, port)
+        try:
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    status, _, _ = await connection.request(method, path, headers, body)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    await connection.close()
+                    if started >= measure_from:
+                        errors += 1
+                    await asyncio.sleep(0.01)
+                    continue
+                if started >= measure_from:
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, statuses, errors, duration
@@ -0,0 +1,443 @@
+"""
+HTTP load test against a running server. Virtual users drive a weighted
+mix of register, login, token refresh, catalog reads, user-service and
+cookie CRUD and payment creation. Throughput and p50/p95/p99 latency per
+endpoint are written to JSON, so runs can be compared across commits.
+
+Seed accounts and a catalog into the database the server uses, start the
+server, run the mix, then compare two result files:
+
+    python -m benchmarks.loadtest seed [--users 200]
+    gunicorn ForsysServer.wsgi -b 127.0.0.1:8000 -w 4 --threads 8
+    python -m benchmarks.loadtest run [--url http://127.0.0.1:8000] [--clients 50] \\
+        [--duration 30] [--warmup 5] [--seed 0] [--weight register=0 ...] [--output FILE]
+    python -m benchmarks.loadtest compare before.json after.json
+
+Export DATABASE=postgresql in both shells to seed and serve from the local
+PostgreSQL instead of SQLite. Each client logs in as its own seeded
+account, so seed at least --clients users. Every client draws its actions
+from a generator seeded with --seed and its index, so the same arguments
+replay the same mix. Results go to benchmarks/results/<commit>-<time>.json
+unless --output is given.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import uuid
+from pathlib import Path
+
+from . import setup, summarize
+from .httpload import Connection, split_url
+
+setup()
+
+from django.conf import settings  # noqa: E402
+
+API = '/api/auth'
+EMAIL = 'load{}@example.com'
+PASSWORD = 'Password123'
+RESULTS = Path(__file__).resolve().parent / 'results'
+
+# Relative frequency of each VirtualUser action
+WEIGHTS = {
+    'subscriptions': 15,
+    'services': 15,
+    'user_service_list': 8,
+    'user_service_create': 5,
+    'user_service_read': 5,
+    'user_service_update': 4,
+    'user_service_delete': 3,
+    'cookie_list': 8,
+    'cookie_create': 6,
+    'cookie_read': 5,
+    'cookie_update': 4,
+    'cookie_delete': 3,
+    'payment_create': 6,
+    'refresh': 4,
+    'login': 2,
+    'register': 1,
+}
+
+
+def rows(body):
+    """List rows from a paginated or plain list response"""
+    return body['results'] if isinstance(body, dict) else body
+
+
+class VirtualUser:
+    """One client: a seeded account, its tokens and the rows it has created"""
+
+    def __init__(self, load, email, rng):
+        self.load = load
+        self.email = email
+        self.rng = rng
+        self.connection = Connection(*load.address)
+        self.access = self.refresh_token = None
+        self.subscription_ids = []
+        self.service_ids = []
+        self.user_services = []
+        # (cookie id, user service id)
+        self.cookies = []
+
+    async def call(self, label, method, path, data=None, auth=True):
+        headers = {'Content-Type': 'application/json'}
+        if auth and self.access:
+            headers['Authorization'] = f'Bearer {self.access}'
+        body = json.dumps(data).encode() if data is not None else b''
+        started = time.perf_counter()
+        try:
+            status, _, payload = await self.connection.request(method, path, headers, body)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            await self.connection.close()
+            self.load.observe(label, started, None)
+            return None
+        self.load.observe(label, started, time.perf_counter() - started, status)
+        if not 200 <= status < 300:
+            return None
+        return json.loads(payload) if payload else {}
+
+    async def start(self):
+        """Log in and learn the catalog; False if the account cannot log in"""
+        await self.login()
+        if self.access is None:
+            return False
+        await self.subscriptions()
+        await self.services()
+        return bool(self.subscription_ids and self.service_ids)
+
+    async def login(self):
+        body = await self.call('POST /login/', 'POST', f'{API}/login/', {
+            'email': self.email, 'password': PASSWORD,
+        }, auth=False)
+        if body:
+            self.access, self.refresh_token = body['tokens']['access'], body['tokens']['refresh']
+
+    async def register(self):
+        email = f'register-{self.load.run_id}-{next(self.load.counter)}@example.com'
+        await self.call('POST /register/', 'POST', f'{API}/register/', {
+            'email': email, 'full_name': 'Load Test', 'password': PASSWORD, 'confirm_password': PASSWORD,
+        }, auth=False)
+
+    async def refresh(self):
+        body = await self.call('POST /token/refresh/', 'POST', f'{API}/token/refresh/', {
+            'refresh': self.refresh_token,
+        }, auth=False)
+        if body is None:
+            # The refresh token is gone (blacklisted or expired); start over
+            await self.login()
+            return
+        self.access = body['access']
+        # Rotated; the old refresh token is blacklisted now
+        self.refresh_token = body.get('refresh', self.refresh_token)
+
+    async def subscriptions(self):
+        body = await self.call('GET /subscriptions/', 'GET', f'{API}/subscriptions/')
+        if body is not None:
+            self.subscription_ids = [row['id'] for row in rows(body)]
+
+    async def services(self):
+        body = await self.call('GET /services/', 'GET', f'{API}/services/')
+        if body is not None:
+            self.service_ids = [row['id'] for row in rows(body)]
+
+    async def user_service_list(self):
+        await self.call('GET /user-services/', 'GET', f'{API}/user-services/')
+
+    async def user_service_create(self):
+        body = await self.call('POST /user-services/', 'POST', f'{API}/user-services/', {
+            'service': self.rng.choice(self.service_ids),
+            'credentials': {'username': self.email, 'password': uuid.uuid4().hex},
+        })
+        if body:
+            self.user_services.append(body['id'])
+
+    async def user_service_read(self):
+        if not self.user_services:
+            return await self.user_service_create()
+        pk = self.rng.choice(self.user_services)
+        await self.call('GET /user-services/{id}/', 'GET', f'{API}/user-services/{pk}/')
+
+    async def user_service_update(self):
+        if not self.user_services:
+            return await self.user_service_create()
+        pk = self.rng.choice(self.user_services)
+        await self.call('PATCH /user-services/{id}/', 'PATCH', f'{API}/user-services/{pk}/', {
+            'is_active': self.rng.random() < 0.9,
+        })
+
+    async def user_service_delete(self):
+        # Keep one around for the cookies
+        if len(self.user_services) < 2:
+            return await self.user_service_create()
+        pk = self.user_services.pop(self.rng.randrange(len(self.user_services)))
+        self.cookies = [cookie for cookie in self.cookies if cookie[1] != pk]
+        await self.call('DELETE /user-services/{id}/', 'DELETE', f'{API}/user-services/{pk}/')
+
+    async def cookie_list(self):
+        await self.call('GET /cookies/', 'GET', f'{API}/cookies/')
+
+    async def cookie_create(self):
+        if not self.user_services:
+            return await self.user_service_create()
+        user_service = self.rng.choice(self.user_services)
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=self.rng.randint(1, 30))
+        body = await self.call('POST /cookies/', 'POST', f'{API}/cookies/', {
+            'user_service': user_service,
+            'cookie_data': {'session': uuid.uuid4().hex},
+            'expires_at': expires_at.isoformat(),
+        })
+        if body:
+            self.cookies.append((body['id'], user_service))
+
+    async def cookie_read(self):
+        if not self.cookies:
+            return await self.cookie_create()
+        pk, _ = self.rng.choice(self.cookies)
+        await self.call('GET /cookies/{id}/', 'GET', f'{API}/cookies/{pk}/')
+
+    async def cookie_update(self):
+        if not self.cookies:
+            return await self.cookie_create()
+        pk, _ = self.rng.choice(self.cookies)
+        await self.call('PATCH /cookies/{id}/', 'PATCH', f'{API}/cookies/{pk}/', {
+            'status': self.rng.choice(('valid', 'expired', 'revoked')),
+        })
+
+    async def cookie_delete(self):
+        if not self.cookies:
+            return await self.cookie_create()
+        pk, _ = self.cookies.pop(self.rng.randrange(len(self.cookies)))
+        await self.call('DELETE /cookies/{id}/', 'DELETE', f'{API}/cookies/{pk}/')
+
+    async def payment_create(self):
+        await self.call('POST /payments/', 'POST', f'{API}/payments/', {
+            'amount': str(self.rng.choice((10, 20, 30))),
+            'payment_status': self.rng.choice(('success', 'success', 'success', 'failed', 'pending')),
+            'subscription': self.rng.choice(self.subscription_ids),
+            'transaction_id': uuid.uuid4().hex,
+            'payment_method': self.rng.choice(('card', 'bkash', 'paypal')),
+            'billing_details': {},
+        })
+
+
+class LoadTest:
+    def __init__(self, url, clients, duration, warmup, seed, weights):
+        host, port, _ = split_url(url)
+        self.address = (host, port)
+        self.clients = clients
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.weights = weights
+        self.run_id = uuid.uuid4().hex[:8]
+        self.counter = itertools.count()
+        self.stats = {}
+        self.failed_clients = 0
+        self.measure_from = self.stop_at = None
+
+    def observe(self, label, started, elapsed, status=None):
+        """Record one call; elapsed is None for a connection error"""
+        if not self.measure_from <= started < self.stop_at:
+            return
+        stats = self.stats.setdefault(label, {'latencies': [], 'statuses': {}, 'errors': 0})
+        if elapsed is None:
+            stats['errors'] += 1
+            return
+        stats['latencies'].append(elapsed)
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    async def client(self, index):
+        user = VirtualUser(self, EMAIL.format(index), random.Random(f'{self.seed}-{index}'))
+        try:
+            if not await user.start():
+                self.failed_clients += 1
+                return
+            actions, weights = zip(*((name, weight) for name, weight in self.weights.items() if weight > 0))
+            while time.perf_counter() < self.stop_at:
+                action = user.rng.choices(actions, weights)[0]
+                await getattr(user, action)()
+        finally:
+            await user.connection.close()
+
+    async def run(self):
+        self.measure_from = time.perf_counter() + self.warmup
+        self.stop_at = self.measure_from + self.duration
+        await asyncio.gather(*(self.client(index) for index in range(self.clients)))
+
+    def endpoints(self):
+        def describe(latencies, statuses, errors):
+            entry = {
+                'requests': len(latencies),
+                'throughput': len(latencies) / self.duration,
+                'non_2xx': sum(count for status, count in statuses.items() if not 200 <= status < 300),
+                'errors': errors,
+                'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            }
+            if latencies:
+                entry.update({key: value for key, value in summarize(latencies).items() if key != 'count'})
+            return entry
+
+        endpoints = {
+            label: describe(stats['latencies'], stats['statuses'], stats['errors'])
+            for label, stats in sorted(self.stats.items())
+        }
+        statuses = {}
+        for stats in self.stats.values():
+            for status, count in stats['statuses'].items():
+                statuses[status] = statuses.get(status, 0) + count
+        endpoints['total'] = describe(
+            [latency for stats in self.stats.values() for latency in stats['latencies']],
+            statuses, sum(stats['errors'] for stats in self.stats.values()),
+        )
+        return endpoints
+
+
+def git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(url):
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        # As this process sees it; the server is assumed to share the environment
+        'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+        'url': url,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def print_table(endpoints):
+    print(f"{'endpoint':<30}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'non-2xx':>9}{'errors':>8}")
+    for label, entry in endpoints.items():
+        if not entry['requests']:
+            print(f"{label:<30}{'-':>9}{'-':>9}{'-':>9}{'-':>9}{entry['non_2xx']:>9}{entry['errors']:>8}")
+            continue
+        print(
+            f"{label:<30}{entry['throughput']:>9.1f}{entry['p50_ms']:>9.1f}{entry['p95_ms']:>9.1f}"
+            f"{entry['p99_ms']:>9.1f}{entry['non_2xx']:>9}{entry['errors']:>8}"
+        )
+
+
+def seed(args):
+    from django.contrib.auth.hashers import make_password
+
+    from authentication.models import Service, Subscription, User
+
+    plan, _ = Subscription.objects.get_or_create(name='Load test', defaults={'price': 10, 'duration_days': 30})
+    for i in range(3):
+        Service.objects.get_or_create(name=f'Load test {i}', defaults={
+            'login_url': f'https://load{i}.example.com/login', 'description': '', 'required_subscription': plan,
+        })
+    # One hash for every account; hashing each would take minutes
+    password = make_password(PASSWORD)
+    emails = [EMAIL.format(i) for i in range(args.users)]
+    User.objects.bulk_create(
+        (User(email=email, full_name='Load Test', subscription=plan) for email in emails),
+        batch_size=500, ignore_conflicts=True,
+    )
+    updated = User.objects.filter(email__in=emails).update(password=password, email_verified=True, is_active=True)
+    print(f"{updated} users, 1 plan, 3 services ready in {settings.DATABASES['default']['NAME']}")
+
+
+def run(args):
+    weights = dict(WEIGHTS)
+    for item in args.weight or ():
+        name, _, weight = item.partition('=')
+        if name not in WEIGHTS or not weight.isdigit():
+            raise SystemExit(f"--weight expects action=N with an action from: {', '.join(WEIGHTS)}")
+        weights[name] = int(weight)
+
+    load = LoadTest(args.url, args.clients, args.duration, args.warmup, args.seed, weights)
+    started = datetime.datetime.now(datetime.timezone.utc)
+    asyncio.run(load.run())
+    endpoints = load.endpoints()
+    if load.failed_clients:
+        print(f"{load.failed_clients} of {args.clients} clients could not log in; run seed with --users >= --clients")
+
+    result = {
+        'started_at': started.isoformat(),
+        'environment': environment(args.url),
+        'options': {
+            'clients': args.clients, 'duration': args.duration, 'warmup': args.warmup,
+            'seed': args.seed, 'weights': weights,
+        },
+        'failed_clients': load.failed_clients,
+        'endpoints': endpoints,
+    }
+    output = args.output
+    if output is None:
+        commit = (result['environment']['commit'] or 'nogit')[:10]
+        output = RESULTS / f"{commit}-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + '\n')
+
+    print(f"{args.clients} clients, {args.duration:.0f}s after {args.warmup:.0f}s warmup, seed {args.seed}")
+    print_table(endpoints)
+    print(f"written to {output}")
+
+
+def compare(args):
+    before, after = (json.loads(Path(path).read_text()) for path in (args.before, args.after))
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else '-'
+
+    print(f"before {before['environment']['commit']}, after {after['environment']['commit']}")
+    print(f"{'endpoint':<30}{'req/s':>9}{'':>9}{'p95 ms':>9}{'':>9}{'p99 ms':>9}{'':>9}")
+    labels = list(before['endpoints']) + [label for label in after['endpoints'] if label not in before['endpoints']]
+    for label in labels:
+        old, new = before['endpoints'].get(label), after['endpoints'].get(label)
+        if not (old and new and old['requests'] and new['requests']):
+            print(f"{label:<30}{'only in ' + ('after' if new else 'before'):>54}")
+            continue
+        print(
+            f"{label:<30}{new['throughput']:>9.1f}{change(old['throughput'], new['throughput']):>9}"
+            f"{new['p95_ms']:>9.1f}{change(old['p95_ms'], new['p95_ms']):>9}"
+            f"{new['p99_ms']:>9.1f}{change(old['p99_ms'], new['p99_ms']):>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Create the accounts and catalog the clients use')
+    seed_parser.add_argument('--users', type=int, default=200)
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = commands.add_parser('run', help='Drive the mix against a running server')
+    run_parser.add_argument('--url', default='http://127.0.0.1:8000')
+    run_parser.add_argument('--clients', type=int, default=50)
+    run_parser.add_argument('--duration', type=float, default=30)
+    run_parser.add_argument('--warmup', type=float, default=5)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--weight', action='append', help='action=N, repeatable; 0 leaves an action out')
+    run_parser.add_argument('--output', help='Result file, default benchmarks/results/<commit>-<time>.json')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='Throughput and latency change between two runs')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
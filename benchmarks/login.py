@@ -0,0 +1,107 @@
+"""
+Queries and latency per successful /api/auth/login/ call, next to a replay
+of the previous view and serializer, which looked the user up again for the
+tokens and the LoginAttempt row and minted tokens twice.
+
+    python -m benchmarks.login [--requests 200] [--real-hasher]
+
+By default a fast password hasher is used so the numbers show the request
+overhead rather than PBKDF2 cost.
+"""
+import argparse
+import time
+
+from . import setup, summarize, test_database
+
+setup()
+
+from django.contrib.auth import authenticate  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from rest_framework import serializers  # noqa: E402
+from rest_framework.exceptions import AuthenticationFailed  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from authentication.models import LoginAttempt, User  # noqa: E402
+from authentication.serializers import LoginSerializer  # noqa: E402
+from authentication.views import LoginView  # noqa: E402
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'Password123'
+
+
+class LegacyLoginSerializer(LoginSerializer):
+    """LoginSerializer as it was: tokens minted twice, user looked up again"""
+
+    tokens = serializers.SerializerMethodField()
+
+    def get_tokens(self, obj):
+        return User.objects.get(email=obj['email']).tokens()
+
+    def validate(self, attrs):
+        user = authenticate(email=attrs.get('email'), password=attrs.get('password'))
+        if not user:
+            raise AuthenticationFailed('Invalid credentials')
+        return {'email': user.email, 'tokens': user.tokens()}
+
+
+class LegacyLoginView(LoginView):
+    serializer_class = LegacyLoginSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        LoginAttempt.objects.create(
+            user=User.objects.get(email=serializer.validated_data['email']),
+            success=True,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        )
+        return Response({**serializer.validated_data, 'tokens': serializer.data['tokens']})
+
+
+def login_with(view):
+    factory = APIRequestFactory()
+
+    def login():
+        request = factory.post('/api/auth/login/', {'email': EMAIL, 'password': PASSWORD}, format='json')
+        response = view(request)
+        assert response.status_code == 200, response.data
+
+    return login
+
+
+def measure(name, func, requests):
+    with CaptureQueriesContext(connection) as ctx:
+        func()
+    queries = len(ctx.captured_queries)
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    stats = summarize(samples)
+    print(f"{name:<10}{queries:>9}{stats['mean_ms']:>11.2f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--real-hasher', action='store_true')
+    args = parser.parse_args()
+
+    hashers = None if args.real_hasher else ['django.contrib.auth.hashers.MD5PasswordHasher']
+    overrides = {'PASSWORD_HASHERS': hashers} if hashers else {}
+    with override_settings(**overrides), test_database():
+        user = User(email=EMAIL, full_name='Bench', email_verified=True)
+        user.set_password(PASSWORD)
+        user.save()
+
+        print(f"{'flow':<10}{'queries':>9}{'mean ms':>11}{'p50 ms':>10}{'p99 ms':>10}")
+        measure('before', login_with(LegacyLoginView.as_view()), args.requests)
+        measure('after', login_with(LoginView.as_view()), args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-request cost of MetricsMiddleware and of /metrics itself, through the
+full middleware stack with the test client.
+
+    python -m benchmarks.metrics [--requests 2000]
+
+Sentry is left out: it is initialised at import with a real DSN, and the
+sampler's per-request cost is one regex match.
+"""
+import argparse
+import time
+
+from . import setup, summarize, test_database
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from authentication.models import Payment, Subscription, User  # noqa: E402
+
+MIDDLEWARE = 'authentication.metrics.MetricsMiddleware'
+
+
+def run(client, path, requests):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get(path)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    without = [m for m in settings.MIDDLEWARE if m != MIDDLEWARE]
+    with test_database():
+        user = User.objects.create(email='bench@example.com', full_name='Bench')
+        plan = Subscription.objects.create(name='Pro', price=10, duration_days=30)
+        for i in range(10):
+            Payment.objects.create(
+                user=user, amount=10, subscription=plan, payment_status='success',
+                transaction_id=f'txn-{i}', payment_method='card',
+            )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {user.tokens()['access']}")
+        results = []
+        with override_settings(MIDDLEWARE=without):
+            results.append(('payments, no metrics', run(client, '/api/auth/payments/', args.requests)))
+        results.append(('payments, metrics', run(client, '/api/auth/payments/', args.requests)))
+        # The test client connects from 127.0.0.1
+        with override_settings(METRICS={**settings.METRICS, 'ALLOWED_IPS': ['127.0.0.1']}):
+            results.append(('/metrics scrape', run(client, '/metrics', max(1, args.requests // 20))))
+
+    print(f"{'path':<24}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, stats in results:
+        print(f"{name:<24}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Outbox delivery throughput against a local debugging SMTP server, next to
+the previous one-connection-per-email send_mail() path.
+
+    python -m benchmarks.outbox [--emails 500] [--batch-size 100]
+    python -m benchmarks.outbox --port 1025   # e.g. python -m aiosmtpd -n -l localhost:1025
+
+Without --port a minimal in-process SMTP sink is started; --connect-delay-ms
+makes it behave like a remote server where each new connection costs a
+handshake.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from . import setup, test_database
+
+setup()
+
+from django.core.mail import send_mail  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from authentication import outbox  # noqa: E402
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Accepts every message and throws it away"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        # Stand-in for the TCP/TLS handshake and AUTH round trips of a real server
+        time.sleep(self.server.connect_delay)
+        self.reply('220 localhost sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                self.reply('354 go ahead')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    connect_delay = 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--connect-delay-ms', type=float, default=0,
+                        help='simulated connection setup cost of the built-in sink')
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        server = SinkServer((args.host, 0), SinkHandler)
+        server.connect_delay = args.connect_delay_ms / 1000
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    smtp = {
+        'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+        'EMAIL_HOST': args.host,
+        'EMAIL_PORT': port,
+        'EMAIL_USE_TLS': False,
+        'EMAIL_HOST_USER': '',
+        'EMAIL_HOST_PASSWORD': '',
+        'CELERY_BROKER_URL': '',
+    }
+    # setup_test_environment() swaps in the locmem backend, so override after it
+    with test_database(), override_settings(**smtp):
+        started = time.perf_counter()
+        for i in range(args.emails):
+            send_mail('Verify your email', 'Body', None, [f'user{i}@example.com'])
+        inline = time.perf_counter() - started
+
+        for i in range(args.emails):
+            outbox.OutboxEmail.objects.create(
+                subject='Verify your email', message='Body', recipients=[f'user{i}@example.com']
+            )
+        started = time.perf_counter()
+        sent, failed = outbox.deliver_pending(batch_size=args.batch_size)
+        batched = time.perf_counter() - started
+
+    if server:
+        server.shutdown()
+    print(f"{'path':<28}{'emails':>8}{'seconds':>10}{'emails/s':>10}")
+    print(f"{'send_mail per email':<28}{args.emails:>8}{inline:>10.2f}{args.emails / inline:>10.0f}")
+    print(f"{'outbox batch':<28}{sent:>8}{batched:>10.2f}{sent / batched:>10.0f}")
+    if failed:
+        print(f"{failed} emails failed")
+
+
+if __name__ == '__main__':
+    main()
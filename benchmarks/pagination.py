@@ -0,0 +1,102 @@
+"""
+Latency of the first and a deep page of /api/auth/payments/ with the old
+page-number pagination (COUNT(*) + OFFSET) and the cursor pagination.
+
+    python -m benchmarks.pagination [--pages 10000] [--requests 50]
+"""
+import argparse
+import time
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from . import setup, summarize, test_database
+
+setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.pagination import Cursor, PageNumberPagination  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from authentication.models import Payment, Subscription, User  # noqa: E402
+from authentication.pagination import PaymentPagination  # noqa: E402
+from authentication.views import PaymentViewSet  # noqa: E402
+
+PAGE_SIZE = 10
+
+
+class LegacyPagination(PageNumberPagination):
+    page_size = PAGE_SIZE
+
+
+def seed(rows):
+    user = User.objects.create(email='bench@example.com', full_name='Bench')
+    plan = Subscription.objects.create(name='Pro', price=10, duration_days=30)
+    now = timezone.now()
+    Payment.objects.bulk_create(
+        (
+            Payment(
+                user=user, subscription=plan, amount=10, payment_status='success',
+                transaction_id=f'txn-{i}', payment_method='card',
+                timestamp=now - timedelta(seconds=i)
+            )
+            for i in range(rows)
+        ),
+        batch_size=5000,
+    )
+    return user
+
+
+def deep_cursor(user, offset):
+    """The cursor a client would hold after following `offset` rows of next links"""
+    timestamp = (
+        Payment.objects.filter(user=user).order_by('-timestamp', '-id')
+        .values_list('timestamp', flat=True)[offset - 1]
+    )
+    paginator = PaymentPagination()
+    paginator.base_url = 'http://testserver/api/auth/payments/'
+    url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(timestamp)))
+    return parse_qs(urlparse(url).query)['cursor'][0]
+
+
+def measure(view, user, params, requests):
+    factory = APIRequestFactory()
+    samples = []
+    for _ in range(requests):
+        request = factory.get('/api/auth/payments/', params)
+        force_authenticate(request, user)
+        started = time.perf_counter()
+        response = view(request)
+        response.render()
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.data
+        assert len(response.data['results']) == PAGE_SIZE
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        user = seed(args.pages * PAGE_SIZE)
+        page_number = PaymentViewSet.as_view({'get': 'list'}, pagination_class=LegacyPagination)
+        cursor = PaymentViewSet.as_view({'get': 'list'})
+        PaymentPagination.page_size = PAGE_SIZE
+        deep = deep_cursor(user, (args.pages - 1) * PAGE_SIZE)
+
+        cases = [
+            ('page number', 'page 1', page_number, {}),
+            ('page number', f'page {args.pages}', page_number, {'page': args.pages}),
+            ('cursor', 'page 1', cursor, {}),
+            ('cursor', f'page {args.pages}', cursor, {'cursor': deep}),
+        ]
+        print(f"{'pagination':<14}{'page':<12}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        for name, label, view, params in cases:
+            stats = measure(view, user, params, args.requests)
+            print(f"{name:<14}{label:<12}{stats['mean_ms']:>9.2f}{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
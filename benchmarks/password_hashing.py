@@ -0,0 +1,74 @@
+"""
+Password checks per second per core for the PBKDF2 hasher the project used
+before and the Argon2 hasher it uses now, each run inline on the request
+threads and through the bounded hashing pool.
+
+    python -m benchmarks.password_hashing [--logins 200] [--clients 16]
+
+Argon2 cost comes from settings.PASSWORD_HASHING (ARGON2_* environment
+variables).
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import setup, summarize
+
+setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from authentication import hashers  # noqa: E402
+from authentication.models import User  # noqa: E402
+
+PASSWORD = 'Password123'
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'authentication.hashers.TunableArgon2PasswordHasher',
+}
+
+
+def inline(user):
+    return user.check_password(PASSWORD)
+
+
+def pooled(user):
+    return hashers.verify_password(user, PASSWORD)
+
+
+def run(check, user, logins, clients):
+    samples = []
+
+    def login(_):
+        started = time.perf_counter()
+        assert check(user)
+        samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as request_threads:
+        list(request_threads.map(login, range(logins)))
+    return logins / (time.perf_counter() - started), summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent request threads')
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    workers = hashers.get_config()['WORKERS']
+    print(f"{cores} cores, {workers} hashing workers, {args.clients} clients")
+    print(f"{'hasher':<8}{'mode':<8}{'logins/s':>10}{'per core':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, path in HASHERS.items():
+        with override_settings(PASSWORD_HASHERS=[path]):
+            user = User(email='bench@example.com', password=make_password(PASSWORD))
+            for mode, check in (('inline', inline), ('pool', pooled)):
+                rate, stats = run(check, user, args.logins, args.clients)
+                print(f"{name:<8}{mode:<8}{rate:>10.1f}{rate / cores:>10.1f}{stats['p50_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Date-range revenue queries answered from the DailyRevenue rollup next to
+aggregating the raw Payment table, over a year of generated payments.
+
+    python -m benchmarks.revenue [--payments 200000] [--runs 20]
+"""
+import argparse
+import datetime
+import random
+import time
+import uuid
+
+from . import setup, summarize, test_database
+
+setup()
+
+from django.db.models import Count, Q, Sum  # noqa: E402
+from django.db.models.functions import TruncDate  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from authentication import revenue  # noqa: E402
+from authentication.models import Payment, Subscription, User  # noqa: E402
+
+
+def seed(payments):
+    plans = [Subscription.objects.create(name=f'Plan {i}', price=10 * (i + 1), duration_days=30) for i in range(3)]
+    users = User.objects.bulk_create(User(email=f'user{i}@example.com', full_name=f'User {i}') for i in range(500))
+    now = timezone.now()
+    rng = random.Random(0)
+    batch = []
+    for i in range(payments):
+        batch.append(Payment(
+            user=users[i % len(users)], subscription=plans[i % len(plans)], amount=rng.choice((10, 20, 30)),
+            payment_status=rng.choice(('success', 'success', 'success', 'failed', 'refunded')),
+            transaction_id=uuid.uuid4().hex, payment_method=rng.choice(('card', 'bkash', 'paypal')),
+        ))
+        if len(batch) == 5000:
+            Payment.objects.bulk_create(batch)
+            batch = []
+    Payment.objects.bulk_create(batch)
+    # auto_now_add stamped everything now; spread it over the past year
+    pks = list(Payment.objects.order_by('pk').values_list('pk', flat=True))
+    per_day = len(pks) // 365 + 1
+    for day in range(365):
+        Payment.objects.filter(pk__in=pks[day * per_day:(day + 1) * per_day]) \
+            .update(timestamp=now - datetime.timedelta(days=day))
+
+
+def raw(since, until):
+    start, end = revenue.day_range(since, until)
+    return list(
+        Payment.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(date=TruncDate('timestamp')).values('date')
+        .annotate(
+            success_count=Count('pk', filter=Q(payment_status='success')),
+            success_amount=Sum('amount', filter=Q(payment_status='success')),
+            refunded_count=Count('pk', filter=Q(payment_status='refunded')),
+        ).order_by('date')
+    )
+
+
+def timed(fn, runs, *args):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--payments', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with test_database():
+        seed(args.payments)
+        started = time.perf_counter()
+        buckets = revenue.rebuild()
+        print(f"rebuild: {buckets} buckets in {time.perf_counter() - started:.2f}s")
+        until = timezone.localdate() + datetime.timedelta(days=1)
+        since = until - datetime.timedelta(days=90)
+        results = [
+            ('raw Payment, 90 days', timed(raw, args.runs, since, until)),
+            ('rollup, 90 days', timed(revenue.summary, args.runs, since, until)),
+        ]
+
+    print(f"{'query':<24}{'mean ms':>10}{'p95 ms':>10}")
+    for name, stats in results:
+        print(f"{name:<24}{stats['mean_ms']:>10.2f}{stats['p95_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()